@@ -0,0 +1,159 @@
+# analyze_requests.py
+# -------------------------------------------------------------------
+# Offline analyzer for the structured request log written by server.py
+# (requests.jsonl plus rotated requests.jsonl.N files). The log is streamed
+# line by line and latencies go into log-scale histograms, so memory stays
+# flat no matter how large the files are.
+#
+#   python analyze_requests.py
+#   python analyze_requests.py requests.jsonl requests.jsonl.1 --bucket 15 --top 20
+#   python analyze_requests.py --since 2026-10-01 --json report.json
+# -------------------------------------------------------------------
+import os
+import sys
+import glob
+import json
+import math
+import argparse
+from datetime import datetime, timedelta
+
+# Bucket width of 2% keeps percentile estimates within ~1% of the true value.
+GROWTH = 1.02
+
+
+class LatencyHistogram:
+    """Fixed-memory latency histogram with approximate percentiles."""
+
+    def __init__(self):
+        self.buckets, self.count, self.total, self.max = {}, 0, 0.0, 0.0
+
+    def add(self, ms):
+        ms = max(ms, 0.001)
+        key = int(math.log(ms, GROWTH))
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1; self.total += ms; self.max = max(self.max, ms)
+
+    def percentile(self, pct):
+        if not self.count: return None
+        target, seen = pct / 100.0 * self.count, 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen >= target:
+                return min(GROWTH ** (key + 0.5), self.max)
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "mean_ms": round(self.total / self.count, 2) if self.count else None,
+                "p50_ms": _round(self.percentile(50)), "p95_ms": _round(self.percentile(95)),
+                "p99_ms": _round(self.percentile(99)), "max_ms": round(self.max, 2)}
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def default_paths(base="requests.jsonl"):
+    # Oldest rotated file first so records come out in time order.
+    rotated = sorted(glob.glob(f"{base}.[0-9]*"), key=lambda p: int(p.rsplit(".", 1)[1]), reverse=True)
+    return rotated + ([base] if os.path.exists(base) else [])
+
+
+def iter_records(paths):
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.startswith("{"): continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "duration_ms" in record and "route" in record:
+                    yield record
+
+
+EPOCH = datetime(1970, 1, 1)
+
+def bucket_start(ts, minutes):
+    # Aligned on the epoch rather than the hour, so widths over 60 minutes (e.g. 1440) line up too.
+    seconds = int((datetime.fromisoformat(ts.rstrip("Z")) - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % (minutes * 60))
+
+
+def analyze(paths, bucket_minutes, since=None):
+    routes, timeline, users = {}, {}, {}
+    statuses, total = {}, 0
+    for record in iter_records(paths):
+        if since and record.get("ts", "") < since: continue
+        total += 1
+        key = f"{record.get('method', '?')} {record['route']}"
+        ms = float(record["duration_ms"])
+        route = routes.setdefault(key, {"latency": LatencyHistogram(), "sql_ms": 0.0, "bytes": 0, "errors": 0})
+        route["latency"].add(ms)
+        route["sql_ms"] += float(record.get("sql_ms") or 0)
+        route["bytes"] += int(record.get("bytes") or 0)
+        if int(record.get("status", 0)) >= 500: route["errors"] += 1
+        statuses[str(record.get("status"))] = statuses.get(str(record.get("status")), 0) + 1
+        if record.get("ts"):
+            timeline.setdefault(bucket_start(record["ts"], bucket_minutes), LatencyHistogram()).add(ms)
+        if record.get("user_id") is not None:
+            user = users.setdefault(record["user_id"], {"requests": 0, "total_ms": 0.0, "sql_ms": 0.0, "bytes": 0})
+            user["requests"] += 1; user["total_ms"] += ms
+            user["sql_ms"] += float(record.get("sql_ms") or 0); user["bytes"] += int(record.get("bytes") or 0)
+    return total, statuses, routes, timeline, users
+
+
+def build_report(total, statuses, routes, timeline, users, top):
+    route_rows = []
+    for key, r in routes.items():
+        row = {"route": key, **r["latency"].summary(), "total_ms": round(r["latency"].total, 2),
+               "avg_sql_ms": round(r["sql_ms"] / r["latency"].count, 2), "bytes": r["bytes"], "errors_5xx": r["errors"]}
+        route_rows.append(row)
+    route_rows.sort(key=lambda r: r["p95_ms"] or 0, reverse=True)
+    user_rows = [{"user_id": uid, **{k: round(v, 2) if isinstance(v, float) else v for k, v in u.items()}} for uid, u in users.items()]
+    user_rows.sort(key=lambda u: u["total_ms"], reverse=True)
+    return {
+        "records": total, "statuses": statuses,
+        "slowest_routes": route_rows[:top],
+        "timeline": [{"bucket": start.isoformat(), **h.summary()} for start, h in sorted(timeline.items())],
+        "heaviest_users": user_rows[:top],
+    }
+
+
+def print_report(report):
+    print(f"{report['records']:,} requests  statuses: {report['statuses']}")
+    print("\nSlowest endpoints (by p95)")
+    print(f"  {'route':<48}{'count':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'sql avg':>9}{'5xx':>6}")
+    for r in report["slowest_routes"]:
+        print(f"  {r['route'][:47]:<48}{r['count']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['avg_sql_ms']:>9}{r['errors_5xx']:>6}")
+    print("\nLatency over time")
+    print(f"  {'bucket':<22}{'count':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for b in report["timeline"]:
+        print(f"  {b['bucket']:<22}{b['count']:>8}{b['p50_ms']:>9}{b['p95_ms']:>9}{b['p99_ms']:>9}")
+    print("\nHeaviest users (by total server time)")
+    print(f"  {'user_id':<10}{'requests':>10}{'total ms':>14}{'sql ms':>12}{'bytes':>14}")
+    for u in report["heaviest_users"]:
+        print(f"  {str(u['user_id']):<10}{u['requests']:>10}{u['total_ms']:>14}{u['sql_ms']:>12}{u['bytes']:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise the structured request log.")
+    parser.add_argument("paths", nargs="*", help="Log files (default: requests.jsonl and its rotations).")
+    parser.add_argument("--bucket", type=int, default=60, help="Timeline bucket size in minutes.")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--since", help="Only include records at or after this ISO timestamp.")
+    parser.add_argument("--json", help="Also write the report to this file as JSON.")
+    args = parser.parse_args()
+    if args.bucket < 1:
+        parser.error("--bucket must be at least 1 minute")
+
+    paths = args.paths or default_paths(os.environ.get("REQUEST_LOG_PATH", "requests.jsonl"))
+    if not paths:
+        sys.exit("No request log found.")
+    report = build_report(*analyze(paths, args.bucket, args.since), args.top)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f: json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# batch_quotes.py
+# -------------------------------------------------------------------
+# Headless batch quotation generator for tenders. Reads projects and line
+# items from CSV or JSON, prices every line from the products table, saves
+# each project as a quote owned by --owner, and renders the quotation PDFs
+# across a process pool by calling server._generate_pdf_with_jinja directly.
+#
+# JSON: a list of projects
+#   [{"customerName": "ACME", "projectName": "Villa 12", "installationCost": 1500,
+#     "discountPercent": 5, "items": [{"model": "SC40PT", "quantity": 4}, ...]}, ...]
+#
+# CSV: one row per line item, grouped by (customer, project)
+#   customer,project,model,quantity,installation,discount
+#   ACME,Villa 12,SC40PT,4,1500,5
+#
+#   python batch_quotes.py tender.json --owner sales@radixtechgroup.com --out pdfs/
+# -------------------------------------------------------------------
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import statistics
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import server
+
+
+def read_projects(path):
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    projects = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            key = (row.get("customer", ""), row.get("project", ""))
+            project = projects.setdefault(key, {
+                "customerName": key[0], "projectName": key[1],
+                "installationCost": float(row.get("installation") or 0),
+                "discountPercent": float(row.get("discount") or 0), "items": []})
+            if row.get("model"):
+                project["items"].append({"model": row["model"], "quantity": int(float(row.get("quantity") or 1))})
+    return list(projects.values())
+
+
+def price_projects(cursor, projects):
+    """Fills description/price/category from the catalog. Returns (priced, errors)."""
+    models = sorted({item["model"] for p in projects for item in p.get("items", [])})
+    catalog = {}
+    # Chunked IN queries stay well under SQLite's bound-parameter limit.
+    for start in range(0, len(models), 500):
+        chunk = models[start:start + 500]
+        cursor.execute(f"SELECT model, description, price, category FROM products WHERE model IN ({','.join('?' * len(chunk))})", chunk)
+        catalog.update({r["model"]: r for r in cursor.fetchall()})
+
+    priced, errors = [], []
+    for project in projects:
+        missing = [i["model"] for i in project.get("items", []) if i["model"] not in catalog]
+        if missing or not project.get("items"):
+            errors.append((project.get("projectName"), f"unknown models: {missing}" if missing else "no line items"))
+            continue
+        # Same line shape the browser saves, with repeated models merged like addToQuote() does.
+        lines = {}
+        for item in project["items"]:
+            product = catalog[item["model"]]
+            line = lines.setdefault(item["model"], {
+                "uniqueId": item["model"], "model": item["model"], "description": product["description"],
+                "price": float(product["price"] or 0), "quantity": 0, "category": product["category"]})
+            line["quantity"] += int(item.get("quantity", 1))
+        priced.append({**project, "items": list(lines.values())})
+    return priced, errors
+
+
+def save_quotes(db, owner, projects):
+    cursor = db.cursor()
+    jobs = []
+    for project in projects:
+        quote_id = server.next_quote_id(cursor, owner["name"])
+        quote_data = {"id": quote_id, "customerName": project.get("customerName"), "projectName": project.get("projectName"),
+                      "installationCost": project.get("installationCost", 0), "discountPercent": project.get("discountPercent", 0),
+                      "items": project["items"]}
+        cursor.execute("INSERT INTO quotes (id, user_id, customer_name, project_name, quote_data) VALUES (?, ?, ?, ?, ?)",
+                       (quote_id, owner["id"], quote_data["customerName"], quote_data["projectName"], json.dumps(quote_data)))
+        server.record_quote_revision(cursor, quote_id, owner["id"], quote_data)
+        totals = server.calculate_totals(quote_data["items"], quote_data["installationCost"], quote_data["discountPercent"])
+        jobs.append((quote_id, quote_data["items"], {"name": quote_data["customerName"], "project": quote_data["projectName"]}, totals))
+    db.commit()
+    return jobs
+
+
+def render_job(job, out_dir):
+    """Runs in a pool worker: renders one quotation and writes it to out_dir."""
+    quote_id, items, customer_info, totals = job
+    started = time.perf_counter()
+    pdf_bytes = server._generate_pdf_with_jinja(items, customer_info, totals, quote_id=quote_id)
+    path = os.path.join(out_dir, f"quotation_{quote_id}.pdf")
+    with open(path, "wb") as f: f.write(pdf_bytes)
+    return quote_id, path, len(pdf_bytes), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate many quotations (DB rows + PDFs) from a CSV/JSON file.")
+    parser.add_argument("input", help="Projects file (.json or .csv).")
+    parser.add_argument("--owner", required=True, help="Email of the user the quotes are saved under.")
+    parser.add_argument("--out", default="batch_quotes", help="Directory for the rendered PDFs.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--db", help="SQLite database to use (default: quotes.db).")
+    parser.add_argument("--no-pdf", action="store_true", help="Only save the quotes.")
+    args = parser.parse_args()
+
+    if args.db: server.DB_FILE = args.db
+    started = time.perf_counter()
+    projects = read_projects(args.input)
+
+    with server.app.app_context():
+        db = server.get_db(); cursor = db.cursor()
+        cursor.execute("SELECT id, name FROM users WHERE email = ?", (args.owner,))
+        owner = cursor.fetchone()
+        if not owner:
+            sys.exit(f"No user with email {args.owner}.")
+        priced, errors = price_projects(cursor, projects)
+        jobs = save_quotes(db, owner, priced)
+    saved_at = time.perf_counter()
+    for name, error in errors:
+        print(f"SKIPPED {name}: {error}")
+    print(f"Saved {len(jobs)} quotes ({len(errors)} skipped) in {saved_at - started:.2f}s")
+    if args.no_pdf or not jobs:
+        return
+
+    os.makedirs(args.out, exist_ok=True)
+    render_times, total_bytes, failures = [], 0, 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(render_job, job, args.out): job[0] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                quote_id, path, size, seconds = future.result()
+                render_times.append(seconds); total_bytes += size
+                print(f"  {quote_id} -> {path} ({size / 1024:.0f} KB, {seconds:.2f}s)")
+            except Exception as e:
+                failures += 1
+                print(f"  {futures[future]} FAILED: {e}")
+    wall = time.perf_counter() - saved_at
+
+    print(f"Rendered {len(render_times)}/{len(jobs)} PDFs with {args.workers} workers in {wall:.2f}s "
+          f"({len(render_times) / wall:.2f} PDFs/s, {total_bytes / 1024 / 1024:.1f} MB)")
+    if render_times:
+        ordered = sorted(render_times)
+        print(f"Per-PDF render: mean {statistics.fmean(ordered):.2f}s, p50 {ordered[len(ordered) // 2]:.2f}s, "
+              f"p95 {ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]:.2f}s")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
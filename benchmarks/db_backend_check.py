@@ -0,0 +1,136 @@
+# benchmarks/db_backend_check.py
+# -------------------------------------------------------------------
+# Runs the same checks of the data-access layer in server.py against
+# SQLite and, when connection settings are given, a MySQL/MariaDB server:
+# ? placeholders and literal % signs, IntegrityError normalisation, the
+# matched-rows rowcount save_quote's UPDATE-then-INSERT relies on, and that
+# streaming_cursor() iterates a large table without materialising it while
+# still counting the fetch time towards the request's SQL total.
+# Exits non-zero on the first failed check.
+#
+#   python benchmarks/db_backend_check.py
+#   python benchmarks/db_backend_check.py --mysql-host 127.0.0.1 --mysql-user root \
+#       --mysql-password secret --mysql-db radix_check --rows 200000
+# -------------------------------------------------------------------
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import g
+import server
+
+PARAMSTYLE_CASES = [
+    ("SELECT * FROM t WHERE a = ?", "SELECT * FROM t WHERE a = %s"),
+    ("SELECT * FROM t WHERE a LIKE 'QUO%' AND b = ?", "SELECT * FROM t WHERE a LIKE 'QUO%%' AND b = %s"),
+    ("UPDATE t SET note = 'why?' WHERE id = ?", "UPDATE t SET note = 'why?' WHERE id = %s"),
+    ("SELECT 'it''s ?', ? FROM t", "SELECT 'it''s ?', %s FROM t"),
+    ("SELECT ? * 100 % 7", "SELECT %s * 100 %% 7"),
+]
+
+
+def check(condition, message):
+    if not condition:
+        sys.exit(f"FAIL: {message}")
+    print(f"  ok  {message}")
+
+
+def run_checks(name, db, rows):
+    print(f"{name}")
+    cur = db.cursor()
+    cur.execute("DROP TABLE IF EXISTS dal_check")
+    cur.execute("CREATE TABLE dal_check (id INTEGER PRIMARY KEY, model VARCHAR(64) UNIQUE, note VARCHAR(255))")
+    cur.execute("INSERT INTO dal_check (id, model, note) VALUES (?, ?, '100% ready?')", (1, "SC40PT"))
+    db.commit()
+    cur.execute("SELECT note FROM dal_check WHERE model LIKE 'SC%' AND id = ?", (1,))
+    check(cur.fetchone()["note"] == "100% ready?", "placeholders and literal % / ? survive")
+
+    try:
+        cur.execute("INSERT INTO dal_check (id, model, note) VALUES (?, ?, ?)", (2, "SC40PT", "duplicate"))
+        raised = None
+    except Exception as e:
+        raised = e
+    check(isinstance(raised, server.IntegrityError), f"duplicate key raises server.IntegrityError ({type(raised).__name__})")
+    db.rollback()
+
+    cur.execute("UPDATE dal_check SET note = ? WHERE model = ?", ("100% ready?", "SC40PT"))
+    check(cur.rowcount == 1, "rowcount counts a matched row even when the UPDATE changes nothing")
+    cur.execute("UPDATE dal_check SET note = ? WHERE model = ?", ("missing", "NO-SUCH-MODEL"))
+    check(cur.rowcount == 0, "rowcount is 0 when no row matched")
+    db.rollback()
+
+    batch = [(i, f"MDL{i:07d}", "x" * 120) for i in range(2, rows + 2)]
+    for start in range(0, len(batch), 5000):
+        cur.executemany("INSERT INTO dal_check (id, model, note) VALUES (?, ?, ?)", batch[start:start + 5000])
+    db.commit()
+    del batch
+
+    for label, make_cursor, consume in (
+        ("fetchall", db.cursor, lambda c: sum(1 for _ in c.fetchall())),
+        ("streaming_cursor", lambda: server.streaming_cursor(db), lambda c: sum(1 for _ in c)),
+    ):
+        tracemalloc.start()
+        started = time.perf_counter()
+        cursor = make_cursor()
+        cursor.execute("SELECT id, model, note FROM dal_check ORDER BY id")
+        count = consume(cursor)
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"      {label:<17} {count:>9,} rows  {seconds:6.2f} s  peak {peak / 1024 / 1024:7.1f} MB")
+        if label == "streaming_cursor":
+            check(count == rows + 1, "streaming cursor returns every row")
+            check(peak < 16 * 1024 * 1024, "streaming cursor peak stays under 16 MB")
+
+    with server.app.app_context():
+        cursor = server.streaming_cursor(db)
+        cursor.execute("SELECT id, model, note FROM dal_check ORDER BY id")
+        after_execute = g._sql_seconds
+        for _ in cursor: pass
+        check(g._sql_seconds > after_execute, "iterating a streamed cursor adds to the request's SQL time")
+
+    # An unbuffered MySQL cursor must be drained before the next query; this is the pattern the routes use.
+    cur = db.cursor()
+    cur.execute("SELECT COUNT(*) AS n FROM dal_check")
+    check(cur.fetchone()["n"] == rows + 1, "connection is usable after a streamed scan")
+    cur.execute("DROP TABLE dal_check")
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the data-access layer on SQLite and MySQL/MariaDB.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--mysql-host", default=os.environ.get("DB_HOST"))
+    parser.add_argument("--mysql-user", default=os.environ.get("DB_USER"))
+    parser.add_argument("--mysql-password", default=os.environ.get("DB_PASSWORD"))
+    parser.add_argument("--mysql-db", default=os.environ.get("DB_NAME"))
+    args = parser.parse_args()
+
+    print("paramstyle translation")
+    for sql, expected in PARAMSTYLE_CASES:
+        check(server.mysql_paramstyle(sql) == expected, f"{sql!r}")
+
+    import sqlite3
+    db = sqlite3.connect(os.path.join(tempfile.mkdtemp(prefix="dal_check_"), "check.db"), factory=server.TimedConnection)
+    db.row_factory = sqlite3.Row
+    run_checks("sqlite", db, args.rows)
+    db.close()
+
+    if not args.mysql_host:
+        print("mysql: skipped (pass --mysql-host or set DB_HOST)")
+        return
+    import MySQLdb, MySQLdb.cursors
+    from MySQLdb.constants import CLIENT
+    db = server.MySQLConnection(MySQLdb.connect(host=args.mysql_host, user=args.mysql_user, passwd=args.mysql_password or "",
+                                                db=args.mysql_db, cursorclass=MySQLdb.cursors.DictCursor,
+                                                client_flag=CLIENT.FOUND_ROWS), MySQLdb)
+    run_checks("mysql", db, args.rows)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
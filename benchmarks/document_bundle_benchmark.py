@@ -0,0 +1,107 @@
+# benchmarks/document_bundle_benchmark.py
+# -------------------------------------------------------------------
+# Time and SQL queries to produce the quotation, contract and application
+# form for one confirmed quote: the per-document endpoints (quote-pdf,
+# generate-contract, plus a direct application form render, which has no
+# route of its own) against one call to /api/quotes/<id>/bundle.
+# Needs WeasyPrint or pdfkit/wkhtmltopdf installed.
+#
+#   python benchmarks/document_bundle_benchmark.py --lines 80 --runs 5
+# -------------------------------------------------------------------
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from flask import g
+import server
+
+from revision_storage_benchmark import random_line
+
+sql_queries = []
+
+
+@server.app.after_request
+def count_queries(response):
+    sql_queries.append(g.get("_sql_queries", 0))
+    return response
+
+
+def separate(client, quote_id):
+    queries = 0
+    for url in (f"/api/user/quote-pdf/{quote_id}", f"/api/user/generate-contract/{quote_id}"):
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.get_json())
+        queries += sql_queries[-1]
+    quote = json.loads(client.get(f"/api/load-quote/{quote_id}").data)
+    queries += sql_queries[-1]
+    items = quote["items"]
+    totals = server.calculate_totals(items, quote.get("installationCost", 0), quote.get("discountPercent", 0))
+    context = server._document_context(items, {"name": quote["customerName"], "project": quote["projectName"]}, totals, quote_id)
+    context["ref_numbers"] = {"quotation_number": quote_id, "bom_reference": "BOM-0"}
+    server._render_pdf(server.template_env.get_template("application_form_template.html").render(**context),
+                       "application_form", margin="0.5in")
+    return queries
+
+
+def bundle(client, quote_id):
+    response = client.get(f"/api/quotes/{quote_id}/bundle")
+    assert response.status_code == 200, response.get_json()
+    from pypdf import PdfReader
+    outline = [item.title for item in PdfReader(io.BytesIO(response.data)).outline]
+    assert outline == [title for title, *_ in server.DEAL_DOCUMENTS], outline
+    return sql_queries[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-document PDF endpoints with the single-pass bundle.")
+    parser.add_argument("--lines", type=int, default=80)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = server.get_pdf_engine()[0]
+    if engine is None:
+        sys.exit("No PDF engine found. Install pdfkit+wkhtmltopdf or WeasyPrint.")
+
+    workdir = tempfile.mkdtemp(prefix="bundle_bench_")
+    server.DB_FILE = os.path.join(workdir, "quotes.db")
+    server.COUNTERS_FILE = os.path.join(workdir, "counters.json")
+    server.init_db()
+    rng = random.Random(args.seed)
+    quote = {"customerName": "Benchmark Co", "projectName": "Villa 1", "installationCost": 2500, "discountPercent": 5,
+             "items": [random_line(rng, n) for n in range(args.lines)]}
+    with server.app.app_context():
+        db = server.get_db(); cur = db.cursor()
+        cur.execute("INSERT INTO users (name, email, password, role, is_approved) VALUES ('Bench User', 'bench@example.com', 'x', 'user', 1)")
+        user_id = cur.lastrowid
+        cur.execute("INSERT INTO quotes (id, user_id, quote_data, status) VALUES ('QUO-BENCH-1', ?, ?, 'Confirmed')",
+                    (user_id, json.dumps(quote)))
+        db.commit()
+    client = server.app.test_client()
+    client.set_cookie("token", jwt.encode({"user_id": user_id, "role": "user", "exp": datetime.utcnow() + timedelta(hours=1)},
+                                          server.app.config["SECRET_KEY"], algorithm="HS256"))
+
+    print(f"Engine: {engine}; quote with {args.lines} lines; {args.runs} runs each")
+    bundle(client, "QUO-BENCH-1")  # warm up templates and fonts
+    for name, fn in (("separate", separate), ("bundle", bundle)):
+        times, queries = [], 0
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            queries = fn(client, "QUO-BENCH-1")
+            times.append(time.perf_counter() - started)
+        print(f"  {name:<9} p50 {statistics.median(times) * 1000:8.1f} ms  max {max(times) * 1000:8.1f} ms  "
+              f"{queries} SQL queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/image_zip_benchmark.py
+# -------------------------------------------------------------------
+# Wall time to get N product photos processed and linked: one
+# /api/upload-image request per photo (the way the admin form does it)
+# against one /api/admin/upload-images-zip request, at 1 and --workers
+# threads. Also times the previous per-pixel Pillow background removal
+# against process_product_image() on a single photo. Uses rembg when it
+# is installed, otherwise the Pillow fallback.
+#
+#   python benchmarks/image_zip_benchmark.py --images 40 --size 3000x2000 --workers 4
+# -------------------------------------------------------------------
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from PIL import Image, ImageDraw
+import server
+
+
+def product_photo(rng, width, height):
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x, y = rng.randrange(width // 2), rng.randrange(height // 2)
+        draw.rectangle((x, y, x + width // 3, y + height // 3), fill=tuple(rng.randrange(200) for _ in range(3)))
+    output = io.BytesIO()
+    img.save(output, "JPEG", quality=90)
+    return output.getvalue()
+
+
+def legacy_process(raw):
+    """The per-pixel loop upload_image used before process_product_image()."""
+    img = Image.open(io.BytesIO(raw)).convert("RGBA")
+    img.putdata([(255, 255, 255, 0) if p[0] > 240 and p[1] > 240 and p[2] > 240 else p for p in img.getdata()])
+    output = io.BytesIO()
+    img.save(output, "PNG")
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-image uploads with the parallel ZIP import.")
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--size", default="3000x2000", help="Photo size, WIDTHxHEIGHT.")
+    parser.add_argument("--workers", type=int, default=server.IMAGE_WORKERS)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    width, height = map(int, args.size.split("x"))
+
+    workdir = tempfile.mkdtemp(prefix="image_zip_bench_")
+    server.DB_FILE = os.path.join(workdir, "quotes.db")
+    server.UPLOAD_FOLDER = os.path.join(workdir, "uploads")
+    os.makedirs(server.UPLOAD_FOLDER)
+    server.init_db()
+    models = [f"BENCH-{n:04d}" for n in range(args.images)]
+    with server.app.app_context():
+        db = server.get_db(); cur = db.cursor()
+        cur.executemany("INSERT INTO products (model, description, category, price, stock) VALUES (?, 'Bench', 'Bench', 1, 1)",
+                        [(m,) for m in models])
+        cur.execute("INSERT INTO users (name, email, password, role, is_approved) VALUES ('Bench Admin', 'bench-admin@example.com', 'x', 'admin', 1)")
+        admin_id = cur.lastrowid
+        db.commit()
+    client = server.app.test_client()
+    client.set_cookie("token", jwt.encode({"user_id": admin_id, "role": "admin", "exp": datetime.utcnow() + timedelta(hours=1)},
+                                          server.app.config["SECRET_KEY"], algorithm="HS256"))
+
+    rng = random.Random(args.seed)
+    photos = [product_photo(rng, width, height) for _ in models]
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        for model, photo in zip(models, photos):
+            z.writestr(f"{model}_front.jpg", photo)
+    backend = "rembg" if server.get_rembg_remove() else "Pillow fallback"
+    print(f"{args.images} photos of {width}x{height} ({archive.tell() / 1024 / 1024:.1f} MB zipped); background removal: {backend}")
+
+    started = time.perf_counter(); legacy_process(photos[0]); legacy = time.perf_counter() - started
+    started = time.perf_counter(); server.process_product_image(photos[0]); current = time.perf_counter() - started
+    print(f"  one photo        per-pixel loop {legacy * 1000:8.1f} ms   process_product_image {current * 1000:8.1f} ms")
+
+    started = time.perf_counter()
+    for model, photo in zip(models, photos):
+        response = client.post(f"/api/upload-image/{model}", data={"image": (io.BytesIO(photo), "photo.jpg")},
+                               content_type="multipart/form-data")
+        assert response.status_code == 200, response.get_json()
+    print(f"  {args.images} x /api/upload-image              {time.perf_counter() - started:8.2f} s")
+
+    for workers in sorted({1, args.workers}):
+        server.IMAGE_WORKERS = workers
+        started = time.perf_counter()
+        response = client.post("/api/admin/upload-images-zip", data={"images_zip": (io.BytesIO(archive.getvalue()), "photos.zip")},
+                               content_type="multipart/form-data")
+        seconds = time.perf_counter() - started
+        report = response.get_json()
+        assert report["summary"]["linked"] == args.images, report["summary"]
+        print(f"  ZIP import, {workers:>2} worker{'s' if workers > 1 else ' '}         {seconds:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/json_benchmark.py
+# -------------------------------------------------------------------
+# Payload size and encode time for the large JSON responses. Builds a
+# synthetic catalog in the shape /api/products returns, encodes it with the
+# stdlib and orjson providers, compresses it with gzip and brotli, and then
+# checks the end-to-end /api/products response through the Flask app.
+#
+#   python benchmarks/json_benchmark.py --products 50000
+# -------------------------------------------------------------------
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import jwt
+
+import synthetic_data
+
+
+def timed(fn, repeat):
+    """Returns (median seconds, last result) over `repeat` calls."""
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter(); result = fn(); samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def build_catalog(count):
+    catalog = {}
+    for category, model, description, price, stock, _, status in synthetic_data.synthetic_products(count, random.Random(7)):
+        catalog.setdefault(category, []).append({"model": model, "description": description, "price": price, "stock": stock,
+                                                 "imageUrl": f"/uploads/{model}.png", "status": status})
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure JSON encode time and compressed payload sizes.")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    import server
+    from flask.json.provider import DefaultJSONProvider
+
+    catalog = build_catalog(args.products)
+    providers = {"stdlib": DefaultJSONProvider(server.app)}
+    if server.ORJSON_AVAILABLE:
+        providers["orjson"] = server.OrjsonProvider(server.app)
+
+    print(f"Catalog: {args.products} products")
+    body = None
+    for name, provider in providers.items():
+        with server.app.app_context():
+            seconds, response = timed(lambda: provider.response(catalog), args.repeat)
+        body = response.get_data()
+        print(f"  encode {name:<7} {seconds * 1000:>8.1f} ms  {len(body):>10,} bytes")
+
+    encodings = ["gzip"] + (["br"] if server.BROTLI_AVAILABLE else [])
+    for encoding in encodings:
+        seconds, compressed = timed(lambda: server.compress_body(body, encoding), args.repeat)
+        print(f"  {encoding:<14} {seconds * 1000:>8.1f} ms  {len(compressed):>10,} bytes ({len(compressed) / len(body):.1%})")
+
+    # End to end through the real route against a synthetic database.
+    db_path = os.path.join(tempfile.mkdtemp(prefix="json_bench_"), "quotes.db")
+    synthetic_data.generate(db_path, products=args.products, quotes=0, users=2, verbose=False)
+    server.DB_FILE = db_path
+    client = server.app.test_client()
+    token = jwt.encode({"user_id": 1, "role": "admin", "exp": datetime.utcnow() + timedelta(hours=1)},
+                       server.app.config["SECRET_KEY"], algorithm="HS256")
+    client.set_cookie("token", token)
+    print(f"/api/products end to end (encoder: {server.app.json.__class__.__name__})")
+    for accept in ["identity", "gzip"] + (["br"] if server.BROTLI_AVAILABLE else []):
+        seconds, response = timed(lambda: client.get("/api/products", headers={"Accept-Encoding": accept}), args.repeat)
+        print(f"  Accept-Encoding {accept:<9} {seconds * 1000:>8.1f} ms  {len(response.data):>10,} bytes  "
+              f"Content-Encoding={response.headers.get('Content-Encoding', '-')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/live_dashboard_benchmark.py
+# -------------------------------------------------------------------
+# Server cost of keeping dashboards current. Runs the app on a threaded
+# local server and, for the same wall-clock window, measures the process CPU
+# time (client threads included) used by N dashboards that (a) re-fetch
+# /api/dashboard-stats and /api/admin/all-quotes every --interval seconds,
+# and (b) sit on /api/admin/events with nothing changing. Then times how
+# long a stock update takes to reach every open stream.
+#
+#   python benchmarks/live_dashboard_benchmark.py --products 20000 --quotes 20000 --clients 20
+# -------------------------------------------------------------------
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import http.client
+import statistics
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import jwt
+from werkzeug.serving import make_server
+
+import synthetic_data
+
+PORT = 5091
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+def polling_client(token, interval, stop):
+    conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=60)
+    while not stop.is_set():
+        for url in ("/api/dashboard-stats", "/api/admin/all-quotes"):
+            conn.request("GET", url, headers={"Cookie": f"token={token}"})
+            conn.getresponse().read()
+        stop.wait(interval)
+    conn.close()
+
+
+def sse_client(token, stop, received, ready):
+    """Reads events until `stop` is set; records when each stock event arrives."""
+    conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=60)
+    conn.request("GET", "/api/admin/events", headers={"Cookie": f"token={token}"})
+    response = conn.getresponse()
+    ready.release()
+    while not stop.is_set():
+        line = response.fp.readline()
+        if not line: break
+        if line.startswith(b"event: stock"):
+            received.append(time.perf_counter())
+    conn.close()
+
+
+def run_window(seconds, clients, target, *args):
+    stop = threading.Event()
+    threads = [threading.Thread(target=target, args=(*args, stop), daemon=True) for _ in range(clients)]
+    for t in threads: t.start()
+    time.sleep(1)  # let connections settle before measuring
+    started = cpu_seconds()
+    time.sleep(seconds)
+    used = cpu_seconds() - started
+    stop.set()
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare polling and SSE dashboards.")
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--quotes", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=30, help="Polling interval per dashboard, seconds.")
+    parser.add_argument("--seconds", type=float, default=30, help="Measurement window.")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="live_dashboard_bench_"), "quotes.db")
+    synthetic_data.generate(db_path, products=args.products, quotes=args.quotes, users=5, verbose=False)
+    import server
+    server.DB_FILE = db_path
+    server.SSE_MAX_SECONDS = args.seconds * 10
+    server.SSE_MAX_STREAMS = args.clients  # one process stands in for the whole gunicorn pool here
+    server.init_db()
+    with server.app.app_context():
+        db = server.get_db(); cur = db.cursor()
+        cur.execute("INSERT INTO users (name, email, password, role, is_approved) VALUES ('Bench Admin', 'bench-admin@example.com', 'x', 'admin', 1)")
+        admin_id = cur.lastrowid
+        cur.execute("SELECT model FROM products LIMIT 1")
+        model = cur.fetchone()["model"]
+        db.commit()
+    token = jwt.encode({"user_id": admin_id, "role": "admin", "exp": datetime.utcnow() + timedelta(hours=1)},
+                       server.app.config["SECRET_KEY"], algorithm="HS256")
+
+    httpd = make_server("127.0.0.1", PORT, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    print(f"{args.products:,} products, {args.quotes:,} quotes; {args.clients} dashboards for {args.seconds:.0f} s")
+    used = run_window(args.seconds, args.clients, polling_client, token, args.interval)
+    print(f"  polling every {args.interval:.0f} s   server CPU {used:7.2f} s")
+
+    received, ready = [], threading.Semaphore(0)
+    stop = threading.Event()
+    listeners = [threading.Thread(target=sse_client, args=(token, stop, received, ready), daemon=True) for _ in range(args.clients)]
+    for t in listeners: t.start()
+    for _ in listeners: ready.acquire()
+    time.sleep(1)
+    started = cpu_seconds()
+    time.sleep(args.seconds)
+    used = cpu_seconds() - started
+    print(f"  idle SSE streams      server CPU {used:7.2f} s")
+
+    client = server.app.test_client()
+    client.set_cookie("token", token)
+    latencies = []
+    for stock in range(3):
+        del received[:]
+        sent = time.perf_counter()
+        client.post("/api/update-stock", json={"model": model, "stock": stock})
+        deadline = time.time() + 10
+        while len(received) < args.clients and time.time() < deadline:
+            time.sleep(0.01)
+        latencies.extend(t - sent for t in received)
+        if len(received) < args.clients:
+            sys.exit(f"only {len(received)} of {args.clients} streams received the stock event")
+    stop.set()
+    print(f"  stock update -> all streams  p50 {statistics.median(latencies) * 1000:6.0f} ms  "
+          f"max {max(latencies) * 1000:6.0f} ms (poll interval {server.SSE_POLL_SECONDS:g} s)")
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
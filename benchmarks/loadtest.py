@@ -0,0 +1,215 @@
+# benchmarks/loadtest.py
+# -------------------------------------------------------------------
+# Load-testing harness. Generates (or reuses) a synthetic dataset, boots the
+# Flask app under a local gunicorn, drives the main routes with concurrent
+# clients and writes p50/p95/p99 latency and throughput to a JSON file so
+# runs can be compared over time.
+#
+#   python benchmarks/loadtest.py --label baseline
+#   python benchmarks/loadtest.py --products 2000 --quotes 5000 --requests 100
+#   python benchmarks/loadtest.py --compare results/old.json results/new.json
+# -------------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import subprocess
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import jwt
+import requests
+
+import synthetic_data
+
+BENCH_SECRET = "loadtest-secret-not-for-production-use"
+ROUTES = ["products", "calculate", "save-quote", "dashboard-stats", "all-quotes", "export-pdf", "quote-pdf", "admin-quote-pdf"]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values: return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(work_dir, port, workers, threads):
+    # --chdir makes the relative DB_FILE/COUNTERS_FILE/UPLOAD_FOLDER resolve
+    # inside the scratch directory instead of the working copy.
+    env = dict(os.environ, JWT_SECRET=BENCH_SECRET)
+    cmd = [sys.executable, "-m", "gunicorn", "--workers", str(workers), "--threads", str(threads),
+           "--bind", f"127.0.0.1:{port}", "--chdir", work_dir, "--pythonpath", REPO_DIR,
+           "--timeout", "300", "--log-level", "warning", "server:app"]
+    proc = subprocess.Popen(cmd, env=env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=5); return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("gunicorn did not start within 60s")
+
+
+def load_fixture(db_path):
+    """Reads the ids the scenarios need straight from the generated database."""
+    import sqlite3
+    conn = sqlite3.connect(db_path); conn.row_factory = sqlite3.Row
+    admin = conn.execute("SELECT id FROM users WHERE role = 'admin' ORDER BY id LIMIT 1").fetchone()["id"]
+    users = [r["id"] for r in conn.execute("SELECT id FROM users WHERE role = 'user'")]
+    models = [(r["model"], r["description"], r["price"]) for r in conn.execute("SELECT model, description, price FROM products LIMIT 2000")]
+    quotes = [(r["id"], r["user_id"]) for r in conn.execute("SELECT id, user_id FROM quotes ORDER BY random() LIMIT 2000")]
+    conn.close()
+    return admin, users, models, quotes
+
+
+def make_token(user_id, role):
+    return jwt.encode({"user_id": user_id, "role": role, "exp": datetime.utcnow() + timedelta(hours=6)}, BENCH_SECRET, algorithm="HS256")
+
+
+def build_request(route, rng, fixture):
+    """Returns (method, path, json_body, role, user_id) for one request of a scenario."""
+    admin, users, models, quotes = fixture
+    user_id = rng.choice(users) if users else admin
+    items = [{"model": m, "description": d, "price": p, "quantity": rng.randint(1, 5)} for m, d, p in rng.sample(models, min(len(models), rng.randint(3, 25)))]
+    if route == "products": return "GET", "/api/products", None, "user", user_id
+    if route == "calculate": return "POST", "/api/calculate", {"items": items, "installationCost": 500, "discountPercent": 5}, "user", user_id
+    if route == "save-quote":
+        return "POST", "/api/save-quote", {"customerName": "Load Test", "projectName": f"Bench {rng.randint(1, 10**6)}", "items": items,
+                                           "installationCost": 500, "discountPercent": 5}, "user", user_id
+    if route == "dashboard-stats": return "GET", "/api/dashboard-stats", None, "admin", admin
+    if route == "all-quotes": return "GET", "/api/admin/all-quotes", None, "admin", admin
+    if route == "export-pdf":
+        return "POST", "/api/export-pdf", {"quoteData": items, "customerInfo": {"name": "Load Test", "project": "Bench"},
+                                           "installationCost": 500, "discountPercent": 5}, "user", user_id
+    if route == "quote-pdf":
+        quote_id, owner = rng.choice(quotes)
+        return "GET", f"/api/user/quote-pdf/{quote_id}", None, "user", owner
+    if route == "admin-quote-pdf":
+        quote_id, _ = rng.choice(quotes)
+        return "GET", f"/api/admin/quote-pdf/{quote_id}", None, "admin", admin
+    raise ValueError(f"Unknown route {route}")
+
+
+def run_route(base_url, route, fixture, num_requests, concurrency, seed):
+    rng = random.Random(seed)
+    planned = [build_request(route, rng, fixture) for _ in range(num_requests)]
+    tokens = {}
+
+    def one(req):
+        method, path, body, role, user_id = req
+        token = tokens.setdefault((role, user_id), make_token(user_id, role))
+        started = time.perf_counter()
+        try:
+            resp = requests.request(method, base_url + path, json=body, cookies={"token": token}, timeout=300)
+            return time.perf_counter() - started, resp.status_code, len(resp.content)
+        except requests.RequestException:
+            return time.perf_counter() - started, 0, 0
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, planned))
+    wall = time.perf_counter() - wall_start
+
+    latencies = sorted(s[0] * 1000 for s in samples)
+    statuses = {}
+    for _, code, _ in samples: statuses[str(code)] = statuses.get(str(code), 0) + 1
+    ok = sum(1 for _, code, _ in samples if 200 <= code < 300)
+    return {
+        "requests": num_requests, "concurrency": concurrency, "ok": ok, "errors": num_requests - ok, "statuses": statuses,
+        "wall_seconds": round(wall, 3), "throughput_rps": round(num_requests / wall, 2) if wall else None,
+        "mean_ms": round(statistics.fmean(latencies), 2), "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2), "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2), "mean_bytes": int(statistics.fmean(s[2] for s in samples)),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f: old = json.load(f)
+    with open(new_path) as f: new = json.load(f)
+    print(f"{'route':<18}{'p50 old':>10}{'p50 new':>10}{'p95 old':>10}{'p95 new':>10}{'rps old':>10}{'rps new':>10}")
+    for route in new["routes"]:
+        o, n = old["routes"].get(route), new["routes"][route]
+        if not o: continue
+        print(f"{route:<18}{o['p50_ms']:>10}{n['p50_ms']:>10}{o['p95_ms']:>10}{n['p95_ms']:>10}{o['throughput_rps']:>10}{n['throughput_rps']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the quotation tool under gunicorn and load-test its main routes.")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--quotes", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--db", help="Reuse this synthetic database instead of generating one.")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="Comma-separated subset of: " + ", ".join(ROUTES))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route.")
+    parser.add_argument("--pdf-requests", type=int, default=20, help="Requests per PDF route (they are much slower).")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn worker processes.")
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker.")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output-dir", default=os.path.join(BENCH_DIR, "results"))
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Print a side-by-side of two result files and exit.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare); return
+
+    work_dir = tempfile.mkdtemp(prefix="loadtest_")
+    db_path = os.path.join(work_dir, "quotes.db")
+    if args.db:
+        import shutil
+        shutil.copyfile(args.db, db_path)
+        dataset = {"source": os.path.abspath(args.db), "db_bytes": os.path.getsize(db_path)}
+    else:
+        dataset = synthetic_data.generate(db_path, args.products, args.quotes, args.users)
+    fixture = load_fixture(db_path)
+
+    port = free_port()
+    proc = start_gunicorn(work_dir, port, args.workers, args.threads)
+    base_url = f"http://127.0.0.1:{port}"
+    results = {}
+    try:
+        for i, route in enumerate(r.strip() for r in args.routes.split(",") if r.strip()):
+            count = args.pdf_requests if "pdf" in route else args.requests
+            results[route] = run_route(base_url, route, fixture, count, args.concurrency, seed=i)
+            r = results[route]
+            print(f"{route:<18} n={r['requests']:<5} ok={r['ok']:<5} p50={r['p50_ms']:>9}ms p95={r['p95_ms']:>9}ms "
+                  f"p99={r['p99_ms']:>9}ms {r['throughput_rps']:>8} req/s")
+    finally:
+        proc.terminate(); proc.wait(timeout=30)
+
+    report = {"label": args.label, "timestamp": datetime.now().isoformat(timespec="seconds"), "git": git_revision(),
+              "dataset": dataset, "config": {"workers": args.workers, "threads": args.threads, "concurrency": args.concurrency},
+              "routes": results}
+    os.makedirs(args.output_dir, exist_ok=True)
+    out = os.path.join(args.output_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{args.label}.json")
+    with open(out, "w") as f: json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
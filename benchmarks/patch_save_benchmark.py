@@ -0,0 +1,108 @@
+# benchmarks/patch_save_benchmark.py
+# -------------------------------------------------------------------
+# Full-body saves (POST /api/save-quote) against JSON Patch saves
+# (PATCH /api/save-quote/<id> with If-Match) for the same sequence of small
+# edits to a large quote: request bytes, server time per save and bytes
+# added to quote_revisions. Also checks that both end in the same quote and
+# that a stale If-Match is refused.
+#
+#   python benchmarks/patch_save_benchmark.py --lines 300 --edits 200
+# -------------------------------------------------------------------
+import os
+import sys
+import copy
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+import jsonpatch
+import server
+
+from revision_storage_benchmark import random_line, edit
+
+
+def revision_bytes(quote_id):
+    with server.app.app_context():
+        cur = server.get_db().cursor()
+        cur.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) AS n FROM quote_revisions WHERE quote_id = ?", (quote_id,))
+        return cur.fetchone()["n"]
+
+
+def run(client, start, edits, rng_seed, use_patch):
+    rng = random.Random(rng_seed)
+    quote = copy.deepcopy(start)
+    response = client.post("/api/save-quote", json=quote)
+    quote["id"] = response.get_json()["id"]
+    stored = copy.deepcopy(quote)
+    # Re-save once with the id so both runs start from the same stored quote and version.
+    response = client.post("/api/save-quote", json=quote)
+    etag = response.headers["ETag"]
+    sent, times = 0, []
+    for n in range(edits):
+        edit(quote, rng, len(start["items"]) + n)
+        if use_patch:
+            body = json.dumps(jsonpatch.make_patch(stored, quote).patch)
+            started = time.perf_counter()
+            response = client.patch(f"/api/save-quote/{quote['id']}", data=body,
+                                    headers={"Content-Type": "application/json-patch+json", "If-Match": etag})
+        else:
+            body = json.dumps(quote)
+            started = time.perf_counter()
+            response = client.post("/api/save-quote", data=body, headers={"Content-Type": "application/json"})
+        times.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.get_json()
+        sent += len(body)
+        etag, stored = response.headers["ETag"], copy.deepcopy(quote)
+    final = client.get(f"/api/load-quote/{quote['id']}").get_json()
+    return quote["id"], etag, final, sent, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-body and JSON Patch quote saves.")
+    parser.add_argument("--lines", type=int, default=300)
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    server.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="patch_bench_"), "quotes.db")
+    server.init_db()
+    with server.app.app_context():
+        db = server.get_db(); cur = db.cursor()
+        cur.execute("INSERT INTO users (name, email, password, role, is_approved) VALUES ('Bench User', 'bench@example.com', 'x', 'user', 1)")
+        user_id = cur.lastrowid
+        db.commit()
+    client = server.app.test_client()
+    client.set_cookie("token", jwt.encode({"user_id": user_id, "role": "user", "exp": datetime.utcnow() + timedelta(hours=1)},
+                                          server.app.config["SECRET_KEY"], algorithm="HS256"))
+
+    rng = random.Random(args.seed)
+    start = {"customerName": "Benchmark Co", "projectName": "Villa 1", "installationCost": 2500, "discountPercent": 0,
+             "items": [random_line(rng, n) for n in range(args.lines)]}
+    print(f"Quote: {args.lines} lines, {len(json.dumps(start)):,} bytes as JSON; {args.edits} edits")
+    results = {}
+    for name, use_patch in (("POST full", False), ("PATCH", True)):
+        quote_id, etag, final, sent, times = run(client, start, args.edits, args.seed, use_patch)
+        results[name] = (quote_id, etag, final)
+        print(f"  {name:<10} sent {sent:>12,} bytes ({sent / args.edits:>9,.0f}/save)  "
+              f"server p50 {statistics.median(times) * 1000:6.2f} ms  p95 {sorted(times)[int(len(times) * 0.95)] * 1000:6.2f} ms  "
+              f"quote_revisions {revision_bytes(quote_id):>9,} bytes")
+
+    (full_id, _, full_final), (patch_id, etag, patch_final) = results["POST full"], results["PATCH"]
+    if {**full_final, "id": None} != {**patch_final, "id": None}:
+        sys.exit("PATCH and POST runs ended in different quotes")
+    stale = client.patch(f"/api/save-quote/{patch_id}", json=[{"op": "replace", "path": "/projectName", "value": "late"}],
+                         headers={"If-Match": '"1"'})
+    if stale.status_code != 412:
+        sys.exit(f"stale If-Match was not refused ({stale.status_code})")
+    print(f"  both runs ended in the same quote; a stale If-Match got {stale.status_code} (current version {stale.get_json()['version']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/pdf_size_benchmark.py
+# -------------------------------------------------------------------
+# File size and render time of the quotation and contract PDFs with the
+# output optimisation off (PDF_OPTIMIZE=0) and on, across a sample set of
+# quotes of different lengths, plus the merged document bundle. Needs
+# WeasyPrint or pdfkit/wkhtmltopdf installed.
+#
+#   python benchmarks/pdf_size_benchmark.py --lines 5 40 150 --runs 3 --image-dpi 150
+# -------------------------------------------------------------------
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+
+from revision_storage_benchmark import random_line
+
+
+def render(items, quote_id):
+    totals = server.calculate_totals(items, 1500, 5)
+    customer = {"name": "Benchmark Co", "project": "Villa 1"}
+    results = {}
+    for name, fn in (("quotation", server._generate_pdf_with_jinja), ("contract", server._generate_contract_pdf)):
+        started = time.perf_counter()
+        pdf = fn(items, customer, totals, quote_id)
+        results[name] = (len(pdf), time.perf_counter() - started)
+    started = time.perf_counter()
+    documents = server._generate_deal_bundle(items, customer, totals, quote_id)
+    pdf = server.merge_pdfs([(title, pdf_bytes) for title, stem, pdf_bytes in documents])
+    results["bundle"] = (len(pdf), time.perf_counter() - started)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF size and render time with and without output optimisation.")
+    parser.add_argument("--lines", type=int, nargs="+", default=[5, 40, 150], help="Line items per sample quote.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--image-dpi", type=int, default=server.PDF_IMAGE_DPI)
+    parser.add_argument("--seed", type=int, default=9)
+    args = parser.parse_args()
+
+    engine = server.get_pdf_engine()[0]
+    if engine is None:
+        sys.exit("No PDF engine found. Install pdfkit+wkhtmltopdf or WeasyPrint.")
+    # The generators draw quotation/BOM numbers; keep them away from the real counters.json.
+    server.COUNTERS_FILE = os.path.join(tempfile.mkdtemp(prefix="pdf_size_bench_"), "counters.json")
+    server.PDF_IMAGE_DPI = args.image_dpi
+
+    rng = random.Random(args.seed)
+    samples = [(n, [random_line(rng, i) for i in range(n)]) for n in args.lines]
+    print(f"Engine: {engine}; image DPI {args.image_dpi}, JPEG quality {server.PDF_JPEG_QUALITY}; {args.runs} runs each")
+    render(samples[0][1], "QUO-WARMUP-1")
+
+    totals = {}
+    for lines, items in samples:
+        for optimize in (False, True):
+            server.PDF_OPTIMIZE = optimize
+            runs = [render(items, f"QUO-BENCH-{lines}") for _ in range(args.runs)]
+            for document in runs[0]:
+                size = runs[-1][document][0]
+                seconds = statistics.median(r[document][1] for r in runs)
+                totals.setdefault((document, optimize), [0, 0.0])
+                totals[(document, optimize)][0] += size
+                totals[(document, optimize)][1] += seconds
+                label = "optimized" if optimize else "original "
+                print(f"  {lines:>4} lines  {document:<9}  {label}  {size / 1024:8.1f} KB  {seconds * 1000:8.1f} ms")
+
+    print("Totals across the sample set")
+    for document in ("quotation", "contract", "bundle"):
+        (size_off, time_off), (size_on, time_on) = totals[(document, False)], totals[(document, True)]
+        print(f"  {document:<9}  {size_off / 1024:8.1f} KB -> {size_on / 1024:8.1f} KB ({size_on / size_off - 1:+.0%})  "
+              f"{time_off * 1000:8.1f} ms -> {time_on * 1000:8.1f} ms ({time_on / time_off - 1:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
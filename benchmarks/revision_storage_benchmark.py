@@ -0,0 +1,112 @@
+# benchmarks/revision_storage_benchmark.py
+# -------------------------------------------------------------------
+# Storage growth of the quote revision history. Saves one large quote
+# hundreds of times through /api/save-quote with autosave-sized edits
+# (quantity changes, added/removed lines, renamed project), then reports the
+# bytes kept in quote_revisions against keeping a full copy per save, checks
+# every revision rebuilds exactly, and times the slowest rebuild.
+#
+#   python benchmarks/revision_storage_benchmark.py --lines 300 --edits 500
+# -------------------------------------------------------------------
+import os
+import sys
+import copy
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+import server
+
+
+def random_line(rng, n):
+    model = f"MDL-{n:05d}"
+    return {"uniqueId": model, "model": model, "description": f"Smart device {n} with a reasonably long catalog description",
+            "price": round(rng.uniform(20, 4000), 2), "quantity": rng.randint(1, 12), "category": rng.choice(["Lighting", "Security", "Audio", "HVAC"])}
+
+
+def edit(quote, rng, counter):
+    items = quote["items"]
+    roll = rng.random()
+    if roll < 0.70:
+        rng.choice(items)["quantity"] = rng.randint(1, 20)
+    elif roll < 0.82:
+        items.insert(rng.randrange(len(items) + 1), random_line(rng, counter))
+    elif roll < 0.94 and len(items) > 1:
+        items.pop(rng.randrange(len(items)))
+    elif roll < 0.97:
+        quote["discountPercent"] = rng.choice([0, 5, 10, 12.5])
+    else:
+        quote["projectName"] = f"Villa {rng.randint(1, 400)} - phase {rng.randint(1, 3)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure quote_revisions storage growth for a heavily edited quote.")
+    parser.add_argument("--lines", type=int, default=300)
+    parser.add_argument("--edits", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    server.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="revisions_bench_"), "quotes.db")
+    server.init_db()
+    with server.app.app_context():
+        db = server.get_db(); cur = db.cursor()
+        cur.execute("INSERT INTO users (name, email, password, role, is_approved) VALUES ('Bench User', 'bench@example.com', 'x', 'user', 1)")
+        user_id = cur.lastrowid
+        db.commit()
+
+    client = server.app.test_client()
+    client.set_cookie("token", jwt.encode({"user_id": user_id, "role": "user", "exp": datetime.utcnow() + timedelta(hours=1)},
+                                          server.app.config["SECRET_KEY"], algorithm="HS256"))
+
+    quote = {"customerName": "Benchmark Co", "projectName": "Villa 1", "installationCost": 2500, "discountPercent": 0,
+             "items": [random_line(rng, n) for n in range(args.lines)]}
+    quote["id"] = client.post("/api/save-quote", json=quote).get_json()["id"]
+    versions, save_times = [copy.deepcopy(quote)], []
+    for n in range(args.edits):
+        edit(quote, rng, args.lines + n)
+        started = time.perf_counter()
+        client.post("/api/save-quote", json=quote)
+        save_times.append(time.perf_counter() - started)
+        if quote != versions[-1]:  # unchanged saves do not add a revision
+            versions.append(copy.deepcopy(quote))
+
+    listing = client.get(f"/api/quotes/{quote['id']}/revisions").get_json()
+    stored = sum(r["stored_bytes"] for r in listing)
+    snapshots = sum(1 for r in listing if r["kind"] == "snapshot")
+    full_copies = sum(len(json.dumps(v)) for v in versions)
+    if len(listing) != len(versions):
+        sys.exit(f"expected {len(versions)} revisions, found {len(listing)}")
+
+    # The first save was posted without an id, so revision 1 has none.
+    rebuild_times, mismatches = [], 0
+    for revision, expected in enumerate(versions, start=1):
+        started = time.perf_counter()
+        rebuilt = client.get(f"/api/quotes/{quote['id']}/revisions/{revision}").get_json()
+        rebuild_times.append(time.perf_counter() - started)
+        rebuilt.setdefault("id", expected["id"])
+        mismatches += rebuilt != expected
+
+    print(f"Quote: {args.lines} lines, {len(json.dumps(versions[-1])):,} bytes as JSON; {args.edits} edits, "
+          f"snapshot every {server.QUOTE_SNAPSHOT_INTERVAL} revisions")
+    print(f"  revisions stored       {len(listing):>10} ({snapshots} snapshots)")
+    print(f"  full copy per save     {full_copies:>10,} bytes")
+    print(f"  quote_revisions        {stored:>10,} bytes ({stored / full_copies:.1%} of full copies, "
+          f"{stored / len(listing):,.0f} bytes/revision)")
+    print(f"  database file          {os.path.getsize(server.DB_FILE):>10,} bytes")
+    print(f"  save p50 / max         {statistics.median(save_times) * 1000:>8.1f} / {max(save_times) * 1000:.1f} ms")
+    print(f"  rebuild p50 / max      {statistics.median(rebuild_times) * 1000:>8.1f} / {max(rebuild_times) * 1000:.1f} ms")
+    if mismatches:
+        sys.exit(f"{mismatches} revisions did not rebuild to the saved quote")
+    print("  every revision rebuilt exactly")
+
+
+if __name__ == "__main__":
+    main()
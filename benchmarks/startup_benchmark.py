@@ -0,0 +1,115 @@
+# benchmarks/startup_benchmark.py
+# -------------------------------------------------------------------
+# Measures what a gunicorn worker pays to boot the app: wall time and
+# `-X importtime` breakdown of `import server`, plus resident memory after
+# the import. Pass --compare-rev to run the same measurement against an
+# older revision of server.py (checked out into a scratch directory) and
+# print both side by side.
+#
+#   python benchmarks/startup_benchmark.py
+#   python benchmarks/startup_benchmark.py --compare-rev HEAD~1 --runs 5
+# -------------------------------------------------------------------
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# Runs inside the child interpreter: import the app, then report wall time and RSS.
+PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import server
+elapsed = time.perf_counter() - started
+rss_kb = 0
+try:
+    with open('/proc/self/status') as f:
+        rss_kb = next(int(l.split()[1]) for l in f if l.startswith('VmRSS:'))
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': rss_kb //= 1024
+print(json.dumps({'import_seconds': elapsed, 'rss_kb': rss_kb, 'modules': len(sys.modules)}))
+"""
+
+
+def parse_importtime(stderr, top):
+    """Returns the `top` slowest imports made directly by server.py as (module, cumulative_ms)."""
+    rows, pending = [], []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"): continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit(): continue
+        # The module column is indented two spaces per nesting level, and a
+        # parent is printed after its children.
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        name, cumulative_ms = parts[2].strip(), int(parts[1]) / 1000.0
+        if depth == 1:
+            pending.append((name, cumulative_ms))
+        elif depth == 0:
+            if name == "server": rows = pending + [(name, cumulative_ms)]
+            pending = []
+    return sorted(rows, key=lambda r: r[1], reverse=True)[:top]
+
+
+def measure(app_dir, runs, top):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], cwd=app_dir, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(f"import server failed in {app_dir}:\n{out.stderr[-2000:]}")
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    timed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"], cwd=app_dir, env=env,
+                           capture_output=True, text=True)
+    return {
+        "import_ms_median": round(statistics.median(s["import_seconds"] for s in samples) * 1000, 1),
+        "rss_mb_median": round(statistics.median(s["rss_kb"] for s in samples) / 1024, 1),
+        "modules_loaded": samples[0]["modules"],
+        "slowest_imports_ms": parse_importtime(timed.stderr, top),
+    }
+
+
+def checkout_revision(rev):
+    """Copies the app files as they were at `rev` into a scratch directory."""
+    target = tempfile.mkdtemp(prefix="startup_bench_")
+    archive = subprocess.run(["git", "archive", rev], cwd=REPO_DIR, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", target], input=archive, check=True)
+    return target
+
+
+def print_report(label, result):
+    print(f"[{label}] import {result['import_ms_median']} ms, RSS {result['rss_mb_median']} MB, "
+          f"{result['modules_loaded']} modules loaded")
+    for name, ms in result["slowest_imports_ms"]:
+        print(f"    {ms:>9.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and per-worker RSS of server.py.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement (median is reported).")
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to list.")
+    parser.add_argument("--compare-rev", help="Also measure this git revision (e.g. HEAD~1) for a before/after view.")
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    results = {"current": measure(REPO_DIR, args.runs, args.top)}
+    if args.compare_rev:
+        results[args.compare_rev] = measure(checkout_revision(args.compare_rev), args.runs, args.top)
+        print_report(args.compare_rev, results[args.compare_rev])
+    print_report("current", results["current"])
+    if args.compare_rev:
+        before, after = results[args.compare_rev], results["current"]
+        print(f"import time {before['import_ms_median']} -> {after['import_ms_median']} ms, "
+              f"RSS {before['rss_mb_median']} -> {after['rss_mb_median']} MB")
+    if args.json:
+        with open(args.json, "w") as f: json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
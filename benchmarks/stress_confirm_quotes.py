@@ -0,0 +1,136 @@
+# benchmarks/stress_confirm_quotes.py
+# -------------------------------------------------------------------
+# Concurrency stress test for /api/admin/quote/confirm/<quote_id>.
+# Several processes confirm hundreds of overlapping quotes (every quote is
+# submitted by two workers) against a scratch SQLite database, then the
+# final stock levels are checked against the quotes that actually got
+# confirmed. Exits non-zero if stock went negative or was double-deducted.
+#
+#   python benchmarks/stress_confirm_quotes.py --quotes 400 --workers 8
+# -------------------------------------------------------------------
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import time
+import multiprocessing
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+import server
+
+
+def seed_database(db_path, num_products, num_quotes, seed):
+    rng = random.Random(seed)
+    server.DB_FILE = db_path
+    server.init_db()
+    with server.app.app_context():
+        db = server.get_db(); cur = db.cursor()
+        cur.execute("INSERT INTO users (name, email, password, role, is_approved) VALUES (?, ?, ?, 'admin', 1)",
+                    ("Stress Admin", "stress@example.com", "x"))
+        admin_id = cur.lastrowid
+        models = [f"STRESS-{i:03d}" for i in range(num_products)]
+        # Keep stock tight so a good share of confirmations must be refused.
+        stock = {m: rng.randint(50, 150) for m in models}
+        cur.executemany("INSERT INTO products (category, model, description, price, stock) VALUES (?, ?, ?, ?, ?)",
+                        [("Stress", m, f"Stress device {m}", 100.0, stock[m]) for m in models])
+        quote_ids = []
+        for q in range(num_quotes):
+            # A few "hot" models appear in most quotes to force overlap, and the
+            # same model is sometimes repeated on two lines of one quote.
+            lines = [{"model": rng.choice(models[:3]), "quantity": rng.randint(1, 3)}]
+            lines += [{"model": rng.choice(models), "quantity": rng.randint(1, 4)} for _ in range(rng.randint(1, 4))]
+            quote_id = f"QUO-STRESS-{q:05d}"
+            quote_ids.append(quote_id)
+            cur.execute("INSERT INTO quotes (id, user_id, customer_name, project_name, quote_data) VALUES (?, ?, ?, ?, ?)",
+                        (quote_id, admin_id, "Stress", "Stress", json.dumps({"items": lines})))
+        db.commit()
+    return admin_id, stock, quote_ids
+
+
+def confirm_worker(args):
+    db_path, token, quote_ids = args
+    server.DB_FILE = db_path
+    client = server.app.test_client()
+    try:
+        client.set_cookie("token", token)
+    except TypeError:  # Werkzeug < 2.3 takes the server name first
+        client.set_cookie("localhost", "token", token)
+    results = []
+    for quote_id in quote_ids:
+        resp = client.post(f"/api/admin/quote/confirm/{quote_id}")
+        results.append((quote_id, resp.status_code))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test concurrent quote confirmation.")
+    parser.add_argument("--quotes", type=int, default=400)
+    parser.add_argument("--products", type=int, default=25)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="stress_confirm_")
+    db_path = os.path.join(tmp_dir, "stress.db")
+    admin_id, initial_stock, quote_ids = seed_database(db_path, args.products, args.quotes, args.seed)
+    token = jwt.encode({"user_id": admin_id, "role": "admin", "exp": datetime.utcnow() + timedelta(hours=1)},
+                       server.app.config["SECRET_KEY"], algorithm="HS256")
+
+    # Every quote goes to two different workers, each in its own shuffled order.
+    rng = random.Random(args.seed)
+    batches = [[] for _ in range(args.workers)]
+    for i, quote_id in enumerate(quote_ids):
+        first = i % args.workers
+        second = (first + 1 + rng.randrange(args.workers - 1)) % args.workers if args.workers > 1 else first
+        batches[first].append(quote_id)
+        batches[second].append(quote_id)
+    for batch in batches: rng.shuffle(batch)
+
+    started = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        results = [r for chunk in pool.map(confirm_worker, [(db_path, token, b) for b in batches]) for r in chunk]
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(code for _, code in results)
+    accepted = Counter(quote_id for quote_id, code in results if code == 200)
+
+    server.DB_FILE = db_path
+    with server.app.app_context():
+        cur = server.get_db().cursor()
+        cur.execute("SELECT model, stock FROM products")
+        final_stock = {r["model"]: r["stock"] for r in cur.fetchall()}
+        cur.execute("SELECT id, quote_data FROM quotes WHERE status = 'Confirmed'")
+        confirmed = {r["id"]: json.loads(r["quote_data"])["items"] for r in cur.fetchall()}
+
+    expected_use = Counter()
+    for items in confirmed.values():
+        for item in items: expected_use[item["model"]] += int(item["quantity"])
+
+    failures = []
+    negative = {m: s for m, s in final_stock.items() if s < 0}
+    if negative: failures.append(f"negative stock: {negative}")
+    double = [q for q, n in accepted.items() if n > 1]
+    if double: failures.append(f"quotes confirmed more than once: {double[:10]}")
+    if not confirmed: failures.append(f"no quote was confirmed at all; statuses={dict(statuses)}")
+    if set(accepted) != set(confirmed): failures.append("200 responses do not match quotes marked Confirmed")
+    drift = {m: (initial_stock[m] - final_stock[m], expected_use[m]) for m in initial_stock
+             if initial_stock[m] - final_stock[m] != expected_use[m]}
+    if drift: failures.append(f"deducted != confirmed quantities (deducted, expected): {drift}")
+
+    print(f"requests={len(results)} workers={args.workers} elapsed={elapsed:.2f}s "
+          f"throughput={len(results) / elapsed:.1f} req/s statuses={dict(statuses)}")
+    print(f"confirmed={len(confirmed)}/{len(quote_ids)} min_stock={min(final_stock.values())}")
+    if failures:
+        for f in failures: print(f"FAIL: {f}")
+        sys.exit(1)
+    print("OK: stock never went negative and every confirmation deducted exactly once.")
+
+
+if __name__ == "__main__":
+    main()
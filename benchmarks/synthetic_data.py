@@ -0,0 +1,110 @@
+# benchmarks/synthetic_data.py
+# -------------------------------------------------------------------
+# Builds a realistic-sized quotes.db (products, users, quote history) for
+# load tests and benchmarks. The schema comes from server.init_db() so the
+# dataset always matches what the app expects.
+#
+#   python benchmarks/synthetic_data.py --out /tmp/bench/quotes.db \
+#       --products 50000 --quotes 200000 --users 500
+# -------------------------------------------------------------------
+import os
+import sys
+import json
+import random
+import argparse
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+CATEGORIES = ["Lighting", "Switches", "Sensors", "Security", "Audio", "Climate", "Curtains", "Gateways", "Panels", "Accessories"]
+BENCH_PASSWORD = "bench-password"
+BATCH_SIZE = 5000
+
+
+def synthetic_products(count, rng):
+    """Yields (category, model, description, price, stock, imageFilename, status) rows."""
+    for i in range(count):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        model = f"SYN{i:06d}"
+        description = f"{category[:-1] if category.endswith('s') else category} device {model} rev {rng.randint(1, 9)}"
+        yield (category, model, description, round(rng.uniform(5, 2500), 2), rng.randint(0, 500), None, "Active")
+
+
+def synthetic_quote(rng, models, max_items=12):
+    items = []
+    for model in rng.sample(models, rng.randint(1, max_items)):
+        items.append({"model": model, "description": f"Synthetic {model}", "price": round(rng.uniform(5, 2500), 2),
+                      "quantity": rng.randint(1, 10)})
+    return {"items": items, "installationCost": rng.choice([0, 500, 1500]),
+            "discountPercent": rng.choice([0, 0, 5, 10])}
+
+
+def generate(db_path, products=50000, quotes=200000, users=500, seed=1234, verbose=True):
+    """Creates db_path from scratch and returns the sizes that were written."""
+    import server
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    if os.path.exists(db_path): os.remove(db_path)
+    server.DB_FILE = db_path
+    server.init_db()
+    with server.app.app_context():
+        db = server.get_db(); cur = db.cursor()
+
+        # One hash for every account: pbkdf2 per user would dominate generation time.
+        password_hash = generate_password_hash(BENCH_PASSWORD, method='pbkdf2:sha256')
+        cur.execute("INSERT INTO users (name, email, password, role, is_approved) VALUES (?, ?, ?, 'admin', 1)",
+                    ("Bench Admin", "admin@bench.local", password_hash))
+        cur.executemany("INSERT INTO users (name, email, password, role, is_approved) VALUES (?, ?, ?, 'user', 1)",
+                        [(f"Load User {i}", f"user{i}@bench.local", password_hash) for i in range(1, users)])
+
+        rows = synthetic_products(products, rng); batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                cur.executemany("INSERT INTO products (category, model, description, price, stock, imageFilename, status) VALUES (?, ?, ?, ?, ?, ?, ?)", batch); batch = []
+        if batch:
+            cur.executemany("INSERT INTO products (category, model, description, price, stock, imageFilename, status) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+
+        cur.execute("SELECT id FROM users"); user_ids = [r["id"] for r in cur.fetchall()]
+        models = [f"SYN{i:06d}" for i in range(products)]
+        now = datetime.now(); batch = []
+        for i in range(quotes):
+            # Two years of history, with a tenth of it landing in the current month.
+            ts = now - timedelta(days=rng.randint(0, now.day - 1)) if i % 10 == 0 else now - timedelta(days=rng.randint(0, 730))
+            data = synthetic_quote(rng, models)
+            data.update({"customerName": f"Customer {rng.randint(1, 20000)}", "projectName": f"Villa {i}"})
+            quote_id = f"QUO{ts.strftime('%Y%m%d')}BX{i:06d}"
+            data["id"] = quote_id
+            batch.append((quote_id, rng.choice(user_ids), data["customerName"], data["projectName"], json.dumps(data),
+                          ts.strftime('%Y-%m-%d %H:%M:%S'), rng.choice(["Draft", "Draft", "Draft", "Confirmed"])))
+            if len(batch) >= BATCH_SIZE:
+                cur.executemany("INSERT INTO quotes (id, user_id, customer_name, project_name, quote_data, timestamp, status) VALUES (?, ?, ?, ?, ?, ?, ?)", batch); batch = []
+        if batch:
+            cur.executemany("INSERT INTO quotes (id, user_id, customer_name, project_name, quote_data, timestamp, status) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        db.commit()
+
+    sizes = {"products": products, "quotes": quotes, "users": users, "seed": seed,
+             "db_bytes": os.path.getsize(db_path), "generate_seconds": round(time.perf_counter() - started, 2)}
+    if verbose:
+        print(f"Generated {db_path}: {sizes}")
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic quotes.db for benchmarking.")
+    parser.add_argument("--out", required=True, help="Path of the SQLite file to create (overwritten).")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--quotes", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    generate(args.out, args.products, args.quotes, args.users, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/xlsx_export_benchmark.py
+# -------------------------------------------------------------------
+# Memory and time of /api/admin/quotes-export.xlsx as the number of line
+# items grows. Peak Python allocations (tracemalloc) should stay flat for
+# the streaming export; --pandas adds the build-a-DataFrame-and-to_excel
+# approach for comparison.
+#
+#   python benchmarks/xlsx_export_benchmark.py --lines 10000 100000 --pandas
+# -------------------------------------------------------------------
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import jwt
+
+import synthetic_data
+
+# synthetic_quote() draws 1-12 lines per quote.
+AVERAGE_LINES_PER_QUOTE = 6.5
+
+
+def measure(fn):
+    """Times one untraced run, then repeats it under tracemalloc for the allocation peak."""
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def streaming_export(client):
+    response = client.get("/api/admin/quotes-export.xlsx")
+    assert response.status_code == 200, response.status_code
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    return size
+
+
+def pandas_export(server):
+    import io, json
+    import pandas as pd
+    with server.app.app_context():
+        cur = server.get_db().cursor()
+        cur.execute("SELECT id, quote_data FROM quotes")
+        rows = [{"quote": q["id"], **item} for q in cur.fetchall() for item in json.loads(q["quote_data"])["items"]]
+    buffer = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, index=False)
+    return buffer.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the streaming xlsx export's memory use.")
+    parser.add_argument("--lines", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--pandas", action="store_true", help="Also measure a pandas DataFrame export.")
+    args = parser.parse_args()
+
+    import server
+    server.new_workbook()  # import openpyxl up front so it doesn't count towards the first peak
+    for lines in args.lines:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="xlsx_bench_"), "quotes.db")
+        synthetic_data.generate(db_path, products=2000, quotes=int(lines / AVERAGE_LINES_PER_QUOTE), users=5, verbose=False)
+        server.DB_FILE = db_path
+        client = server.app.test_client()
+        client.set_cookie("token", jwt.encode({"user_id": 1, "role": "admin", "exp": datetime.utcnow() + timedelta(hours=1)},
+                                              server.app.config["SECRET_KEY"], algorithm="HS256"))
+        with server.app.app_context():
+            cur = server.get_db().cursor()
+            cur.execute("SELECT SUM(json_array_length(quote_data, '$.items')) AS n FROM quotes")
+            actual = cur.fetchone()["n"]
+
+        seconds, peak, size = measure(lambda: streaming_export(client))
+        print(f"{actual:>8,} line items  streaming  {seconds:6.1f} s  peak {peak / 1024 / 1024:7.1f} MB  xlsx {size / 1024 / 1024:6.1f} MB")
+        if args.pandas:
+            seconds, peak, size = measure(lambda: pandas_export(server))
+            print(f"{actual:>8,} line items  pandas     {seconds:6.1f} s  peak {peak / 1024 / 1024:7.1f} MB  xlsx {size / 1024 / 1024:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# build_assets.py
+# -------------------------------------------------------------------
+# Asset build step. Copies the JS/CSS under public/ to public/dist/ with a
+# content hash in the filename and precompresses each copy to .gz and .br.
+# Rewritten copies of the HTML pages that point at the hashed files go to
+# build/pages/, outside the public folder, so they are only reachable through
+# the page routes and their auth checks. server.py falls back to public/ for
+# anything that has not been built.
+#
+#   python build_assets.py
+# -------------------------------------------------------------------
+import os
+import re
+import gzip
+import json
+import shutil
+import hashlib
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except Exception:
+    BROTLI_AVAILABLE = False
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PUBLIC_DIR = os.path.join(BASE_DIR, "public")
+DIST_DIR = os.path.join(PUBLIC_DIR, "dist")
+PAGES_DIR = os.path.join(BASE_DIR, "build", "pages")
+ASSETS = ["js/script.js", "js/dashboard.js", "js/login.js", "js/register.js", "css/style.css"]
+PAGES = ["index.html", "dashboard.html", "login.html", "register.html"]
+
+
+def fingerprint(asset):
+    """Writes dist/<name>.<hash>.<ext> plus its .gz/.br siblings and returns the hashed path."""
+    with open(os.path.join(PUBLIC_DIR, asset), "rb") as f: data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem, ext = os.path.splitext(asset)
+    hashed = f"{stem}.{digest}{ext}"
+    target = os.path.join(DIST_DIR, hashed)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f: f.write(data)
+    # mtime=0 keeps the .gz byte-identical between builds of the same input.
+    with open(target + ".gz", "wb") as f: f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    sizes = {"raw": len(data), "gzip": os.path.getsize(target + ".gz")}
+    if BROTLI_AVAILABLE:
+        with open(target + ".br", "wb") as f: f.write(brotli.compress(data, quality=11))
+        sizes["br"] = os.path.getsize(target + ".br")
+    print(f"{asset} -> dist/{hashed} {sizes}")
+    return hashed
+
+
+def rewrite_page(page, manifest):
+    with open(os.path.join(PUBLIC_DIR, page), encoding="utf-8") as f: html = f.read()
+    for asset, hashed in manifest.items():
+        # Matches both relative ("js/script.js") and absolute ("/js/script.js") references.
+        html = re.sub(r'((?:src|href)=")/?' + re.escape(asset) + '"', r'\g<1>/dist/' + hashed + '"', html)
+    with open(os.path.join(PAGES_DIR, page), "w", encoding="utf-8") as f: f.write(html)
+
+
+def build():
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    shutil.rmtree(PAGES_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+    os.makedirs(PAGES_DIR)
+    if not BROTLI_AVAILABLE:
+        print("brotli is not installed; only .gz variants will be written.")
+    manifest = {asset: fingerprint(asset) for asset in ASSETS}
+    for page in PAGES:
+        rewrite_page(page, manifest)
+    with open(os.path.join(os.path.dirname(PAGES_DIR), "manifest.json"), "w") as f: json.dump(manifest, f, indent=2)
+    print(f"Wrote {len(manifest)} assets to {DIST_DIR} and {len(PAGES)} pages to {PAGES_DIR}")
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,63 @@
+# gc_uploads.py
+# -------------------------------------------------------------------
+# Garbage collector for the uploads folder, for cron. Every image upload
+# writes a new <model>_<ts>.png and every price import keeps its
+# prices_<ts>_*.xlsx copy; this removes the files that products,
+# device_images and the newest imports no longer reference, once they are
+# older than the retention window. Reports only, unless --apply is given.
+#
+#   python gc_uploads.py                       # dry run: what would go, and how much space
+#   python gc_uploads.py --apply --archive     # move them to UPLOAD_ARCHIVE_FOLDER
+#   python gc_uploads.py --apply --retention-days 90
+# -------------------------------------------------------------------
+import sys
+import argparse
+
+import server
+
+
+def human(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove uploads that nothing references any more.")
+    parser.add_argument("--apply", action="store_true", help="Actually delete (or archive) the files; default is a dry run.")
+    parser.add_argument("--archive", action="store_true", help=f"Move files to {server.UPLOAD_ARCHIVE_FOLDER}/ instead of deleting them.")
+    parser.add_argument("--retention-days", type=int, default=server.UPLOAD_RETENTION_DAYS,
+                        help="Only collect files last modified longer ago than this (default %(default)s).")
+    parser.add_argument("--verbose", "-v", action="store_true", help="List every collected file.")
+    args = parser.parse_args()
+    if args.retention_days < 1:
+        sys.exit("--retention-days must be at least 1")
+
+    server.init_db()
+    with server.app.app_context():
+        report = server.collect_upload_garbage(server.get_db(), apply=args.apply, archive=args.archive,
+                                               retention_days=args.retention_days)
+
+    verb = ("would archive" if args.archive else "would delete") if report["dry_run"] else ("archived" if args.archive else "deleted")
+    print(f"{report['files_scanned']} files ({human(report['bytes_scanned'])}) in {server.app.config['UPLOAD_FOLDER']}/: "
+          f"{report['referenced']} referenced, {report['kept_recent']} unreferenced but newer than {args.retention_days} days")
+    by_reason = {}
+    for f in report["files"]:
+        count, size = by_reason.get(f["reason"], (0, 0))
+        by_reason[f["reason"]] = (count + 1, size + f["bytes"])
+    for reason, (count, size) in sorted(by_reason.items()):
+        print(f"  {verb} {count} {reason} file(s), {human(size)}")
+    if args.verbose:
+        for f in report["files"]:
+            print(f"    {f['name']:<48} {human(f['bytes']):>9}  {f['modified']}  {f['reason']}")
+    print(f"Space {'reclaimable' if report['dry_run'] else 'reclaimed'}: {human(report['reclaimed_bytes'])}")
+    if report["missing_references"]:
+        print(f"Warning: {len(report['missing_references'])} referenced file(s) are missing, e.g. {report['missing_references'][0]}")
+    for e in report["errors"]:
+        print(f"Error: {e['name']}: {e['error']}", file=sys.stderr)
+    sys.exit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
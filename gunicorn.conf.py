@@ -0,0 +1,37 @@
+# gunicorn.conf.py
+# -------------------------------------------------------------------
+# Picked up automatically by `gunicorn server:app` when run from this folder.
+# Sets up the shared directory prometheus_client needs so /metrics reports
+# totals for all workers, not just the one that happened to serve the scrape.
+# -------------------------------------------------------------------
+import os
+import shutil
+import tempfile
+
+PROMETHEUS_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "radix-quotation-metrics"))
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5001")
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+# Threaded workers, so a dashboard holding /api/admin/events open ties up one
+# thread rather than a whole worker process. Each open dashboard holds its thread
+# for as long as it stays open, so a worker serves at most SSE_MAX_STREAMS
+# dashboards (default: half of GUNICORN_THREADS) and answers 503 beyond that.
+# Raise GUNICORN_THREADS, or GUNICORN_WORKERS, for more concurrent dashboards.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+timeout = 120
+
+
+def on_starting(server):
+    # Samples from a previous master would otherwise be summed into this run.
+    shutil.rmtree(PROMETHEUS_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+    except ImportError:
+        pass
@@ -31,6 +31,10 @@ fetch('/api/auth/status')
 document.addEventListener("DOMContentLoaded", () => {
     // --- STATE ---
     let allInventoryProducts = []; // To hold the master list of all products
+    let allQuotes = [];
+    let lowStockThreshold = 5; // Replaced by the server's threshold once the live feed connects
+    const lowStockProducts = new Map(); // model -> product, kept current by the live feed
+    let liveFeedConnected = false;
 
     // --- ELEMENTS ---
     const monthlyTotalValueEl = document.getElementById("monthly-total-value");
@@ -61,6 +65,7 @@ document.addEventListener("DOMContentLoaded", () => {
     const allQuotesWidget = document.getElementById("all-quotes-widget");
     const toggleAllQuotesBtn = document.getElementById("toggle-all-quotes-btn");
     const allQuotesTableBodyEl = document.getElementById("all-quotes-table-body");
+    const lowStockBadgeEl = document.getElementById("low-stock-badge");
 
 
     // --- MAIN DATA & RENDER LOGIC ---
@@ -157,7 +162,7 @@ document.addEventListener("DOMContentLoaded", () => {
             let statusClass, statusText, barClass;
             if (stock === 0) {
                 statusClass = 'out-of-stock'; statusText = 'Out of Stock'; barClass = 'out-of-stock';
-            } else if (stock <= 5) {
+            } else if (stock <= lowStockThreshold) {
                 statusClass = 'low'; statusText = 'Low Stock'; barClass = 'low';
             } else {
                 statusClass = 'in-stock'; statusText = 'In Stock'; barClass = 'in-stock';
@@ -249,8 +254,8 @@ document.addEventListener("DOMContentLoaded", () => {
         try {
             const response = await fetch("/api/admin/all-quotes");
             if (!response.ok) throw new Error("Failed to fetch quotes.");
-            const quotes = await response.json();
-            renderAllQuotesTable(quotes);
+            allQuotes = await response.json();
+            renderAllQuotesTable(allQuotes);
         } catch (error) {
             console.error(error);
             allQuotesTableBodyEl.innerHTML = `<tr><td colspan="6">Error loading quotes.</td></tr>`;
@@ -274,6 +279,9 @@ document.addEventListener("DOMContentLoaded", () => {
                     <button class="btn-secondary generate-contract-btn" title="Generate Contract PDF" data-quote-id="${quote.id}" data-project-name="${quote.project_name || 'project'}">
                         <i class="fas fa-file-signature"></i> Contract
                     </button>
+                    <a class="btn-secondary" title="Quotation, contract and application form in one PDF" href="/api/quotes/${encodeURIComponent(quote.id)}/bundle">
+                        <i class="fas fa-file-archive"></i> Bundle
+                    </a>
                 `;
             } else {
                  actionButtons = `
@@ -286,6 +294,12 @@ document.addEventListener("DOMContentLoaded", () => {
                 `;
             }
 
+            actionButtons += `
+                    <a class="btn-secondary" title="Download BOM as Excel" href="/api/quotes/${encodeURIComponent(quote.id)}/bom.xlsx">
+                        <i class="fas fa-file-excel"></i> BOM
+                    </a>
+                `;
+
             return `
             <tr class="quote-row ${isConfirmed ? 'confirmed-quote' : ''}" data-quote-id="${quote.id}">
                 <td data-label="Project" title="Click to load this quote in the tool">${quote.project_name || 'Untitled Project'}</td>
@@ -437,6 +451,8 @@ document.addEventListener("DOMContentLoaded", () => {
             const downloadBtn = e.target.closest('.download-quote-pdf-btn');
             const confirmBtn = e.target.closest('.confirm-quote-btn');
             const contractBtn = e.target.closest('.generate-contract-btn');
+            // Plain download links (BOM / Export) should not also open the quote.
+            if (e.target.closest('a')) return;
     
             if (confirmBtn && !confirmBtn.disabled) {
                 e.stopPropagation();
@@ -454,7 +470,8 @@ document.addEventListener("DOMContentLoaded", () => {
                     }
                     
                     alert(result.message);
-                    loadDashboardData();
+                    // The live feed delivers the stock and status changes on its own.
+                    if (!liveFeedConnected) loadDashboardData();
                     
                 } catch (error) {
                     console.error('Confirmation failed:', error);
@@ -608,9 +625,94 @@ document.addEventListener("DOMContentLoaded", () => {
         // if (allQuotesWidget) allQuotesWidget.classList.add('is-collapsed');
     };
 
+    // --- LIVE UPDATES ---
+    // Server-sent events patch the loaded data in place instead of re-fetching it.
+    const renderLowStockBadge = () => {
+        if (!lowStockBadgeEl) return;
+        lowStockBadgeEl.hidden = lowStockProducts.size === 0;
+        lowStockBadgeEl.textContent = `${lowStockProducts.size} low`;
+    };
+
+    let statsRefreshTimer = null;
+    const refreshStatsSoon = () => {
+        // Monthly totals and top products are aggregates, so a burst of quote saves costs one reload,
+        // and only of the aggregates: the inventory is already kept current by the feed.
+        clearTimeout(statsRefreshTimer);
+        statsRefreshTimer = setTimeout(async () => {
+            try {
+                const response = await fetch("/api/dashboard-stats/summary");
+                if (!response.ok) return;
+                const stats = await response.json();
+                renderMonthlyStats(stats.monthly_stats);
+                renderTopProducts(stats.top_products);
+            } catch (error) {
+                console.error("Failed to refresh dashboard stats:", error);
+            }
+        }, 10000);
+    };
+
+    const connectLiveFeed = () => {
+        if (!window.EventSource) return;
+        const source = new EventSource("/api/admin/events");
+        const on = (type, handler) => source.addEventListener(type, e => handler(JSON.parse(e.data)));
+
+        source.onopen = () => { liveFeedConnected = true; };
+        source.onerror = () => {
+            // EventSource retries by itself; it only gives up (CLOSED) on an HTTP error,
+            // e.g. a 503 when the worker already has its maximum of open dashboards.
+            liveFeedConnected = false;
+            if (source.readyState === EventSource.CLOSED) {
+                console.warn("Live dashboard updates are unavailable; retrying in a minute.");
+                setTimeout(connectLiveFeed, 60000);
+            }
+        };
+
+        on('low_stock', ({ threshold, products }) => {
+            lowStockThreshold = threshold;
+            lowStockProducts.clear();
+            products.forEach(p => lowStockProducts.set(p.model, p));
+            renderLowStockBadge();
+        });
+        on('stock', (p) => {
+            const product = allInventoryProducts.find(x => x.model === p.model);
+            if (product) product.stock = p.stock;
+            if (p.low) lowStockProducts.set(p.model, p); else lowStockProducts.delete(p.model);
+            renderLowStockBadge();
+            updateAndRenderInventory();
+        });
+        on('product', (p) => {
+            const product = allInventoryProducts.find(x => x.model === p.model);
+            if (product) Object.assign(product, { description: p.description, stock: p.stock });
+            else allInventoryProducts.push({ model: p.model, description: p.description, stock: p.stock });
+            if (p.low) lowStockProducts.set(p.model, p); else lowStockProducts.delete(p.model);
+            renderLowStockBadge();
+            updateAndRenderInventory();
+        });
+        on('product_deleted', ({ model }) => {
+            allInventoryProducts = allInventoryProducts.filter(p => p.model !== model);
+            if (lowStockProducts.delete(model)) renderLowStockBadge();
+            updateAndRenderInventory();
+        });
+        on('quote', (q) => {
+            const index = allQuotes.findIndex(x => x.id === q.id);
+            if (index >= 0) allQuotes.splice(index, 1);
+            allQuotes.unshift(q); // Saving bumps the timestamp, so it belongs at the top.
+            renderAllQuotesTable(allQuotes);
+            refreshStatsSoon();
+        });
+        on('quote_deleted', ({ id }) => {
+            allQuotes = allQuotes.filter(q => q.id !== id);
+            renderAllQuotesTable(allQuotes);
+            refreshStatsSoon();
+        });
+        // Events were missed (e.g. a long disconnect); start over from the REST endpoints.
+        on('reset', () => loadDashboardData());
+    };
+
     // --- INITIALIZATION ---
     applySavedTheme();
     initializeDefaultCollapsedState();
     loadDashboardData();
+    connectLiveFeed();
 });
 
@@ -20,6 +20,7 @@ fetch('/api/auth/status')
             const clearCatalogBtn = document.getElementById('clear-catalog-btn');
             const importPricesBtn = document.getElementById('import-prices-ui-btn');
             const bulkLinkImagesBtn = document.getElementById('bulk-link-images-btn');
+            const uploadImagesZipBtn = document.getElementById('upload-images-zip-btn');
 
             if (userNameEl) {
                 userNameEl.textContent = user.name;
@@ -31,6 +32,7 @@ fetch('/api/auth/status')
                 if (clearCatalogBtn) clearCatalogBtn.style.display = 'none';
                 if (importPricesBtn) importPricesBtn.style.display = 'none';
                 if (bulkLinkImagesBtn) bulkLinkImagesBtn.style.display = 'none';
+                if (uploadImagesZipBtn) uploadImagesZipBtn.style.display = 'none';
             }
             // --- END: ROLE-BASED UI LOGIC ---
         }
@@ -52,6 +54,8 @@ document.addEventListener("DOMContentLoaded", () => {
     let packages = {};
     let quoteItems = [];
     let currentQuoteId = null;
+    let savedQuoteState = null;   // the quote as the server last stored it, base for PATCH saves
+    let savedQuoteVersion = null; // its version (ETag) for the If-Match check
     let currentProductForImageUpload = null;
     let renderTimeout = null;
     let allProductsFlat = [];
@@ -68,6 +72,8 @@ document.addEventListener("DOMContentLoaded", () => {
     const pricesFileInput = document.getElementById("prices-file-input");
     const clearCatalogBtn = document.getElementById("clear-catalog-btn");
     const bulkLinkImagesBtn = document.getElementById("bulk-link-images-btn");
+    const uploadImagesZipBtn = document.getElementById("upload-images-zip-btn");
+    const imagesZipInput = document.getElementById("images-zip-input");
     const packagesDropdown = document.getElementById("packages-dropdown");
     const addPackageBtn = document.getElementById("add-package-btn");
     const quotePanel = document.querySelector(".quote-panel");
@@ -84,6 +90,7 @@ document.addEventListener("DOMContentLoaded", () => {
     const saveQuoteBtn = document.getElementById("save-quote-btn");
     const loadQuoteBtn = document.getElementById("load-quote-btn");
     const exportPdfBtn = document.getElementById("export-pdf-btn");
+    const previewQuoteBtn = document.getElementById("preview-quote-btn");
     const sendEmailBtn = document.getElementById("send-email-btn");
     const toastContainer = document.getElementById("toast-container");
     const darkModeToggle = document.getElementById("toggle-dark-mode");
@@ -120,11 +127,13 @@ document.addEventListener("DOMContentLoaded", () => {
     const apiRequest = async (url, options = {}) => {
         try {
             const response = await fetch(url, options);
+            if (!response.ok && options.rawResponse) return response;
             if (!response.ok) {
                 const errorData = await response.json().catch(() => ({}));
                 throw new Error(errorData.message || errorData.error || `HTTP error! status: ${response.status}`);
             }
             const contentType = response.headers.get("content-type");
+            if (options.rawResponse) return response;
             if (contentType && contentType.indexOf("application/json") !== -1) {
                 return response.json();
             }
@@ -199,6 +208,26 @@ document.addEventListener("DOMContentLoaded", () => {
         } catch (e) { /* Error handled by apiRequest */ }
     };
     
+    const handleImagesZipUpload = async (file) => {
+        if (!file) return;
+        const formData = new FormData();
+        formData.append('images_zip', file);
+
+        showToast("Processing images...", "success");
+
+        try {
+            const result = await apiRequest("/api/admin/upload-images-zip", {
+                method: "POST",
+                body: formData,
+            });
+            const { unmatched, failed } = result.summary;
+            showToast(`${result.message}${unmatched ? ` ${unmatched} unmatched.` : ''}${failed ? ` ${failed} failed.` : ''}`,
+                result.ok ? "success" : "error");
+            result.files.filter(f => f.status !== 'linked').forEach(f => console.warn(`${f.file}: ${f.error}`));
+            await loadProducts();
+        } catch (e) { /* Error handled by apiRequest */ }
+    };
+
     // ----------------------
     // USER SAVED QUOTES
     // ----------------------
@@ -479,6 +508,7 @@ document.addEventListener("DOMContentLoaded", () => {
         installationInput.value = '0';
         discountInput.value = '0';
         currentQuoteId = null;
+        savedQuoteState = savedQuoteVersion = null;
         renderQuote();
     };
 
@@ -489,8 +519,10 @@ document.addEventListener("DOMContentLoaded", () => {
         items: quoteItems,
     });
 
-    const loadFullQuoteState = (data) => {
+    const loadFullQuoteState = (data, version = null) => {
         currentQuoteId = data.id || null;
+        savedQuoteState = version ? JSON.parse(JSON.stringify(data)) : null;
+        savedQuoteVersion = version;
         customerNameInput.value = data.customerName || '';
         projectNameInput.value = data.projectName || '';
         installationInput.value = data.installationCost || '0';
@@ -499,6 +531,78 @@ document.addEventListener("DOMContentLoaded", () => {
         renderQuote();
     };
 
+    const openSavedQuote = async (quoteId) => {
+        const response = await apiRequest(`/api/load-quote/${quoteId}`, { rawResponse: true });
+        const data = await response.json();
+        if (!response.ok) {
+            showToast(data.error || `HTTP error! status: ${response.status}`, "error");
+            throw new Error(data.error);
+        }
+        loadFullQuoteState(data, response.headers.get("ETag"));
+        return data;
+    };
+
+    // RFC 6902 operations turning `before` into `after`. Arrays are compared after
+    // trimming their common head and tail, so inserting or removing one line item
+    // produces a single operation instead of rewriting every later index.
+    const escapePointer = (key) => String(key).replace(/~/g, "~0").replace(/\//g, "~1");
+    const sameJson = (a, b) => JSON.stringify(a) === JSON.stringify(b);
+    const isObject = (v) => v !== null && typeof v === "object" && !Array.isArray(v);
+    const diffJson = (before, after, path = "", ops = []) => {
+        if (Array.isArray(before) && Array.isArray(after)) {
+            let head = 0, endBefore = before.length, endAfter = after.length;
+            while (head < endBefore && head < endAfter && sameJson(before[head], after[head])) head++;
+            while (endBefore > head && endAfter > head && sameJson(before[endBefore - 1], after[endAfter - 1])) { endBefore--; endAfter--; }
+            const paired = Math.min(endBefore, endAfter) - head;
+            for (let i = head; i < head + paired; i++) diffJson(before[i], after[i], `${path}/${i}`, ops);
+            for (let i = head + paired; i < endBefore; i++) ops.push({ op: "remove", path: `${path}/${head + paired}` });
+            for (let i = head + paired; i < endAfter; i++) ops.push({ op: "add", path: `${path}/${i}`, value: after[i] });
+        } else if (isObject(before) && isObject(after)) {
+            for (const key of Object.keys(before)) {
+                if (!(key in after)) ops.push({ op: "remove", path: `${path}/${escapePointer(key)}` });
+            }
+            for (const [key, value] of Object.entries(after)) {
+                if (key in before) diffJson(before[key], value, `${path}/${escapePointer(key)}`, ops);
+                else ops.push({ op: "add", path: `${path}/${escapePointer(key)}`, value });
+            }
+        } else if (!sameJson(before, after)) {
+            ops.push({ op: "replace", path, value: after });
+        }
+        return ops;
+    };
+
+    // Saves the editor state. Once the server version is known only the changes
+    // are sent (PATCH with If-Match); otherwise the whole quote is posted.
+    const saveCurrentQuote = async () => {
+        const quoteData = JSON.parse(JSON.stringify(getFullQuoteState()));
+        if (currentQuoteId && savedQuoteState && savedQuoteVersion) {
+            const response = await apiRequest(`/api/save-quote/${encodeURIComponent(currentQuoteId)}`, {
+                method: "PATCH", rawResponse: true,
+                headers: { "Content-Type": "application/json-patch+json", "If-Match": savedQuoteVersion },
+                body: JSON.stringify(diffJson(savedQuoteState, quoteData)),
+            });
+            const data = await response.json().catch(() => ({}));
+            if (response.ok) {
+                savedQuoteState = quoteData;
+                savedQuoteVersion = response.headers.get("ETag");
+                return data;
+            }
+            // 412 means someone saved in between; the user has to reload rather than overwrite it.
+            if (response.status !== 404 && response.status !== 422) {
+                showToast(data.error || `HTTP error! status: ${response.status}`, "error");
+                throw new Error(data.error);
+            }
+            // The quote is gone or the patch no longer applies: fall back to a full save.
+        }
+        const data = await apiRequest("/api/save-quote", {
+            method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify(quoteData),
+        });
+        currentQuoteId = data.id;
+        savedQuoteState = quoteData;
+        savedQuoteVersion = `"${data.version}"`;
+        return data;
+    };
+
     // --------------------------
     // ADMIN PANEL LOGIC
     // --------------------------
@@ -562,8 +666,7 @@ document.addEventListener("DOMContentLoaded", () => {
             if (loadButton) {
                 const quoteId = loadButton.dataset.quoteId;
                 try {
-                    const quoteData = await apiRequest(`/api/load-quote/${quoteId}`);
-                    loadFullQuoteState(quoteData);
+                    const quoteData = await openSavedQuote(quoteId);
                     showToast(`Quote "${quoteData.projectName || 'Untitled'}" loaded.`);
                     quotePanel.scrollIntoView({ behavior: 'smooth' });
                 } catch (err) { /* Error handled by apiRequest */ }
@@ -651,6 +754,9 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     });
 
+    if (uploadImagesZipBtn) uploadImagesZipBtn.addEventListener('click', () => imagesZipInput.click());
+    if (imagesZipInput) imagesZipInput.addEventListener('change', (e) => { handleImagesZipUpload(e.target.files[0]); e.target.value = null; });
+
     if (bulkLinkImagesBtn) {
         bulkLinkImagesBtn.addEventListener('click', async () => {
             if (!confirm("This will scan the uploads folder and link images to products where the filename matches a model number. Continue?")) {
@@ -730,10 +836,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
         const quoteData = getFullQuoteState();
         try {
-            const data = await apiRequest("/api/save-quote", {
-                method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify(quoteData),
-            });
-            currentQuoteId = data.id;
+            await saveCurrentQuote();
             showToast(`Quote "${quoteData.projectName || 'Untitled'}" saved successfully!`);
             await loadAndRenderUserQuotes();
         } catch (e) { /* Error handled by apiRequest */ }
@@ -756,8 +859,7 @@ document.addEventListener("DOMContentLoaded", () => {
                 <small>Customer: ${q.customer_name || 'N/A'} | Saved: ${new Date(q.timestamp).toLocaleString()}</small>`;
                 li.addEventListener('click', async () => {
                     try {
-                        const quoteData = await apiRequest(`/api/load-quote/${q.id}`);
-                        loadFullQuoteState(quoteData);
+                        await openSavedQuote(q.id);
                         showToast(`Quote "${q.project_name || 'Untitled'}" loaded.`);
                         hideModal(loadModal);
                     } catch (e) { /* Error handled by apiRequest */ }
@@ -769,17 +871,38 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     };
 
+    if (previewQuoteBtn) previewQuoteBtn.addEventListener('click', async () => {
+        if(quoteItems.length === 0) return showToast("Cannot preview an empty quote.", "error");
+        // Opened before the request so popup blockers treat it as part of the click.
+        const previewWindow = window.open("", "_blank");
+        try {
+            const response = await apiRequest("/api/preview-quote", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({
+                    quoteId: currentQuoteId,
+                    quoteData: quoteItems,
+                    customerInfo: { name: customerNameInput.value, project: projectNameInput.value },
+                    installationCost: parseFloat(installationInput.value) || 0,
+                    discountPercent: parseFloat(discountInput.value) || 0
+                })
+            });
+            const html = await response.text();
+            if (!previewWindow) return showToast("Allow pop-ups to see the preview.", "error");
+            previewWindow.document.open();
+            previewWindow.document.write(html);
+            previewWindow.document.close();
+        } catch (e) {
+            if (previewWindow) previewWindow.close();
+        }
+    });
+
     if (exportPdfBtn) exportPdfBtn.addEventListener('click', async () => {
         if(quoteItems.length === 0) return showToast("Cannot export an empty quote.", "error");
         
         showToast("Generating PDF...", "success");
         try {
-            const quoteData = getFullQuoteState();
-            
-            const saveData = await apiRequest("/api/save-quote", {
-                method: "POST", headers: { "Content-Type": "application/json" }, body: JSON.stringify(quoteData),
-            });
-            currentQuoteId = saveData.id;
+            await saveCurrentQuote();
             await loadAndRenderUserQuotes();
 
             const response = await apiRequest("/api/export-pdf", {
@@ -845,19 +968,26 @@ document.addEventListener("DOMContentLoaded", () => {
         } catch (e) { /* Error handled by apiRequest */ }
     });
 
-    if (addPackageBtn) addPackageBtn.addEventListener('click', () => {
+    if (addPackageBtn) addPackageBtn.addEventListener('click', async () => {
         const packageName = packagesDropdown.value;
         if(!packageName) return;
-        const packageProducts = packages[packageName];
-        
-        for (const [productName, qty] of Object.entries(packageProducts)) {
-            const product = allProductsFlat.find(p => p.description === productName);
-            if (product) {
-                for (let i = 0; i < qty; i++) { addToQuote(product); }
-            } else {
-                console.warn(`Product not found: ${productName}`);
-            }
-        }
+        try {
+            // The server resolves and prices the package in one call.
+            const expansion = await apiRequest(`/api/packages/${encodeURIComponent(packageName)}/expand`);
+            expansion.items.forEach(item => {
+                const existing = quoteItems.find(it => it.uniqueId === item.uniqueId);
+                if (existing) {
+                    existing.quantity += item.quantity;
+                } else {
+                    quoteItems.push({
+                        uniqueId: item.uniqueId, model: item.model, description: item.description,
+                        price: item.price, quantity: item.quantity, category: item.category
+                    });
+                }
+            });
+            expansion.missing.forEach(model => console.warn(`Product not found: ${model}`));
+            renderQuote();
+        } catch (e) { /* Error handled by apiRequest */ }
     });
 
     if (tableBody) tableBody.addEventListener("change", (e) => {
@@ -998,8 +1128,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
         if (quoteIdToLoad) {
             try {
-                const quoteData = await apiRequest(`/api/load-quote/${quoteIdToLoad}`);
-                loadFullQuoteState(quoteData);
+                await openSavedQuote(quoteIdToLoad);
                 showToast(`Loaded quote from dashboard.`);
             } catch (e) {
                 showToast('Could not load the selected quote.', 'error');
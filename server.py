@@ -4,27 +4,36 @@
 # -------------------------------------------------------------------
 import os
 import io
+import sys
+import queue
+import atexit
+import threading
+import gzip
+import mimetypes
+import time
 import sqlite3
+import re
 import json
-import requests
-import MySQLdb
+import zlib
+import tempfile
+import shutil
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import datetime, timedelta
 from pathlib import Path
 
 # --- Flask and Security Imports ---
-from flask import Flask, jsonify, request, send_file, g, send_from_directory, make_response
+from flask import Flask, jsonify, request, send_file, g, send_from_directory, make_response, stream_with_context, abort
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
-from functools import wraps
+from functools import wraps, lru_cache, partial
 from dotenv import load_dotenv
 
 # --- Helper Library Imports ---
-from collections import Counter
-from jinja2 import Environment, FileSystemLoader
-from PIL import Image, ImageFile
-import pandas as pd
+from collections import Counter, deque
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+import jsonpatch
 
 # --- Optional Integrations ---
 # try:
@@ -33,35 +42,31 @@ import pandas as pd
 # except Exception:
 #     OPENAI_AVAILABLE = False
 
-# try:
-#     from rembg import remove as rembg_remove
-#     REMBG_AVAILABLE = True
-# except Exception:
-#     REMBG_AVAILABLE = False
+# pandas, Pillow, rembg, MySQLdb and the PDF engines are heavy to import and
+# most requests never touch them, so they are loaded by the code paths that
+# need them (see the LAZY DEPENDENCIES section) instead of at worker boot.
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception:
+    ORJSON_AVAILABLE = False
 
 try:
-    import pdfkit
-    wkhtml_paths = [
-        '/usr/bin/wkhtmltopdf', '/usr/local/bin/wkhtmltopdf',
-        r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe',
-        r'C:\Program Files (x86)\wkhtmltopdf\bin\wkhtmltopdf.exe'
-    ]
-    wkhtml_path = next((p for p in wkhtml_paths if os.path.exists(p)), None)
-    pdfkit_config = pdfkit.configuration(wkhtmltopdf=wkhtml_path) if wkhtml_path else None
-    PDFKIT_AVAILABLE = pdfkit_config is not None
+    import brotli
+    BROTLI_AVAILABLE = True
 except Exception:
-    PDFKIT_AVAILABLE = False
-    pdfkit_config = None
+    BROTLI_AVAILABLE = False
 
 try:
-    from weasyprint import HTML, CSS
-    WEASYPRINT_AVAILABLE = True
+    import prometheus_client
+    from prometheus_client import multiprocess as prometheus_multiprocess
+    PROMETHEUS_AVAILABLE = True
 except Exception:
-    WEASYPRINT_AVAILABLE = False
+    PROMETHEUS_AVAILABLE = False
 
 # Load environment variables from .env file
 load_dotenv()
-ImageFile.LOAD_TRUNCATED_IMAGES = True
 
 # ----------------------
 # CONFIGURATION
@@ -73,6 +78,39 @@ VAT_RATE = Decimal("0.14")
 COMPANY_NAME = "Radix Tech"
 COMPANY_INFO_LINE_1 = "Unit 202 - Building 34 (B) - El-Moltqa El Arabi St, Sheraton - Nozha, Cairo Governorate 11799, Egypt"
 COMPANY_INFO_LINE_2 = "Phone: +219238 | Email: info@radixtechgroup.com"
+# Every Nth revision of a quote is stored in full; the ones in between are JSON Patch deltas.
+QUOTE_SNAPSHOT_INTERVAL = int(os.environ.get("QUOTE_SNAPSHOT_INTERVAL", "20"))
+# Products at or below this stock level are reported as low stock.
+LOW_STOCK_THRESHOLD = int(os.environ.get("LOW_STOCK_THRESHOLD", "5"))
+# Live dashboard feed (/api/admin/events): how often each worker checks for new events,
+# how often idle streams send a keepalive, and how long a stream lives before the
+# browser reconnects (resuming from Last-Event-ID).
+SSE_POLL_SECONDS = float(os.environ.get("SSE_POLL_SECONDS", "1"))
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_SECONDS = int(os.environ.get("SSE_MAX_SECONDS", "300"))
+# Each open stream occupies one worker thread for as long as the dashboard is open
+# (SSE_MAX_SECONDS only makes it reconnect). Past this many streams per worker,
+# new ones get a 503 so at least half the GUNICORN_THREADS stay free for requests.
+SSE_MAX_STREAMS = int(os.environ.get("SSE_MAX_STREAMS", str(max(1, int(os.environ.get("GUNICORN_THREADS", "8")) // 2))))
+
+# PDF output (_render_pdf): embedded raster images are downsampled to PDF_IMAGE_DPI and
+# JPEGs re-encoded at PDF_JPEG_QUALITY by the engine, fonts are subset, and a pypdf pass
+# recompresses streams and merges duplicate objects. PDF_OPTIMIZE=0 turns all of it off.
+PDF_OPTIMIZE = os.environ.get("PDF_OPTIMIZE", "1") != "0"
+PDF_IMAGE_DPI = int(os.environ.get("PDF_IMAGE_DPI", "150"))
+PDF_JPEG_QUALITY = int(os.environ.get("PDF_JPEG_QUALITY", "85"))
+# Product images are cut out, scaled to fit PRODUCT_IMAGE_MAX_PX and stored as PNG
+# (process_product_image); ZIP batches are processed by IMAGE_WORKERS threads.
+PRODUCT_IMAGE_MAX_PX = int(os.environ.get("PRODUCT_IMAGE_MAX_PX", "1000"))
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+IMAGE_ZIP_MAX_BYTES = int(os.environ.get("IMAGE_ZIP_MAX_BYTES", str(200 * 1024 * 1024)))
+IMAGE_ZIP_MAX_FILES = 1000
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif')
+# Upload garbage collection (collect_upload_garbage): files nothing references are only
+# removed once older than the retention window; the newest price-list uploads are always kept.
+UPLOAD_RETENTION_DAYS = int(os.environ.get("UPLOAD_RETENTION_DAYS", "30"))
+UPLOAD_KEEP_IMPORTS = int(os.environ.get("UPLOAD_KEEP_IMPORTS", "3"))
+UPLOAD_ARCHIVE_FOLDER = os.environ.get("UPLOAD_ARCHIVE_FOLDER", "uploads_archive")
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
@@ -83,9 +121,530 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 app.config['SECRET_KEY'] = os.environ.get('JWT_SECRET', 'a-fallback-secret-key-for-development')
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
-template_env = Environment(loader=FileSystemLoader(base_dir))
+# Customer and line-item fields are user input; escape them in every HTML document.
+template_env = Environment(loader=FileSystemLoader(base_dir), autoescape=select_autoescape(["html"]))
 template_env.globals['timedelta'] = timedelta
 
+# ----------------------
+# LAZY DEPENDENCIES
+# ----------------------
+WKHTMLTOPDF_PATHS = [
+    '/usr/bin/wkhtmltopdf', '/usr/local/bin/wkhtmltopdf',
+    r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe',
+    r'C:\Program Files (x86)\wkhtmltopdf\bin\wkhtmltopdf.exe'
+]
+
+@lru_cache(maxsize=None)
+def get_pdf_engine():
+    """Resolves the PDF engine on first use and caches it for the worker's lifetime.
+
+    Returns ("pdfkit", configuration), ("weasyprint", HTML) or (None, None).
+    """
+    try:
+        import pdfkit
+        wkhtml_path = next((p for p in WKHTMLTOPDF_PATHS if os.path.exists(p)), None)
+        if wkhtml_path:
+            return "pdfkit", pdfkit.configuration(wkhtmltopdf=wkhtml_path)
+    except Exception:
+        pass
+    try:
+        from weasyprint import HTML
+        return "weasyprint", HTML
+    except Exception:
+        return None, None
+
+@lru_cache(maxsize=None)
+def get_rembg_remove():
+    """Returns rembg's remove() if it can be imported, else None (Pillow fallback)."""
+    try:
+        from rembg import remove as rembg_remove
+    except Exception:
+        return None
+    try:
+        from rembg import new_session
+        # One model session per worker, shared by all uploads, instead of loading it per image.
+        return partial(rembg_remove, session=new_session())
+    except Exception:
+        return rembg_remove
+
+def load_pillow():
+    from PIL import Image, ImageFile
+    ImageFile.LOAD_TRUNCATED_IMAGES = True
+    return Image
+
+# ----------------------
+# METRICS
+# ----------------------
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does) so every
+# worker writes its samples to a shared directory and /metrics sums them.
+if PROMETHEUS_AVAILABLE:
+    HTTP_REQUESTS_TOTAL = prometheus_client.Counter(
+        "http_requests_total", "HTTP requests by endpoint and status.", ["method", "endpoint", "status"])
+    HTTP_REQUEST_SECONDS = prometheus_client.Histogram(
+        "http_request_duration_seconds", "HTTP request latency by endpoint.", ["method", "endpoint"],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+    HTTP_IN_PROGRESS = prometheus_client.Gauge(
+        "http_requests_in_progress", "HTTP requests currently being served.", ["method", "endpoint"],
+        multiprocess_mode="livesum")
+    PDF_RENDER_SECONDS = prometheus_client.Histogram(
+        "pdf_render_duration_seconds", "Time spent in the PDF engine.", ["document", "engine"],
+        buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60))
+    EXCEL_IMPORT_SECONDS = prometheus_client.Histogram(
+        "excel_import_duration_seconds", "Time to read and import a price list.",
+        buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60))
+    IMAGE_PROCESSING_SECONDS = prometheus_client.Histogram(
+        "image_processing_duration_seconds", "Time to process an uploaded product image.", ["outcome"],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+else:
+    HTTP_REQUESTS_TOTAL = HTTP_REQUEST_SECONDS = HTTP_IN_PROGRESS = None
+    PDF_RENDER_SECONDS = EXCEL_IMPORT_SECONDS = IMAGE_PROCESSING_SECONDS = None
+
+def observe_seconds(metric, seconds, **labels):
+    """Records a duration on a histogram; a no-op when prometheus_client is missing."""
+    if metric is None: return
+    (metric.labels(**labels) if labels else metric).observe(seconds)
+
+@app.before_request
+def metrics_before_request():
+    if HTTP_IN_PROGRESS is None: return
+    g._metrics_labels = (request.method, request.endpoint or "unmatched")
+    g._metrics_started = time.perf_counter()
+    HTTP_IN_PROGRESS.labels(*g._metrics_labels).inc()
+
+@app.after_request
+def metrics_after_request(response):
+    labels = g.pop("_metrics_labels", None)
+    if labels is None: return response
+    HTTP_REQUEST_SECONDS.labels(*labels).observe(time.perf_counter() - g._metrics_started)
+    HTTP_REQUESTS_TOTAL.labels(*labels, str(response.status_code)).inc()
+    HTTP_IN_PROGRESS.labels(*labels).dec()
+    return response
+
+@app.teardown_request
+def metrics_teardown_request(exception):
+    # after_request is skipped when a view raises, so account for it here.
+    labels = g.pop("_metrics_labels", None)
+    if labels is None: return
+    HTTP_REQUEST_SECONDS.labels(*labels).observe(time.perf_counter() - g._metrics_started)
+    HTTP_REQUESTS_TOTAL.labels(*labels, "500").inc()
+    HTTP_IN_PROGRESS.labels(*labels).dec()
+
+# ----------------------
+# REQUEST LOG
+# ----------------------
+# One JSON line per request (route, user, status, duration, bytes, SQL time),
+# buffered in memory and appended in batches by a background thread so the
+# request path never waits on disk. Analyse with analyze_requests.py.
+REQUEST_LOG_PATH = os.environ.get("REQUEST_LOG_PATH", "requests.jsonl")
+REQUEST_LOG_ENABLED = os.environ.get("REQUEST_LOG_ENABLED", "1") != "0"
+REQUEST_LOG_MAX_BYTES = int(os.environ.get("REQUEST_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+REQUEST_LOG_BACKUPS = int(os.environ.get("REQUEST_LOG_BACKUPS", "5"))
+
+class RequestLogWriter:
+    """Batches log records and appends them from a daemon thread, with size-based rotation."""
+    _STOP = object()  # Queued by flush(): write what is pending, then exit.
+
+    def __init__(self, path, max_bytes, backups, batch_size=200, flush_interval=1.0, max_queue=10000):
+        self.path, self.max_bytes, self.backups = path, max_bytes, backups
+        self.batch_size, self.flush_interval = batch_size, flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread, self._pid, self._start_lock = None, None, threading.Lock()
+
+    def log(self, record):
+        # The thread is started lazily (and again after a fork) so each gunicorn worker gets its own.
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self.queue = queue.Queue(maxsize=self.queue.maxsize)
+                    self._thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+                    self._thread.start(); self._pid = os.getpid()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1  # Never block a request on logging.
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, deadline = [], None
+            while len(batch) < self.batch_size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0: break
+                try:
+                    record = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if record is self._STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+                if deadline is None: deadline = time.monotonic() + self.flush_interval
+            if batch: self._write(batch)
+
+    def flush(self):
+        """Writes everything logged so far, including the batch the writer thread is
+        holding, and stops the thread (a later log() starts a new one). Used at exit."""
+        with self._start_lock:
+            thread, self._pid = (self._thread, None) if self._pid == os.getpid() else (None, None)
+        if thread is not None and thread.is_alive():
+            try:
+                self.queue.put(self._STOP, timeout=5)
+                thread.join(timeout=10)
+            except queue.Full:
+                pass
+        # Anything left (no writer in this process, or it did not stop in time) is written here.
+        batch = []
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not self._STOP: batch.append(record)
+        if batch: self._write(batch)
+
+    def _write(self, batch):
+        data = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in batch).encode()
+        try:
+            with open(self.path, "ab") as f:
+                locked = _lock_file(f)
+                try:
+                    if self.max_bytes and f.tell() + len(data) > self.max_bytes and f.tell() > 0:
+                        self._rotate()
+                        with open(self.path, "ab") as fresh: fresh.write(data)
+                    else:
+                        # A single append per batch keeps lines from different workers whole.
+                        f.write(data)
+                finally:
+                    if locked: _unlock_file(f)
+        except OSError as e:
+            print(f"Request log write failed: {e}")
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+def _lock_file(f):
+    try:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX); return True
+    except (ImportError, OSError):
+        return False
+
+def _unlock_file(f):
+    import fcntl
+    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+request_log = RequestLogWriter(REQUEST_LOG_PATH, REQUEST_LOG_MAX_BYTES, REQUEST_LOG_BACKUPS)
+atexit.register(request_log.flush)
+
+@app.before_request
+def request_log_before_request():
+    g._request_started = time.perf_counter()
+    g._sql_seconds, g._sql_queries = 0.0, 0
+
+@app.after_request
+def request_log_after_request(response):
+    started = g.pop("_request_started", None)
+    if not REQUEST_LOG_ENABLED or started is None: return response
+    request_log.log({
+        "ts": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+        "method": request.method,
+        "route": request.url_rule.rule if request.url_rule else request.path,
+        "status": response.status_code,
+        "user_id": g.get("user_id"),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        "bytes": response.content_length,
+        "sql_ms": round(g.get("_sql_seconds", 0.0) * 1000, 2),
+        "sql_queries": g.get("_sql_queries", 0),
+        "pid": os.getpid(),
+    })
+    return response
+
+# ----------------------
+# PROFILER
+# ----------------------
+# Admin-armed profiling (POST /api/admin/profiler): the next N requests, and/or those
+# whose endpoint or path matches a pattern, are profiled and written to PROFILE_DIR as
+# collapsed stacks (flamegraph.pl, speedscope) or .pstats, keeping the newest
+# PROFILE_MAX_CAPTURES. The arm state is PROFILE_DIR/control.json so every worker sees
+# it; while nothing is armed a request costs a clock read.
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_MAX_CAPTURES = int(os.environ.get("PROFILE_MAX_CAPTURES", "200"))
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id, self.interval = thread_id, interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        self._sample()  # Up front, so requests shorter than one interval still get a stack.
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        frame, stack = sys._current_frames().get(self.thread_id), []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if stack:
+            self.stacks[";".join(reversed(stack))] += 1
+
+class RequestProfiler:
+    CHECK_INTERVAL = 1.0
+    # Names written by finish(): {taken}_{pid}_{elapsed}ms_{endpoint}.{collapsed|pstats}
+    CAPTURE_NAME = re.compile(r"^(\d{8}T\d{12})_(\d+)_(\d+)ms_(.+)\.(collapsed|pstats)$")
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.control_path = os.path.join(directory, "control.json")
+        self.settings, self.mtime, self.checked_at = None, None, float("-inf")
+        # Captures running in this worker; lets teardown skip the (slow) g lookup.
+        self.in_flight, self.lock = 0, threading.Lock()
+
+    def armed(self):
+        now = time.monotonic()
+        if now - self.checked_at >= self.CHECK_INTERVAL:
+            self.checked_at = now
+            self._reload()
+        return self.settings is not None
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.control_path).st_mtime_ns
+        except OSError:
+            self.settings = self.mtime = None
+            return
+        if mtime != self.mtime:
+            self.mtime = mtime
+            try:
+                with open(self.control_path) as f: self.settings = json.load(f)
+            except (OSError, ValueError):
+                self.settings = None
+        if self.settings and self.settings["expires"] < time.time():
+            self.settings = None
+
+    def current(self):
+        self.checked_at = float("-inf")
+        return self.settings if self.armed() else None
+
+    def arm(self, requests=None, route=None, mode="sample", interval_ms=5, minutes=30):
+        os.makedirs(self.directory, exist_ok=True)
+        settings = {"remaining": requests, "route": route, "mode": mode, "interval_ms": interval_ms,
+                    "expires": time.time() + minutes * 60}
+        tmp_path = f"{self.control_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f: json.dump(settings, f)
+        os.replace(tmp_path, self.control_path)
+        self.checked_at = float("-inf")
+        return settings
+
+    def disarm(self):
+        try: os.remove(self.control_path)
+        except FileNotFoundError: pass
+        self.checked_at = float("-inf")
+
+    def claim(self, endpoint, path):
+        """Settings to profile this request with, or None. Counts it against the
+        armed number of requests under a file lock shared by all workers."""
+        settings = self.settings
+        if endpoint and endpoint.startswith("profiler_"): return None
+        if settings["route"] and not any(re.search(settings["route"], s) for s in (endpoint or "", path)): return None
+        if settings["remaining"] is None: return settings
+        try:
+            with open(self.control_path, "r+") as f:
+                locked = _lock_file(f)
+                try:
+                    current = json.load(f)
+                    if not current["remaining"]: return None
+                    current["remaining"] -= 1
+                    if current["remaining"]:
+                        f.seek(0); f.truncate(); json.dump(current, f); f.flush()
+                    else:
+                        os.remove(self.control_path)
+                    return current
+                finally:
+                    if locked: _unlock_file(f)
+        except (OSError, ValueError):
+            return None
+
+    def start(self, settings):
+        with self.lock: self.in_flight += 1
+        if settings["mode"] == "cprofile":
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), settings["interval_ms"] / 1000).start()
+        return settings["mode"], profiler, time.perf_counter()
+
+    def finish(self, capture, endpoint):
+        with self.lock: self.in_flight -= 1
+        mode, profiler, started = capture
+        elapsed_ms = round((time.perf_counter() - started) * 1000)
+        name = f"{datetime.now():%Y%m%dT%H%M%S%f}_{os.getpid()}_{elapsed_ms}ms_{endpoint or 'unmatched'}"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if mode == "cprofile":
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.directory, f"{name}.pstats"))
+            else:
+                stacks = profiler.stop()
+                # Nothing sampled: an empty file would only push real captures out.
+                if not stacks: return
+                with open(os.path.join(self.directory, f"{name}.collapsed"), "w") as f:
+                    f.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+            for old in self.captures()[PROFILE_MAX_CAPTURES:]:
+                try: os.remove(os.path.join(self.directory, old["name"]))
+                except FileNotFoundError: pass  # Pruned by another worker.
+        except OSError as e:
+            print(f"Could not write profile {name}: {e}")
+
+    def captures(self):
+        """Newest first. Files in the directory that finish() did not write are ignored."""
+        try: entries = list(os.scandir(self.directory))
+        except FileNotFoundError: return []
+        captures = []
+        for entry in entries:
+            match = self.CAPTURE_NAME.match(entry.name)
+            if not match: continue
+            taken, pid, elapsed, endpoint, fmt = match.groups()
+            try:
+                taken_at = datetime.strptime(taken, "%Y%m%dT%H%M%S%f").isoformat(timespec="seconds")
+                size = entry.stat().st_size
+            except (ValueError, OSError):
+                continue
+            captures.append({"name": entry.name, "format": fmt, "endpoint": endpoint, "pid": int(pid),
+                             "duration_ms": int(elapsed), "bytes": size, "taken_at": taken_at})
+        return sorted(captures, key=lambda c: c["name"], reverse=True)
+
+request_profiler = RequestProfiler(PROFILE_DIR)
+
+@app.before_request
+def profiler_before_request():
+    if not request_profiler.armed(): return
+    settings = request_profiler.claim(request.endpoint, request.path)
+    if settings is not None:
+        g._profile = request_profiler.start(settings)
+
+@app.teardown_request
+def profiler_teardown_request(exception):
+    if not request_profiler.in_flight: return
+    capture = g.pop("_profile", None)
+    if capture is not None:
+        request_profiler.finish(capture, request.endpoint)
+
+# ----------------------
+# JSON RESPONSES
+# ----------------------
+# JSON_ENCODER=stdlib forces Flask's default encoder even when orjson is installed.
+JSON_ENCODER = os.environ.get("JSON_ENCODER", "orjson" if ORJSON_AVAILABLE else "stdlib")
+JSON_COMPRESS_MIN_BYTES = int(os.environ.get("JSON_COMPRESS_MIN_BYTES", "1024"))
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Drop-in for Flask's JSON provider that encodes with orjson.
+
+    Same data as the default provider (keys sorted when sort_keys is set,
+    dates/Decimals handed to Flask's own default() hook), but not the same
+    bytes: separators are always compact and non-ASCII text is written as
+    UTF-8 rather than \\uXXXX escapes. Anything orjson rejects, such as
+    integers wider than 64 bits, falls back to the default provider.
+    """
+    def _options(self):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys: option |= orjson.OPT_SORT_KEYS
+        if (self.compact is None and self._app.debug) or self.compact is False: option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if set(kwargs) - {"separators"}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+        except TypeError:  # orjson.JSONEncodeError subclasses TypeError.
+            return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+if JSON_ENCODER == "orjson" and ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=5)
+
+@app.after_request
+def compress_json_response(response):
+    # Only buffered JSON bodies above the threshold are worth the CPU; files and
+    # streams are left alone (static assets are precompressed by build_assets.py).
+    if (response.mimetype != "application/json" or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers or not 200 <= response.status_code < 300):
+        return response
+    body = response.get_data()
+    if len(body) < JSON_COMPRESS_MIN_BYTES:
+        return response
+    accepted = request.accept_encodings
+    encoding = "br" if BROTLI_AVAILABLE and accepted["br"] else "gzip" if accepted["gzip"] else None
+    if encoding is None:
+        return response
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def stream_json_array(rows, chunk_size=64 * 1024):
+    """Streams an iterable of dicts as a JSON array in ~chunk_size pieces, gzip-compressed
+    on the fly when the client accepts it, so large listings are never held in memory.
+    `rows` is consumed after the view returns; it should open its own cursor lazily."""
+    use_gzip = bool(request.accept_encodings["gzip"])
+
+    def generate():
+        compressor = zlib.compressobj(5, zlib.DEFLATED, 31) if use_gzip else None
+        pending, size = ["["], 1
+        for i, row in enumerate(rows):
+            piece = ("," if i else "") + app.json.dumps(row)
+            pending.append(piece); size += len(piece)
+            if size >= chunk_size:
+                chunk = "".join(pending).encode(); pending, size = [], 0
+                chunk = compressor.compress(chunk) if compressor else chunk
+                if chunk: yield chunk
+        pending.append("]\n")
+        chunk = "".join(pending).encode()
+        yield compressor.compress(chunk) + compressor.flush() if compressor else chunk
+
+    response = app.response_class(stream_with_context(generate()), mimetype="application/json")
+    if use_gzip:
+        response.headers['Content-Encoding'] = "gzip"
+        response.vary.add('Accept-Encoding')
+    return response
+
 # ----------------------
 # DATABASE
 # ----------------------
@@ -94,102 +653,569 @@ template_env.globals['timedelta'] = timedelta
 
 
 
+def _record_sql_time(started, queries=1, earlier=0.0):
+    try:
+        g._sql_seconds = g.get("_sql_seconds", 0.0) + (time.perf_counter() - started) + earlier
+        g._sql_queries = g.get("_sql_queries", 0) + queries
+    except RuntimeError:
+        pass  # Used outside an app context (CLI scripts).
+
+class IntegrityError(Exception):
+    """A constraint violation (duplicate key, NOT NULL, ...) from either database backend."""
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that adds the time spent executing and fetching to the request's SQL total."""
+    def execute(self, *args):
+        started = time.perf_counter()
+        try: return super().execute(*args)
+        except sqlite3.IntegrityError as e: raise IntegrityError(str(e)) from e
+        finally: _record_sql_time(started)
+
+    def executemany(self, *args):
+        started = time.perf_counter()
+        try: return super().executemany(*args)
+        except sqlite3.IntegrityError as e: raise IntegrityError(str(e)) from e
+        finally: _record_sql_time(started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try: return super().fetchone()
+        finally: _record_sql_time(started, queries=0)
+
+    def fetchmany(self, *args):
+        started = time.perf_counter()
+        try: return super().fetchmany(*args)
+        finally: _record_sql_time(started, queries=0)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try: return super().fetchall()
+        finally: _record_sql_time(started, queries=0)
+
+    # Streamed scans (streaming_cursor) step through rows by iterating, so time that too.
+    # Rows are timed one by one but added to the request total once, at the end of the scan.
+    _streamed = 0.0
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            _record_sql_time(started, queries=0, earlier=self._streamed)
+            self._streamed = 0.0
+            raise
+        self._streamed += time.perf_counter() - started
+        return row
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute() bypasses cursor(), so route it through explicitly.
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+_SQL_LITERAL = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+@lru_cache(maxsize=1024)
+def mysql_paramstyle(sql):
+    """Rewrites sqlite3-style SQL for MySQLdb: ? placeholders become %s, and literal %
+    signs are doubled because MySQLdb %-formats the query. Quoted strings are left alone."""
+    parts = _SQL_LITERAL.split(sql)
+    return "".join(part.replace("%", "%%") if i % 2 else part.replace("%", "%%").replace("?", "%s")
+                   for i, part in enumerate(parts))
+
+class MySQLCursor:
+    """MySQLdb cursor that accepts the sqlite3-style SQL used throughout this file."""
+    def __init__(self, cursor, driver):
+        self._cursor, self._driver = cursor, driver
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            # MySQLdb only %-formats the query when parameters are given.
+            return self._cursor.execute(sql if params is None else mysql_paramstyle(sql), params)
+        except self._driver.IntegrityError as e: raise IntegrityError(str(e)) from e
+        finally: _record_sql_time(started)
+
+    def executemany(self, sql, seq_of_params):
+        started = time.perf_counter()
+        try: return self._cursor.executemany(mysql_paramstyle(sql), seq_of_params)
+        except self._driver.IntegrityError as e: raise IntegrityError(str(e)) from e
+        finally: _record_sql_time(started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try: return self._cursor.fetchone()
+        finally: _record_sql_time(started, queries=0)
+
+    def fetchmany(self, *args):
+        started = time.perf_counter()
+        try: return self._cursor.fetchmany(*args)
+        finally: _record_sql_time(started, queries=0)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try: return self._cursor.fetchall()
+        finally: _record_sql_time(started, queries=0)
+
+    def __iter__(self):
+        # Timed per row and recorded once at the end, like TimedCursor.__next__.
+        streamed, fetchone = 0.0, self._cursor.fetchone
+        while True:
+            started = time.perf_counter()
+            row = fetchone()
+            if row is None:
+                _record_sql_time(started, queries=0, earlier=streamed)
+                return
+            streamed += time.perf_counter() - started
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)  # lastrowid, rowcount, close, ...
+
+class MySQLConnection:
+    """MySQLdb connection whose cursors take sqlite3-style SQL and return dict rows."""
+    def __init__(self, connection, driver):
+        self._connection, self._driver = connection, driver
+
+    def cursor(self, streaming=False):
+        cursorclass = self._driver.cursors.SSDictCursor if streaming else self._driver.cursors.DictCursor
+        return MySQLCursor(self._connection.cursor(cursorclass), self._driver)
+
+    def execute(self, sql, params=None):
+        cursor = self.cursor()
+        cursor.execute(sql, params)
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)  # commit, rollback, close, ...
+
+def streaming_cursor(db):
+    """Cursor for large scans whose rows are pulled from the server while iterating.
+
+    sqlite3 cursors already step through results lazily; on MySQL this is an
+    unbuffered SSDictCursor, which must be read to the end (or closed) before
+    the connection runs another query.
+    """
+    if isinstance(db, sqlite3.Connection):
+        return db.cursor()
+    return db.cursor(streaming=True)
+
 def get_db():
     db = getattr(g, "_database", None)
     if db is None:
         # Check if running on PythonAnywhere by looking for an environment variable
         if 'PYTHONANYWHERE_DOMAIN' in os.environ:
             # PRODUCTION: Connect to MySQL on PythonAnywhere
-            db = g._database = MySQLdb.connect(
+            import MySQLdb, MySQLdb.cursors
+            from MySQLdb.constants import CLIENT
+            db = g._database = MySQLConnection(MySQLdb.connect(
                 host=os.environ.get('DB_HOST'),
                 user=os.environ.get('DB_USER'),
                 passwd=os.environ.get('DB_PASSWORD'),
                 db=os.environ.get('DB_NAME'),
-                cursorclass=MySQLdb.cursors.DictCursor # This makes it behave like the old db
-            )
+                cursorclass=MySQLdb.cursors.DictCursor, # This makes it behave like the old db
+                # rowcount counts matched rather than changed rows, as on SQLite; save_quote
+                # and the guarded updates rely on it.
+                client_flag=CLIENT.FOUND_ROWS
+            ), MySQLdb)
         else:
             # LOCAL DEVELOPMENT: Fallback to SQLite
-            db = g._database = sqlite3.connect(DB_FILE)
+            db = g._database = sqlite3.connect(DB_FILE, factory=TimedConnection)
             db.row_factory = sqlite3.Row
+        ensure_schema(db)
     return db
 
+def begin_immediate(db):
+    """Opens a write transaction right away instead of on the first write."""
+    if isinstance(db, sqlite3.Connection):
+        # Python's sqlite3 may already hold an implicit transaction; BEGIN inside it fails.
+        if db.in_transaction: db.commit()
+        db.execute("BEGIN IMMEDIATE")
+    else:
+        db.cursor().execute("START TRANSACTION")
+
 @app.teardown_appcontext
 def close_connection(exception):
-    db = getattr(g, "_database", None)
+    # Popped rather than left closed: streamed responses re-enter this context
+    # after teardown and must be able to open a fresh connection.
+    db = g.pop("_database", None)
     if db is not None:
         db.close()
 
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+def ensure_schema(db):
+    """Runs create_schema once per process and database, on the first connection.
+
+    Deployments never call init_db() (gunicorn and PythonAnywhere import the
+    app), so this is what brings an existing database up to date.
+    """
+    key = DB_FILE if isinstance(db, sqlite3.Connection) else "mysql"
+    if key in _schema_ready: return
+    with _schema_lock:
+        if key in _schema_ready: return
+        try:
+            create_schema(db)
+        except Exception as e:
+            # Not marked ready, so the next connection tries again; this request carries on.
+            db.rollback()
+            print(f"Schema migration failed: {e}")
+            return
+        _schema_ready.add(key)
+
 def init_db():
+    """Creates the schema up front (local runs and scripts) instead of on the first request."""
     with app.app_context():
-        db = get_db()
-        cur = db.cursor()
+        get_db()
+
+# Bumped for each one-off data migration in create_schema; recorded in PRAGMA user_version.
+SCHEMA_VERSION = 2
+
+def create_schema(db):
+    """Creates whatever tables, columns, indexes and triggers are missing. Idempotent."""
+    if not isinstance(db, sqlite3.Connection):
+        return create_mysql_schema(db)
+    cur = db.cursor()
+    # Workers starting together queue up here instead of racing on the DDL and the package seed.
+    begin_immediate(db)
+    cur.execute("PRAGMA user_version")
+    version = cur.fetchone()[0]
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT DEFAULT 'user' NOT NULL,
+            is_approved INTEGER DEFAULT 0 NOT NULL
+        );
+    """)
+    try:
+        cur.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'user' NOT NULL")
+    except sqlite3.OperationalError: pass
+    try:
+        cur.execute("ALTER TABLE users ADD COLUMN is_approved INTEGER DEFAULT 0 NOT NULL")
+    except sqlite3.OperationalError: pass
+    
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS quotes (
+            id TEXT PRIMARY KEY, 
+            user_id INTEGER,
+            customer_name TEXT, 
+            project_name TEXT,
+            quote_data TEXT NOT NULL, 
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'Draft' NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+    """)
+    try:
+        cur.execute("ALTER TABLE quotes ADD COLUMN user_id INTEGER")
+    except sqlite3.OperationalError: pass
+    try:
+        cur.execute("ALTER TABLE quotes ADD COLUMN status TEXT DEFAULT 'Draft' NOT NULL")
+    except sqlite3.OperationalError: pass
+
+    cur.execute("CREATE TABLE IF NOT EXISTS device_images (model_id TEXT PRIMARY KEY, filename TEXT NOT NULL);")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT, model TEXT UNIQUE,
+            description TEXT, price REAL, stock INTEGER DEFAULT 0, imageFilename TEXT,
+            status TEXT DEFAULT 'Active' NOT NULL
+        );
+    """)
+    try:
+        cur.execute("ALTER TABLE products ADD COLUMN status TEXT DEFAULT 'Active' NOT NULL")
+    except sqlite3.OperationalError: pass
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS imports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT,
+            imported_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS packages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, description TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS package_items (
+            package_id INTEGER NOT NULL, model TEXT NOT NULL, quantity INTEGER DEFAULT 1 NOT NULL,
+            position INTEGER DEFAULT 0 NOT NULL,
+            PRIMARY KEY (package_id, model),
+            FOREIGN KEY (package_id) REFERENCES packages (id)
+        );
+    """)
+    try:
+        cur.execute("ALTER TABLE package_items ADD COLUMN position INTEGER DEFAULT 0 NOT NULL")
+        cur.execute("UPDATE package_items SET position = rowid")
+    except sqlite3.OperationalError: pass
+    # Change log the per-worker caches replay to stay in sync; written only by triggers.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, key TEXT
+        );
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS catalog_changes_prune AFTER INSERT ON catalog_changes BEGIN
+            DELETE FROM catalog_changes WHERE seq <= NEW.seq - 10000;
+        END;
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_changed_insert AFTER INSERT ON products BEGIN
+            INSERT INTO catalog_changes (kind, key) VALUES ('product', NEW.model);
+        END;
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_changed_update AFTER UPDATE ON products BEGIN
+            INSERT INTO catalog_changes (kind, key) VALUES ('product', OLD.model);
+            INSERT INTO catalog_changes (kind, key) SELECT 'product', NEW.model WHERE NEW.model IS NOT OLD.model;
+        END;
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_changed_delete AFTER DELETE ON products BEGIN
+            INSERT INTO catalog_changes (kind, key) VALUES ('product', OLD.model);
+        END;
+    """)
+    if version < 2:
+        # A rename must also drop the cached expansion under the old name. Recreated so
+        # databases made before OLD.name was logged pick up the current definition.
+        cur.execute("DROP TRIGGER IF EXISTS packages_changed_update")
         cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT DEFAULT 'user' NOT NULL,
-                is_approved INTEGER DEFAULT 0 NOT NULL
-            );
+            CREATE TRIGGER packages_changed_update AFTER UPDATE ON packages BEGIN
+                INSERT INTO catalog_changes (kind, key) VALUES ('package', NEW.name);
+                INSERT INTO catalog_changes (kind, key) SELECT 'package', OLD.name WHERE OLD.name IS NOT NEW.name;
+            END;
         """)
-        try:
-            cur.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'user' NOT NULL")
-        except sqlite3.OperationalError: pass
-        try:
-            cur.execute("ALTER TABLE users ADD COLUMN is_approved INTEGER DEFAULT 0 NOT NULL")
-        except sqlite3.OperationalError: pass
-        
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS quotes (
-                id TEXT PRIMARY KEY, 
-                user_id INTEGER,
-                customer_name TEXT, 
-                project_name TEXT,
-                quote_data TEXT NOT NULL, 
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'Draft' NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            );
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        if event != "UPDATE":
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS packages_changed_{event.lower()} AFTER {event} ON packages BEGIN
+                    INSERT INTO catalog_changes (kind, key) VALUES ('package', {row}.name);
+                END;
+            """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS package_items_changed_{event.lower()} AFTER {event} ON package_items BEGIN
+                INSERT INTO catalog_changes (kind, key) SELECT 'package', name FROM packages WHERE id = {row}.package_id;
+            END;
         """)
-        try:
-            cur.execute("ALTER TABLE quotes ADD COLUMN user_id INTEGER")
-        except sqlite3.OperationalError: pass
-        try:
-            cur.execute("ALTER TABLE quotes ADD COLUMN status TEXT DEFAULT 'Draft' NOT NULL")
-        except sqlite3.OperationalError: pass
 
-        cur.execute("CREATE TABLE IF NOT EXISTS device_images (model_id TEXT PRIMARY KEY, filename TEXT NOT NULL);")
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT, model TEXT UNIQUE,
-                description TEXT, price REAL, stock INTEGER DEFAULT 0, imageFilename TEXT,
-                status TEXT DEFAULT 'Active' NOT NULL
-            );
+    # Serves the low-stock lookups (stock <= LOW_STOCK_THRESHOLD) and the stock-ordered inventory.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_stock ON products (stock)")
+
+    # Feed for the live dashboard (DashboardEventHub); written only by triggers, so every
+    # write path (routes, price uploads, batch scripts) is covered. data is the JSON payload.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS dashboard_events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, data TEXT NOT NULL
+        );
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS dashboard_events_prune AFTER INSERT ON dashboard_events BEGIN
+            DELETE FROM dashboard_events WHERE seq <= NEW.seq - 10000;
+        END;
+    """)
+    product = lambda row: (f"json_object('model', {row}.model, 'description', {row}.description, 'category', {row}.category, "
+                           f"'price', {row}.price, 'stock', {row}.stock, 'status', {row}.status)")
+    quote = lambda row: (f"json_object('id', {row}.id, 'customer_name', {row}.customer_name, 'project_name', {row}.project_name, "
+                         f"'timestamp', {row}.timestamp, 'status', {row}.status, "
+                         f"'user_name', COALESCE((SELECT name FROM users WHERE id = {row}.user_id), 'System/Legacy'))")
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS products_event_insert AFTER INSERT ON products BEGIN
+            INSERT INTO dashboard_events (kind, data) VALUES ('product', {product("NEW")});
+        END;
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_event_stock AFTER UPDATE OF stock ON products
+        WHEN NEW.stock IS NOT OLD.stock BEGIN
+            INSERT INTO dashboard_events (kind, data) VALUES ('stock', json_object(
+                'model', NEW.model, 'description', NEW.description, 'stock', NEW.stock, 'previous', OLD.stock));
+        END;
+    """)
+    # Price uploads rewrite every row, so only real changes are reported.
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS products_event_update AFTER UPDATE ON products
+        WHEN NEW.model IS NOT OLD.model OR NEW.description IS NOT OLD.description OR NEW.category IS NOT OLD.category
+            OR NEW.price IS NOT OLD.price OR NEW.status IS NOT OLD.status BEGIN
+            INSERT INTO dashboard_events (kind, data) SELECT 'product_deleted', json_object('model', OLD.model)
+                WHERE NEW.model IS NOT OLD.model;
+            INSERT INTO dashboard_events (kind, data) VALUES ('product', {product("NEW")});
+        END;
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_event_delete AFTER DELETE ON products BEGIN
+            INSERT INTO dashboard_events (kind, data) VALUES ('product_deleted', json_object('model', OLD.model));
+        END;
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS quotes_event_insert AFTER INSERT ON quotes BEGIN
+            INSERT INTO dashboard_events (kind, data) VALUES ('quote', {quote("NEW")});
+        END;
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS quotes_event_update AFTER UPDATE OF user_id, customer_name, project_name, quote_data, timestamp, status ON quotes BEGIN
+            INSERT INTO dashboard_events (kind, data) VALUES ('quote', {quote("NEW")});
+        END;
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS quotes_event_delete AFTER DELETE ON quotes BEGIN
+            INSERT INTO dashboard_events (kind, data) VALUES ('quote_deleted', json_object('id', OLD.id));
+        END;
+    """)
+
+    # Quote history: zlib-compressed JSON, either a full snapshot or a JSON Patch
+    # against the previous revision (see record_quote_revision).
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS quote_revisions (
+            quote_id TEXT NOT NULL, revision INTEGER NOT NULL, kind TEXT NOT NULL,
+            data BLOB NOT NULL, user_id INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (quote_id, revision)
+        );
+    """)
+
+    # Full-text index over quotes, keyed by quotes.rowid and kept current by triggers
+    # (so save_quote must update rows in place rather than INSERT OR REPLACE them).
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS quotes_fts USING fts5(
+            customer_name, project_name, items, tokenize = "unicode61 tokenchars '-_'"
+        );
+    """)
+    line_items = lambda row: (f"(SELECT group_concat(COALESCE(json_extract(value, '$.model'), '') || ' ' || "
+                              f"COALESCE(json_extract(value, '$.description'), ''), ' ') FROM json_each({row}.quote_data, '$.items'))")
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS quotes_fts_insert AFTER INSERT ON quotes BEGIN
+            INSERT INTO quotes_fts (rowid, customer_name, project_name, items)
+            VALUES (NEW.rowid, NEW.customer_name, NEW.project_name, {line_items("NEW")});
+        END;
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS quotes_fts_update AFTER UPDATE OF customer_name, project_name, quote_data ON quotes BEGIN
+            DELETE FROM quotes_fts WHERE rowid = OLD.rowid;
+            INSERT INTO quotes_fts (rowid, customer_name, project_name, items)
+            VALUES (NEW.rowid, NEW.customer_name, NEW.project_name, {line_items("NEW")});
+        END;
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS quotes_fts_delete AFTER DELETE ON quotes BEGIN
+            DELETE FROM quotes_fts WHERE rowid = OLD.rowid;
+        END;
+    """)
+    if version < 1:
+        # Index quotes saved before the index existed.
+        cur.execute(f"""
+            INSERT INTO quotes_fts (rowid, customer_name, project_name, items)
+            SELECT q.rowid, q.customer_name, q.project_name, {line_items("q")} FROM quotes q
+            WHERE q.rowid NOT IN (SELECT rowid FROM quotes_fts)
         """)
-        try:
-            cur.execute("ALTER TABLE products ADD COLUMN status TEXT DEFAULT 'Active' NOT NULL")
-        except sqlite3.OperationalError: pass
 
+    seed_packages(cur)
+    # Committed with the migrations above, so a failed start reruns them next time.
+    if version < SCHEMA_VERSION: cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    db.commit()
+
+def create_mysql_schema(db):
+    """MySQL/MariaDB DDL for the tables added since the original schema, which was
+    created by hand on the server. Mirrors create_schema; a named lock keeps
+    workers that start together from creating the same trigger twice."""
+    cur = db.cursor()
+    cur.execute("SELECT GET_LOCK('radix_schema', 60)")
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS packages (
+                id INTEGER PRIMARY KEY AUTO_INCREMENT, name VARCHAR(255) UNIQUE NOT NULL, description TEXT,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS package_items (
+                package_id INTEGER NOT NULL, model VARCHAR(255) NOT NULL, quantity INTEGER DEFAULT 1 NOT NULL,
+                position INTEGER DEFAULT 0 NOT NULL,
+                PRIMARY KEY (package_id, model),
+                FOREIGN KEY (package_id) REFERENCES packages (id)
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS catalog_changes (
+                seq BIGINT PRIMARY KEY AUTO_INCREMENT, kind VARCHAR(16) NOT NULL, `key` VARCHAR(255)
+            )
+        """)
         cur.execute("""
-            CREATE TABLE IF NOT EXISTS imports (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT,
-                imported_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            );
+            CREATE TABLE IF NOT EXISTS quote_revisions (
+                quote_id VARCHAR(64) NOT NULL, revision INTEGER NOT NULL, kind VARCHAR(16) NOT NULL,
+                data LONGBLOB NOT NULL, user_id INTEGER,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (quote_id, revision)
+            )
         """)
+        # MySQL triggers can't write to their own table, so catalog_changes is pruned by the
+        # triggers that append to it rather than by one of its own.
+        prune = "DELETE FROM catalog_changes WHERE seq <= LAST_INSERT_ID() - 10000;"
+        triggers = {
+            "products_changed_insert": ("INSERT", "products", "INSERT INTO catalog_changes (kind, `key`) VALUES ('product', NEW.model);"),
+            "products_changed_update": ("UPDATE", "products", "INSERT INTO catalog_changes (kind, `key`) VALUES ('product', OLD.model); "
+                                        "IF NOT (NEW.model <=> OLD.model) THEN INSERT INTO catalog_changes (kind, `key`) VALUES ('product', NEW.model); END IF;"),
+            "products_changed_delete": ("DELETE", "products", "INSERT INTO catalog_changes (kind, `key`) VALUES ('product', OLD.model);"),
+            "packages_changed_insert": ("INSERT", "packages", "INSERT INTO catalog_changes (kind, `key`) VALUES ('package', NEW.name);"),
+            "packages_changed_update": ("UPDATE", "packages", "INSERT INTO catalog_changes (kind, `key`) VALUES ('package', NEW.name); "
+                                        "IF NOT (NEW.name <=> OLD.name) THEN INSERT INTO catalog_changes (kind, `key`) VALUES ('package', OLD.name); END IF;"),
+            "packages_changed_delete": ("DELETE", "packages", "INSERT INTO catalog_changes (kind, `key`) VALUES ('package', OLD.name);"),
+        }
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            triggers[f"package_items_changed_{event.lower()}"] = (
+                event, "package_items", f"INSERT INTO catalog_changes (kind, `key`) SELECT 'package', name FROM packages WHERE id = {row}.package_id;")
+        cur.execute("SELECT TRIGGER_NAME AS name FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA = DATABASE()")
+        existing = {r["name"] for r in cur.fetchall()}
+        for name, (event, table, body) in triggers.items():
+            if name not in existing:
+                cur.execute(f"CREATE TRIGGER {name} AFTER {event} ON {table} FOR EACH ROW BEGIN {body} {prune} END")
+        seed_packages(cur)
         db.commit()
+    finally:
+        cur.execute("SELECT RELEASE_LOCK('radix_schema')")
+
+def seed_packages(cur):
+    """Seeds the two packages that used to be hardcoded in get_packages (keyed by description)."""
+    cur.execute("SELECT COUNT(*) AS n FROM packages")
+    if cur.fetchone()["n"] != 0: return
+    for name, members in (("1BR Platinum", {"MixPad M2 black L&N connection": 1}), ("2BR Silver", {"MixPad 7 Ultra Silver": 1})):
+        models = []
+        for description, qty in members.items():
+            cur.execute("SELECT model FROM products WHERE description = ? LIMIT 1", (description,))
+            row = cur.fetchone()
+            if row: models.append((row["model"], qty))
+        if models:
+            cur.execute("INSERT INTO packages (name) VALUES (?)", (name,))
+            package_id = cur.lastrowid
+            cur.executemany("INSERT INTO package_items (package_id, model, quantity, position) VALUES (?, ?, ?, ?)",
+                            [(package_id, m, q, n) for n, (m, q) in enumerate(models)])
 
 COUNTERS_FILE = "counters.json"
 
 def get_and_increment_counter(key):
-    try:
-        with open(COUNTERS_FILE, "r") as f:
-            counters = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        counters = {"quotation_number": 1000, "bom_reference": 500}
-    counters[key] = counters.get(key, 0) + 1
-    with open(COUNTERS_FILE, "w") as f:
-        json.dump(counters, f, indent=4)
+    # Locked read-modify-write: several gunicorn workers or batch processes may
+    # hand out numbers at the same time.
+    with os.fdopen(os.open(COUNTERS_FILE, os.O_RDWR | os.O_CREAT), "r+") as f:
+        locked = _lock_file(f)
+        try:
+            try:
+                counters = json.loads(f.read())
+            except json.JSONDecodeError:
+                counters = {"quotation_number": 1000, "bom_reference": 500}
+            counters[key] = counters.get(key, 0) + 1
+            f.seek(0); f.truncate()
+            json.dump(counters, f, indent=4)
+        finally:
+            if locked: _unlock_file(f)
     return counters[key]
 
 # ----------------------
@@ -202,7 +1228,7 @@ def token_required(f):
         if not token:
             if request.path.startswith('/api/'):
                 return jsonify({'message': 'Authentication token is missing!'}), 401
-            return send_from_directory("./public", "login.html")
+            return send_page("login.html")
         try:
             data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
             db = get_db()
@@ -211,10 +1237,11 @@ def token_required(f):
             current_user = cur.fetchone()
             if not current_user:
                 return jsonify({'message': 'User not found!'}), 401
+            g.user_id = current_user['id']
         except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
             if request.path.startswith('/api/'):
                 return jsonify({'message': 'Token is invalid or expired!'}), 401
-            resp = make_response(send_from_directory("./public", "login.html"))
+            resp = make_response(send_page("login.html"))
             resp.set_cookie('token', '', expires=0)
             return resp
         return f(current_user, *args, **kwargs)
@@ -237,6 +1264,7 @@ def admin_required(f):
             current_user = cur.fetchone()
             if not current_user:
                 return jsonify({'message': 'User not found!'}), 401
+            g.user_id = current_user['id']
         except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
             return jsonify({'message': 'Token is invalid or expired!'}), 401
         
@@ -255,6 +1283,377 @@ def get_user_initials(name):
         return parts[0][:3]
     return "SYS" # Fallback for system or legacy users
 
+def next_quote_id(cursor, user_name):
+    """Builds the next semantic quote ID: QUO + date + user initials + daily sequence
+    (3 digits, widening past 999)."""
+    initials = get_user_initials(user_name)
+    date_str = datetime.now().strftime('%Y%m%d')
+    id_prefix = f"QUO{date_str}{initials}"
+
+    # Find the last sequence number for this user on this day. Longest first so ...HR1000
+    # sorts above ...HR999; IDs whose suffix is not all digits belong to a user whose
+    # initials extend these (HR vs HRA) and are skipped.
+    cursor.execute(
+        "SELECT id FROM quotes WHERE id LIKE ? ORDER BY LENGTH(id) DESC, id DESC",
+        (f"{id_prefix}%",)
+    )
+    last_quote = cursor.fetchone()
+    while last_quote is not None and not last_quote['id'][len(id_prefix):].isdigit():
+        last_quote = cursor.fetchone()
+    next_seq = int(last_quote['id'][len(id_prefix):]) + 1 if last_quote else 1
+    return f"{id_prefix}{next_seq:03d}"
+
+def calculate_totals(items, installation_cost=0, discount_percent=0):
+    """Applies the discount to the item subtotal, adds installation, then VAT (rounded to cents)."""
+    installation = Decimal(str(installation_cost or 0))
+    discount = Decimal(str(discount_percent or 0))
+    subtotal = sum(Decimal(str(i.get("price", 0))) * int(i.get("quantity", 1)) for i in items)
+
+    discount_amount = (subtotal * (discount / Decimal(100))).quantize(Decimal("0.01"), ROUND_HALF_UP)
+    subtotal_after_discount = subtotal - discount_amount
+    taxable_base = subtotal_after_discount + installation
+    vat = (taxable_base * VAT_RATE).quantize(Decimal("0.01"), ROUND_HALF_UP)
+    grand_total = taxable_base + vat
+
+    return {
+        "subtotal": float(subtotal),
+        "installation": float(installation),
+        "discountPercent": float(discount),
+        "discountAmount": float(discount_amount),
+        "vat": float(vat),
+        "total": float(grand_total)
+    }
+
+def _pack_revision(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+def _unpack_revision(blob):
+    return json.loads(zlib.decompress(blob))
+
+def quote_version(cursor, quote_id):
+    """The optimistic-concurrency version of a quote: its latest revision number (0 if it has none)."""
+    cursor.execute("SELECT MAX(revision) AS rev FROM quote_revisions WHERE quote_id = ?", (quote_id,))
+    return cursor.fetchone()["rev"] or 0
+
+def record_quote_revision(cursor, quote_id, user_id, data, previous=None, patch=None):
+    """Appends `data` as the next revision of a quote and returns its number.
+
+    `previous` is the quote as currently stored (None for a new quote). The
+    revision is kept as a JSON Patch against it, except every
+    QUOTE_SNAPSHOT_INTERVAL revisions (or when the patch would be larger) where
+    the full quote is stored, so rebuilding any revision replays a bounded
+    number of patches. Saves that change nothing do not add a revision.
+    A caller that already has the patch from `previous` to `data` can pass it in.
+    """
+    last = quote_version(cursor, quote_id)
+    if previous is not None and last == 0:
+        # Quote saved before revisions were kept: its stored state becomes revision 1.
+        cursor.execute("INSERT INTO quote_revisions (quote_id, revision, kind, data) VALUES (?, 1, 'snapshot', ?)",
+                       (quote_id, _pack_revision(previous)))
+        last = 1
+    if previous == data:
+        return last
+
+    revision = last + 1
+    kind, blob = "snapshot", _pack_revision(data)
+    if previous is not None and (revision - 1) % QUOTE_SNAPSHOT_INTERVAL != 0:
+        delta = _pack_revision(patch if patch is not None else jsonpatch.make_patch(previous, data).patch)
+        if len(delta) < len(blob):
+            kind, blob = "delta", delta
+    cursor.execute("INSERT INTO quote_revisions (quote_id, revision, kind, data, user_id) VALUES (?, ?, ?, ?, ?)",
+                   (quote_id, revision, kind, blob, user_id))
+    return revision
+
+def load_quote_revision(cursor, quote_id, revision):
+    """Rebuilds one revision from the nearest snapshot at or before it; None if it does not exist."""
+    cursor.execute("SELECT MAX(revision) AS rev FROM quote_revisions WHERE quote_id = ? AND revision <= ? AND kind = 'snapshot'",
+                   (quote_id, revision))
+    base = cursor.fetchone()["rev"]
+    if base is None:
+        return None
+    cursor.execute("SELECT revision, kind, data FROM quote_revisions WHERE quote_id = ? AND revision BETWEEN ? AND ? ORDER BY revision",
+                   (quote_id, base, revision))
+    rows = cursor.fetchall()
+    if rows[-1]["revision"] != revision:
+        return None
+    quote = _unpack_revision(rows[0]["data"])
+    for row in rows[1:]:
+        quote = jsonpatch.apply_patch(quote, _unpack_revision(row["data"]), in_place=True)
+    return quote
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def parse_timestamp(value):
+    """SQLite hands back DATETIME columns as text; Excel wants real datetimes."""
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return value
+    return value
+
+def new_workbook():
+    # Write-only workbooks spool each sheet's rows to disk as they are appended,
+    # so memory does not grow with the number of rows.
+    from openpyxl import Workbook
+    return Workbook(write_only=True)
+
+def send_workbook(workbook, filename):
+    """Saves the workbook to a temporary file and streams it back in chunks."""
+    tmp = tempfile.TemporaryFile()
+    workbook.save(tmp)
+    size = tmp.tell()
+    tmp.seek(0)
+    response = send_file(tmp, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=filename)
+    response.content_length = size
+    return response
+
+def quote_line_rows(quote_id, items):
+    for item in items:
+        price, quantity = Decimal(str(item.get("price", 0))), int(item.get("quantity", 1))
+        yield [quote_id, item.get("model"), item.get("description"), item.get("category"), quantity, float(price), float(price * quantity)]
+
+class PackageCache:
+    """Per-worker cache of the model -> product index and of expanded packages.
+
+    Workers stay coherent by replaying catalog_changes, which SQLite triggers
+    append to whenever a product or package row changes: only the changed
+    products are re-read, and only the expansions that contain them are dropped.
+    """
+    FULL_RELOAD_AFTER = 2000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.products, self.expanded, self.seq = None, {}, 0
+
+    def _product_row(self, r):
+        return {"model": r["model"], "description": r["description"], "price": float(r["price"] or 0.0),
+                "stock": r["stock"] or 0, "category": r["category"], "status": r["status"],
+                "imageUrl": f"/uploads/{r['imageFilename']}" if r["imageFilename"] else None}
+
+    def _full_reload(self, cursor):
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) AS seq FROM catalog_changes")
+        self.seq = cursor.fetchone()["seq"]
+        cursor.execute("SELECT model, description, price, stock, category, status, imageFilename FROM products WHERE model IS NOT NULL")
+        self.products = {r["model"]: self._product_row(r) for r in cursor.fetchall()}
+        self.expanded = {}
+
+    def sync(self, cursor):
+        if self.products is None:
+            return self._full_reload(cursor)
+        cursor.execute("SELECT seq, kind, `key` FROM catalog_changes WHERE seq > ? ORDER BY seq LIMIT ?", (self.seq, self.FULL_RELOAD_AFTER + 1))
+        changes = cursor.fetchall()
+        if not changes: return
+        # Sequence numbers are contiguous, so a gap means entries were pruned before we saw them.
+        if len(changes) > self.FULL_RELOAD_AFTER or changes[0]["seq"] != self.seq + 1:
+            return self._full_reload(cursor)
+        models = {c["key"] for c in changes if c["kind"] == "product"}
+        packages = {c["key"] for c in changes if c["kind"] == "package"}
+        if models:
+            for model in models: self.products.pop(model, None)
+            model_list = list(models)
+            for start in range(0, len(model_list), 500):
+                chunk = model_list[start:start + 500]
+                cursor.execute(f"SELECT model, description, price, stock, category, status, imageFilename FROM products WHERE model IN ({','.join('?' * len(chunk))})", chunk)
+                self.products.update({r["model"]: self._product_row(r) for r in cursor.fetchall()})
+        self.expanded = {name: e for name, e in self.expanded.items()
+                         if name not in packages and not models.intersection(e["_members"])}
+        self.seq = changes[-1]["seq"]
+
+    def expand(self, cursor, name):
+        """Returns the package as priced quote lines, or None if it does not exist."""
+        with self.lock:
+            self.sync(cursor)
+            cached = self.expanded.get(name)
+            if cached is None:
+                cursor.execute("SELECT id, name, description FROM packages WHERE name = ?", (name,))
+                package = cursor.fetchone()
+                if not package: return None
+                cursor.execute("SELECT model, quantity FROM package_items WHERE package_id = ? ORDER BY position", (package["id"],))
+                members = cursor.fetchall()
+                items, missing = [], []
+                for m in members:
+                    product = self.products.get(m["model"])
+                    if product is None:
+                        missing.append(m["model"]); continue
+                    items.append({"uniqueId": product["model"], **product, "quantity": m["quantity"]})
+                cached = {"name": package["name"], "description": package["description"], "items": items, "missing": missing,
+                          "total": round(sum(i["price"] * i["quantity"] for i in items), 2),
+                          "_members": {m["model"] for m in members}}
+                self.expanded[name] = cached
+            return {k: v for k, v in cached.items() if k != "_members"}
+
+package_cache = PackageCache()
+
+class DashboardEventHub:
+    """Per-worker fan-out of dashboard_events to the worker's open SSE streams.
+
+    While at least one stream is open, a single background thread checks the
+    table every SSE_POLL_SECONDS (a primary-key range read that finds nothing
+    while nothing changes) and wakes the streams blocked in wait(). An idle
+    dashboard therefore costs a sleeping thread and a keepalive line.
+    """
+    BUFFER = 1000
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=self.BUFFER)
+        self.seq, self.listeners, self.thread = 0, 0, None
+
+    @staticmethod
+    def read(cursor, after, limit):
+        cursor.execute("SELECT seq, kind, data FROM dashboard_events WHERE seq > ? ORDER BY seq LIMIT ?", (after, limit))
+        return [(r["seq"], r["kind"], r["data"]) for r in cursor.fetchall()]
+
+    def subscribe(self, head):
+        """Registers a stream that has seen everything up to `head`."""
+        with self.condition:
+            self.listeners += 1
+            if self.thread is None:
+                self.seq = head
+                self.events.clear()
+                self.thread = threading.Thread(target=self._poll, name="dashboard-events", daemon=True)
+                self.thread.start()
+
+    def unsubscribe(self):
+        with self.condition:
+            self.listeners -= 1
+
+    def _poll(self):
+        db = sqlite3.connect(DB_FILE)
+        db.row_factory = sqlite3.Row
+        try:
+            while True:
+                with self.condition:
+                    if not self.listeners:
+                        self.thread = None
+                        return
+                    after = self.seq
+                try:
+                    rows = self.read(db.cursor(), after, self.BUFFER)
+                except sqlite3.Error as e:
+                    print(f"Dashboard event poll failed: {e}")
+                    rows = []
+                if rows:
+                    with self.condition:
+                        self.events.extend(rows)
+                        self.seq = rows[-1][0]
+                        self.condition.notify_all()
+                time.sleep(SSE_POLL_SECONDS)
+        finally:
+            db.close()
+
+    def wait(self, after, timeout):
+        """Events after `after`, blocking up to `timeout` seconds for the first one.
+        Returns [] on timeout and None if events the stream still needs were dropped."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > after, timeout)
+            if self.seq <= after:
+                return []
+            if not self.events or self.events[0][0] > after + 1:
+                return None
+            return [e for e in self.events if e[0] > after]
+
+dashboard_hub = DashboardEventHub()
+
+def sse_message(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+def process_product_image(raw):
+    """Turns an uploaded product photo into the stored form: upright (EXIF orientation),
+    no larger than PRODUCT_IMAGE_MAX_PX, background removed, PNG. Raises if raw is not an image."""
+    Image = load_pillow()
+    from PIL import ImageChops, ImageOps
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(raw)))
+    img.thumbnail((PRODUCT_IMAGE_MAX_PX, PRODUCT_IMAGE_MAX_PX), Image.Resampling.LANCZOS)
+    img = img.convert("RGBA")
+    rembg_remove = get_rembg_remove()
+    if rembg_remove:
+        img = rembg_remove(img).convert("RGBA")
+    else:
+        # Near-white pixels (every channel above 240) become transparent.
+        r, g_, b, _ = img.split()
+        near_white = ImageChops.darker(ImageChops.darker(r, g_), b).point(lambda v: 255 if v > 240 else 0)
+        img.paste((255, 255, 255, 0), mask=near_white)
+    output = io.BytesIO()
+    img.save(output, "PNG")
+    return output.getvalue()
+
+def match_images_to_models(filenames, models):
+    """Pairs image files with products: a file belongs to the model that is the longest
+    prefix of its name (spaces in models read as underscores), and each model takes only
+    the first file that matches it. Returns the model (or None) for each filename."""
+    available = {model.replace(' ', '_'): model for model in models}
+    matched = []
+    for name in filenames:
+        stem = Path(name).stem
+        prefix = next((stem[:n] for n in range(len(stem), 0, -1) if stem[:n] in available), None)
+        matched.append(available.pop(prefix) if prefix else None)
+    return matched
+
+def collect_upload_garbage(db, apply=False, archive=False, retention_days=None):
+    """Finds files in the upload folder that nothing references any more and, with
+    apply=True, deletes them (or moves them to UPLOAD_ARCHIVE_FOLDER). Returns a report.
+
+    Referenced: products.imageFilename, device_images and the newest
+    UPLOAD_KEEP_IMPORTS entries in imports. Older price lists stay listed in
+    imports as an audit trail, but their copies are collected like any orphan.
+    """
+    retention_days = UPLOAD_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = time.time() - retention_days * 86400
+    upload_folder = app.config['UPLOAD_FOLDER']
+    cursor = db.cursor()
+    # Holding the write lock keeps uploads from starting to reference a file while it is removed.
+    if apply: begin_immediate(db)
+    try:
+        cursor.execute("SELECT imageFilename AS filename FROM products WHERE imageFilename IS NOT NULL UNION SELECT filename FROM device_images")
+        images = {r["filename"] for r in cursor.fetchall()}
+        cursor.execute("SELECT filename FROM imports WHERE filename IS NOT NULL ORDER BY id DESC")
+        imports = [r["filename"] for r in cursor.fetchall()]
+        referenced = images | set(imports[:UPLOAD_KEEP_IMPORTS])
+        old_imports = set(imports[UPLOAD_KEEP_IMPORTS:]) - referenced
+
+        present, candidates, bytes_scanned, recent = set(), [], 0, 0
+        with os.scandir(upload_folder) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False): continue
+                stat = entry.stat()
+                present.add(entry.name); bytes_scanned += stat.st_size
+                if entry.name in referenced: continue
+                if stat.st_mtime > cutoff:
+                    recent += 1; continue
+                candidates.append({"name": entry.name, "bytes": stat.st_size,
+                                   "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+                                   "reason": "superseded price list" if entry.name in old_imports else "unreferenced"})
+
+        removed, errors = [], []
+        if apply:
+            if archive: os.makedirs(UPLOAD_ARCHIVE_FOLDER, exist_ok=True)
+            for c in candidates:
+                path = os.path.join(upload_folder, c["name"])
+                try:
+                    if archive: shutil.move(path, os.path.join(UPLOAD_ARCHIVE_FOLDER, c["name"]))
+                    else: os.remove(path)
+                    removed.append(c)
+                except OSError as e:
+                    errors.append({"name": c["name"], "error": str(e)})
+        else:
+            removed = candidates
+    finally:
+        if apply: db.commit()
+
+    return {
+        "dry_run": not apply, "action": "archive" if archive else "delete", "retention_days": retention_days,
+        "files_scanned": len(present), "bytes_scanned": bytes_scanned,
+        "referenced": len(referenced & present), "kept_recent": recent,
+        "missing_references": sorted(referenced - present),
+        "files": sorted(removed, key=lambda c: c["bytes"], reverse=True),
+        "reclaimed_bytes": sum(c["bytes"] for c in removed), "errors": errors,
+    }
+
 def load_products_from_db():
     db = get_db()
     cur = db.cursor()
@@ -273,6 +1672,7 @@ def load_products_from_db():
     return out
 
 def save_products_from_dataframe(df):
+    import pandas as pd
     db = get_db(); cur = db.cursor()
     def find_col(candidates):
         for c in df.columns:
@@ -293,55 +1693,127 @@ def save_products_from_dataframe(df):
         price = float(row[price_col]) if not pd.isna(row[price_col]) else 0.0
         stock_val = int(float(row[stock_col])) if stock_col and not pd.isna(row[stock_col]) else 0
         cur.execute("SELECT model FROM products WHERE model = ?", (model,))
+        if cur.fetchone():
+            if stock_col:
+                cur.execute("UPDATE products SET description=?, category=?, price=?, stock=? WHERE model=?", (description, category, price, stock_val, model))
+            else:
+                cur.execute("UPDATE products SET description=?, category=?, price=? WHERE model=?", (description, category, price, model))
+            updated += 1
+        else:
+            cur.execute("INSERT INTO products (category, model, description, price, stock) VALUES (?, ?, ?, ?, ?)", (category, model, description, price, stock_val))
+            inserted += 1
+    db.commit()
+    return inserted, updated
+
+def _render_pdf(rendered_html, document, margin, font_config=None):
+    """Converts rendered HTML to PDF bytes with whichever engine is installed.
+
+    `font_config` (WeasyPrint only) lets several documents share one font setup.
+    """
+    engine, handle = get_pdf_engine()
+    started = time.perf_counter()
+    if engine == "pdfkit":
+        import pdfkit
+        options = {'page-size': 'A4', 'margin-top': margin, 'margin-right': margin, 'margin-bottom': margin, 'margin-left': margin, 'encoding': "UTF-8", 'enable-local-file-access': None}
+        # wkhtmltopdf always subsets fonts; its image defaults are 600 dpi at quality 94.
+        if PDF_OPTIMIZE: options.update({'image-dpi': str(PDF_IMAGE_DPI), 'image-quality': str(PDF_JPEG_QUALITY)})
+        pdf_bytes = pdfkit.from_string(rendered_html, False, options=options, configuration=handle)
+    elif engine == "weasyprint":
+        options = dict(optimize_images=True, dpi=PDF_IMAGE_DPI, jpeg_quality=PDF_JPEG_QUALITY, full_fonts=False) if PDF_OPTIMIZE else {}
+        pdf_bytes = handle(string=rendered_html, base_url=base_dir).write_pdf(font_config=font_config, **options)
+    else:
+        raise Exception("No PDF engine found. Install pdfkit+wkhtmltopdf or WeasyPrint.")
+    if PDF_OPTIMIZE: pdf_bytes = optimize_pdf(pdf_bytes)
+    observe_seconds(PDF_RENDER_SECONDS, time.perf_counter() - started, document=document, engine=engine)
+    return pdf_bytes
+
+def optimize_pdf(pdf_bytes):
+    """Lossless pypdf pass: recompresses content streams and merges identical objects
+    (e.g. the logo repeated across pages or merged documents). Never makes the file bigger,
+    and returns the input unchanged if the pass fails: it is an optimisation, not a step
+    the export depends on."""
+    try:
+        from pypdf import PdfWriter
+        writer = PdfWriter(clone_from=io.BytesIO(pdf_bytes))
+        for page in writer.pages:
+            page.compress_content_streams(level=9)
+        writer.compress_identical_objects()
+        output = io.BytesIO()
+        writer.write(output)
+    except Exception as e:
+        print(f"PDF optimisation skipped: {e}")
+        return pdf_bytes
+    return output.getvalue() if output.tell() < len(pdf_bytes) else pdf_bytes
+
+def _document_context(quote_data, customer_info, totals, quote_id):
+    """Template variables shared by the quotation, contract and application form."""
+    now = datetime.now()
+    return dict(
+        quote_data=quote_data, customer_info=customer_info, totals=totals,
+        company_name=COMPANY_NAME, vat_rate=float(VAT_RATE * 100),
+        now=now, valid_until=now + timedelta(days=5), base_dir=Path(base_dir).as_uri(),
+        quotation_ref=quote_id,
+        # Create the contract reference by replacing the quote prefix
+        contract_ref=quote_id.replace('QUO', 'CTR', 1),
+        company_info_line_1=COMPANY_INFO_LINE_1,
+        company_info_line_2=COMPANY_INFO_LINE_2
+    )
+
 def _generate_pdf_with_jinja(quote_data, customer_info, totals, quote_id=None):
-    valid_until = datetime.now() + timedelta(days=5)
     template = template_env.get_template("quotation_template.html")
     
     if not quote_id:
         quote_id = f"QUO-DRAFT-{get_and_increment_counter('quotation_number')}"
         
     rendered_html = template.render(
-        quote_data=quote_data, customer_info=customer_info, totals=totals,
-        company_name=COMPANY_NAME, vat_rate=float(VAT_RATE * 100),
-        now=datetime.now(), valid_until=valid_until, base_dir=Path(base_dir).as_uri(),
-        quotation_ref=quote_id,
-        bom_reference=f"BOM-{get_and_increment_counter('bom_reference')}",
-        company_info_line_1=COMPANY_INFO_LINE_1,
-        company_info_line_2=COMPANY_INFO_LINE_2
+        **_document_context(quote_data, customer_info, totals, quote_id),
+        bom_reference=f"BOM-{get_and_increment_counter('bom_reference')}"
     )
-    if PDFKIT_AVAILABLE and pdfkit_config:
-        options = {'page-size': 'A4', 'margin-top': '0.5in', 'margin-right': '0.5in', 'margin-bottom': '0.5in', 'margin-left': '0.5in', 'encoding': "UTF-8", 'enable-local-file-access': None}
-        return pdfkit.from_string(rendered_html, False, options=options, configuration=pdfkit_config)
-    elif WEASYPRINT_AVAILABLE:
-        return HTML(string=rendered_html, base_url=base_dir).write_pdf()
-    raise Exception("No PDF engine found. Install pdfkit+wkhtmltopdf or WeasyPrint.")
+    return _render_pdf(rendered_html, "quotation", margin="0.5in")
 
 def _generate_contract_pdf(quote_data, customer_info, totals, quote_id):
     """Generates a contract PDF using the contract_template.html"""
     template = template_env.get_template("contract_template.html")
-    
-    # Create the contract reference by replacing the quote prefix
-    contract_ref = quote_id.replace('QUO', 'CTR', 1)
-
-    rendered_html = template.render(
-        quote_data=quote_data, 
-        customer_info=customer_info, 
-        totals=totals,
-        company_name=COMPANY_NAME, 
-        vat_rate=float(VAT_RATE * 100),
-        now=datetime.now(), 
-        base_dir=Path(base_dir).as_uri(),
-        quotation_ref=quote_id,
-        contract_ref=contract_ref,
-        company_info_line_1=COMPANY_INFO_LINE_1,
-        company_info_line_2=COMPANY_INFO_LINE_2
-    )
-    if PDFKIT_AVAILABLE and pdfkit_config:
-        options = {'page-size': 'A4', 'margin-top': '0.7in', 'margin-right': '0.7in', 'margin-bottom': '0.7in', 'margin-left': '0.7in', 'encoding': "UTF-8", 'enable-local-file-access': None}
-        return pdfkit.from_string(rendered_html, False, options=options, configuration=pdfkit_config)
-    elif WEASYPRINT_AVAILABLE:
-        return HTML(string=rendered_html, base_url=base_dir).write_pdf()
-    raise Exception("No PDF engine found. Install pdfkit+wkhtmltopdf or WeasyPrint.")
+    rendered_html = template.render(**_document_context(quote_data, customer_info, totals, quote_id))
+    return _render_pdf(rendered_html, "contract", margin="0.7in")
+
+# (title, file stem, template, page margin) of each document in a deal bundle.
+DEAL_DOCUMENTS = [
+    ("Quotation", "quotation", "quotation_template.html", "0.5in"),
+    ("Contract", "contract", "contract_template.html", "0.7in"),
+    ("Application Form", "application_form", "application_form_template.html", "0.5in"),
+]
+
+def _generate_deal_bundle(quote_data, customer_info, totals, quote_id):
+    """Renders every DEAL_DOCUMENTS entry from one template context and returns
+    [(title, file stem, pdf_bytes)]. The documents share a single BOM reference
+    and, on WeasyPrint, a single font configuration."""
+    bom_reference = f"BOM-{get_and_increment_counter('bom_reference')}"
+    context = dict(_document_context(quote_data, customer_info, totals, quote_id), bom_reference=bom_reference,
+                   ref_numbers={"quotation_number": quote_id, "bom_reference": bom_reference})
+    font_config = None
+    if get_pdf_engine()[0] == "weasyprint":
+        try:
+            from weasyprint.text.fonts import FontConfiguration
+        except ImportError:  # WeasyPrint < 53
+            from weasyprint.fonts import FontConfiguration
+        font_config = FontConfiguration()
+    return [(title, stem, _render_pdf(template_env.get_template(template).render(**context), stem, margin, font_config=font_config))
+            for title, stem, template, margin in DEAL_DOCUMENTS]
+
+def merge_pdfs(parts):
+    """Concatenates [(title, pdf_bytes)] into one PDF with a top-level bookmark per part."""
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for title, pdf_bytes in parts:
+        writer.append(io.BytesIO(pdf_bytes), outline_item=title)
+    # Each document embeds its own copy of the logo; keep one.
+    if PDF_OPTIMIZE:
+        try: writer.compress_identical_objects()
+        except Exception as e: print(f"PDF optimisation skipped: {e}")
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
 
 
 # ----------------------
@@ -355,7 +1827,7 @@ def register():
     db = get_db(); cur = db.cursor()
     try:
         cur.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)", (data['name'], data['email'], hashed_password)); db.commit()
-    except sqlite3.IntegrityError: return jsonify({'ok': False, 'message': 'Email already exists'}), 409
+    except IntegrityError: return jsonify({'ok': False, 'message': 'Email already exists'}), 409
     return jsonify({'ok': True, 'message': 'New user created! Account is pending approval.'})
 
 @app.route('/api/auth/login', methods=['POST'])
@@ -397,8 +1869,45 @@ def auth_status(current_user):
 # ----------------------
 # SECURED PAGE & API ROUTES
 # ----------------------
+ASSET_DIST_FOLDER = os.path.join(base_dir, "public", "dist")
+BUILT_PAGES_FOLDER = os.path.join(base_dir, "build", "pages")
+HASHED_ASSET_RE = re.compile(r"\.[0-9a-f]{12}\.(?:js|css)$")
+
+def send_page(filename):
+    """Serves a page rewritten by build_assets.py if it exists, else the source page."""
+    if os.path.isfile(os.path.join(BUILT_PAGES_FOLDER, filename)):
+        response = send_from_directory(BUILT_PAGES_FOLDER, filename)
+    else:
+        response = app.send_static_file(filename)
+    # Pages are small and point at hashed assets, so always revalidate them.
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route("/dist/<path:filename>")
+def serve_asset(filename):
+    # Only fingerprinted JS/CSS live here. They never change under the same name,
+    # so they can be cached forever; pick the smallest precompressed variant the client accepts.
+    if not HASHED_ASSET_RE.search(filename): abort(404)
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(ASSET_DIST_FOLDER, filename + suffix)):
+            response = send_from_directory(ASSET_DIST_FOLDER, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(ASSET_DIST_FOLDER, filename, mimetype=mimetype)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 @app.route("/")
-def index(): return app.send_static_file("login.html")
+def index(): return send_page("login.html")
+
+@app.route("/login.html")
+def serve_login(): return send_page("login.html")
+
+@app.route("/register.html")
+def serve_register(): return send_page("register.html")
 
 @app.route("/<path:path>")
 def serve_static(path):
@@ -411,11 +1920,11 @@ def serve_static(path):
 
 @app.route("/index.html")
 @token_required
-def serve_index(current_user): return app.send_static_file("index.html")
+def serve_index(current_user): return send_page("index.html")
 
 @app.route("/dashboard.html")
 @admin_required
-def serve_dashboard(current_user): return app.send_static_file("dashboard.html")
+def serve_dashboard(current_user): return send_page("dashboard.html")
     
 @app.route("/uploads/<path:filename>")
 @token_required
@@ -427,7 +1936,22 @@ def api_products(current_user): return jsonify(load_products_from_db())
 
 @app.route("/api/packages")
 @token_required
-def get_packages(current_user): return jsonify({"1BR Platinum": {"MixPad M2 black L&N connection": 1}, "2BR Silver": {"MixPad 7 Ultra Silver": 1}})
+def get_packages(current_user):
+    db = get_db(); cur = db.cursor()
+    cur.execute("SELECT p.name, pi.model, pi.quantity FROM packages p LEFT JOIN package_items pi ON pi.package_id = p.id ORDER BY p.name, pi.position")
+    packages = {}
+    for row in cur.fetchall():
+        members = packages.setdefault(row["name"], {})
+        if row["model"]: members[row["model"]] = row["quantity"]
+    return jsonify(packages)
+
+@app.route("/api/packages/<path:name>/expand")
+@token_required
+def expand_package(current_user, name):
+    expansion = package_cache.expand(get_db().cursor(), name)
+    if expansion is None:
+        return jsonify({"error": f"Package '{name}' not found"}), 404
+    return jsonify(expansion)
 
 @app.route("/api/update-stock", methods=["POST"])
 @token_required
@@ -440,22 +1964,12 @@ def update_stock(current_user):
 @token_required
 def calculate(current_user):
     d = request.json or {}
-    items = d.get("items", [])
-    installation = Decimal(str(d.get("installationCost", 0)))
-    discount = Decimal(str(d.get("discountPercent", 0)))
-    subtotal = sum(Decimal(str(i.get("price", 0))) * int(i.get("quantity", 1)) for i in items)
-    
-    discount_amount = (subtotal * (discount / Decimal(100))).quantize(Decimal("0.01"), ROUND_HALF_UP)
-    subtotal_after_discount = subtotal - discount_amount
-    taxable_base = subtotal_after_discount + installation
-    vat = (taxable_base * VAT_RATE).quantize(Decimal("0.01"), ROUND_HALF_UP)
-    grand_total = taxable_base + vat
-
+    totals = calculate_totals(d.get("items", []), d.get("installationCost", 0), d.get("discountPercent", 0))
     return jsonify({
-        "subtotal": float(subtotal), 
-        "vat": float(vat), 
-        "total": float(grand_total), 
-        "discountAmount": float(discount_amount)
+        "subtotal": totals["subtotal"], 
+        "vat": totals["vat"], 
+        "total": totals["total"], 
+        "discountAmount": totals["discountAmount"]
     })
 
 @app.route("/api/save-quote", methods=["POST"])
@@ -464,40 +1978,87 @@ def save_quote(current_user):
     d = request.json
     db = get_db()
     cursor = db.cursor()
+    # The previous version is read and the new revision numbered inside one write transaction.
+    begin_immediate(db)
 
     # If an ID is provided, it's an update. Otherwise, generate a new semantic ID.
+    previous = None
     if d.get("id"):
         quote_id = d.get("id")
+        cursor.execute("SELECT quote_data FROM quotes WHERE id = ?", (quote_id,))
+        row = cursor.fetchone()
+        previous = json.loads(row["quote_data"]) if row else None
     else:
-        # --- NEW SEMANTIC ID GENERATION LOGIC (DATE FIRST) ---
-        initials = get_user_initials(current_user['name'])
-        date_str = datetime.now().strftime('%Y%m%d')
-        id_prefix = f"QUO{date_str}{initials}"
+        quote_id = next_quote_id(cursor, current_user['name'])
+
+    # Same result as INSERT OR REPLACE, but updating in place keeps the rowid the search index is keyed by.
+    # UPDATE-then-INSERT rather than an upsert clause, which SQLite and MySQL spell differently.
+    values = (current_user['id'], d.get("customerName"), d.get("projectName"), json.dumps(d), quote_id)
+    cursor.execute("""
+        UPDATE quotes SET user_id = ?, customer_name = ?, project_name = ?, quote_data = ?,
+            timestamp = CURRENT_TIMESTAMP, status = 'Draft'
+        WHERE id = ?
+    """, values)
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO quotes (user_id, customer_name, project_name, quote_data, id) VALUES (?, ?, ?, ?, ?)", values)
+    version = record_quote_revision(cursor, quote_id, current_user['id'], d, previous)
+    db.commit()
+    response = jsonify({"id": quote_id, "version": version, "message": "Quote saved"})
+    response.set_etag(str(version))
+    return response
 
-        # Find the last sequence number for this user on this day
-        cursor.execute(
-            "SELECT id FROM quotes WHERE id LIKE ? ORDER BY id DESC LIMIT 1",
-            (f"{id_prefix}%",)
-        )
-        last_quote = cursor.fetchone()
+@app.route("/api/save-quote/<quote_id>", methods=["PATCH"])
+@token_required
+def patch_quote(current_user, quote_id):
+    """Applies RFC 6902 operations to the stored quote.
 
-        if last_quote:
-            # Extract the 3-digit sequence from the end of the ID
-            last_seq_str = last_quote['id'][-3:]
-            next_seq = int(last_seq_str) + 1
-        else:
-            next_seq = 1
-        
-        # Format the new ID with a 3-digit padded sequence number
-        quote_id = f"{id_prefix}{next_seq:03d}"
-        # --- END OF NEW LOGIC ---
+    The request must carry If-Match with the version the client last saw
+    (the ETag of load-quote/save-quote); if the quote has been saved since,
+    nothing is applied and 412 is returned with the current version.
+    """
+    operations = request.get_json(force=True, silent=True)
+    if not isinstance(operations, list):
+        return jsonify({"error": "Body must be a JSON Patch array"}), 400
+    if not request.if_match:
+        return jsonify({"error": "If-Match header with the quote version is required"}), 428
 
-    cursor.execute(
-        "INSERT OR REPLACE INTO quotes (id, user_id, customer_name, project_name, quote_data) VALUES (?, ?, ?, ?, ?)",
-        (quote_id, current_user['id'], d.get("customerName"), d.get("projectName"), json.dumps(d))
-    )
+    db = get_db()
+    cursor = db.cursor()
+    begin_immediate(db)
+    cursor.execute("SELECT user_id, quote_data FROM quotes WHERE id=?", (quote_id,))
+    quote = cursor.fetchone()
+    if not quote:
+        db.rollback()
+        return jsonify({"error": "not found"}), 404
+    if current_user['role'] != 'admin' and quote['user_id'] != current_user['id']:
+        db.rollback()
+        return jsonify({"error": "Forbidden"}), 403
+
+    version = quote_version(cursor, quote_id)
+    if not request.if_match.contains(str(version)):
+        db.rollback()
+        return jsonify({"error": "Quote was changed by another save; reload it and try again", "version": version}), 412
+
+    previous = json.loads(quote["quote_data"])
+    try:
+        d = jsonpatch.apply_patch(previous, operations)
+    except (jsonpatch.JsonPatchException, jsonpatch.JsonPointerException, TypeError) as e:
+        db.rollback()
+        return jsonify({"error": f"Patch could not be applied: {e}"}), 422
+    if not isinstance(d, dict) or d.get("id", quote_id) != quote_id:
+        db.rollback()
+        return jsonify({"error": "Patch may not replace the quote or change its id"}), 422
+
+    if d != previous:
+        cursor.execute("""
+            UPDATE quotes SET customer_name = ?, project_name = ?, quote_data = ?, timestamp = CURRENT_TIMESTAMP, status = 'Draft'
+            WHERE id = ?
+        """, (d.get("customerName"), d.get("projectName"), json.dumps(d), quote_id))
+        version = record_quote_revision(cursor, quote_id, current_user['id'], d, previous, patch=operations)
     db.commit()
-    return jsonify({"id": quote_id, "message": "Quote saved"})
+    response = jsonify({"id": quote_id, "version": version, "message": "Quote saved"})
+    response.set_etag(str(version))
+    return response
 
 @app.route("/api/load-quotes")
 @token_required
@@ -510,6 +2071,38 @@ def load_quotes(current_user):
     )
     return jsonify([dict(r) for r in cursor.fetchall()])
 
+@app.route("/api/quotes/search")
+@token_required
+def search_quotes(current_user):
+    """Ranked full-text search over customer, project and line items; users only see their own quotes."""
+    # Every word becomes a quoted prefix term, so user input can't produce FTS5 syntax errors.
+    terms = re.findall(r"[\w\-]+", request.args.get("q", ""))
+    if not terms:
+        return jsonify({"error": "q is required"}), 400
+    match = " ".join(f'"{t}"*' for t in terms)
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 20, type=int), 1), 100)
+
+    where, params = "quotes_fts MATCH ?", [match]
+    if current_user['role'] != 'admin':
+        where += " AND q.user_id = ?"
+        params.append(current_user['id'])
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(f"SELECT COUNT(*) AS n FROM quotes_fts JOIN quotes q ON q.rowid = quotes_fts.rowid WHERE {where}", params)
+    total = cursor.fetchone()["n"]
+    # bm25 column weights: customer name, project name, line items.
+    cursor.execute(f"""
+        SELECT q.id, q.customer_name, q.project_name, q.timestamp, q.status,
+               snippet(quotes_fts, -1, '[', ']', '...', 12) AS snippet
+        FROM quotes_fts JOIN quotes q ON q.rowid = quotes_fts.rowid
+        WHERE {where}
+        ORDER BY bm25(quotes_fts, 10.0, 5.0, 1.0), q.timestamp DESC
+        LIMIT ? OFFSET ?
+    """, params + [per_page, (page - 1) * per_page])
+    return jsonify({"results": [dict(r) for r in cursor.fetchall()], "total": total, "page": page, "per_page": per_page})
+
 @app.route("/api/load-quote/<quote_id>")
 @token_required
 def load_quote(current_user, quote_id):
@@ -522,10 +2115,48 @@ def load_quote(current_user, quote_id):
         return jsonify({"error": "not found"}), 404
     
     if current_user['role'] == 'admin' or quote['user_id'] == current_user['id']:
-        return jsonify(json.loads(quote["quote_data"]))
+        response = jsonify(json.loads(quote["quote_data"]))
+        response.set_etag(str(quote_version(cursor, quote_id)))
+        return response
     else:
         return jsonify({"error": "Forbidden"}), 403
 
+@app.route("/api/quotes/<quote_id>/revisions")
+@token_required
+def list_quote_revisions(current_user, quote_id):
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute("SELECT user_id FROM quotes WHERE id=?", (quote_id,))
+    quote = cursor.fetchone()
+    if not quote:
+        return jsonify({"error": "not found"}), 404
+    if current_user['role'] != 'admin' and quote['user_id'] != current_user['id']:
+        return jsonify({"error": "Forbidden"}), 403
+
+    cursor.execute("""
+        SELECT r.revision, r.kind, r.user_id, u.name AS user_name, r.created_at, LENGTH(r.data) AS stored_bytes
+        FROM quote_revisions r LEFT JOIN users u ON u.id = r.user_id
+        WHERE r.quote_id = ? ORDER BY r.revision DESC
+    """, (quote_id,))
+    return jsonify([dict(r) for r in cursor.fetchall()])
+
+@app.route("/api/quotes/<quote_id>/revisions/<int:revision>")
+@token_required
+def get_quote_revision(current_user, quote_id, revision):
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute("SELECT user_id FROM quotes WHERE id=?", (quote_id,))
+    quote = cursor.fetchone()
+    if not quote:
+        return jsonify({"error": "not found"}), 404
+    if current_user['role'] != 'admin' and quote['user_id'] != current_user['id']:
+        return jsonify({"error": "Forbidden"}), 403
+
+    data = load_quote_revision(cursor, quote_id, revision)
+    if data is None:
+        return jsonify({"error": "revision not found"}), 404
+    return jsonify(data)
+
 @app.route("/api/upload-prices", methods=["POST"])
 @admin_required
 def upload_prices(current_user):
@@ -534,7 +2165,10 @@ def upload_prices(current_user):
     if file.filename == '': return jsonify({"error": "No selected file"}), 400
     filename = secure_filename(file.filename); saved_name = f"prices_{int(datetime.now().timestamp())}_{filename}"; save_path = os.path.join(UPLOAD_FOLDER, saved_name); file.save(save_path)
     try:
+        started = time.perf_counter()
+        import pandas as pd
         df = pd.read_excel(save_path); inserted, updated = save_products_from_dataframe(df)
+        observe_seconds(EXCEL_IMPORT_SECONDS, time.perf_counter() - started)
         db = get_db(); cur = db.cursor(); cur.execute("INSERT INTO imports (filename) VALUES (?)", (saved_name,)); db.commit()
         return jsonify({"message": "ok", "products": load_products_from_db(), "stats": {"inserted": inserted, "updated": updated}})
     except Exception as e: return jsonify({"error": str(e)}), 500
@@ -550,14 +2184,14 @@ def clear_catalog(current_user):
 def upload_image(current_user, model_id):
     if 'image' not in request.files: return jsonify({"error": "No image file provided"}), 400
     file = request.files['image']; filename = secure_filename(f"{model_id}_{int(datetime.now().timestamp())}.png"); filepath = os.path.join(UPLOAD_FOLDER, filename); raw = file.read()
+    started, outcome = time.perf_counter(), "processed"
     try:
-        if REMBG_AVAILABLE:
-            with open(filepath, "wb") as f: f.write(rembg_remove(raw))
-        else:
-            img = Image.open(io.BytesIO(raw)).convert("RGBA"); datas = img.getdata(); newData = [(255, 255, 255, 0) if item[0] > 240 and item[1] > 240 and item[2] > 240 else item for item in datas]; img.putdata(newData); img.save(filepath, "PNG")
+        processed = process_product_image(raw)
     except Exception:
-        with open(filepath, "wb") as f: f.write(raw)
-    db = get_db(); cur = db.cursor(); cur.execute("INSERT OR REPLACE INTO device_images (model_id, filename) VALUES (?, ?)", (model_id, filename)); cur.execute("UPDATE products SET imageFilename = ? WHERE model = ?", (filename, model_id)); db.commit()
+        outcome, processed = "raw", raw
+    with open(filepath, "wb") as f: f.write(processed)
+    observe_seconds(IMAGE_PROCESSING_SECONDS, time.perf_counter() - started, outcome=outcome)
+    db = get_db(); cur = db.cursor(); cur.execute("REPLACE INTO device_images (model_id, filename) VALUES (?, ?)", (model_id, filename)); cur.execute("UPDATE products SET imageFilename = ? WHERE model = ?", (filename, model_id)); db.commit()
     return jsonify({"message": "uploaded", "imageUrl": f"/uploads/{filename}"})
 
 @app.route("/api/export-pdf", methods=["POST"])
@@ -566,24 +2200,7 @@ def export_pdf(current_user):
     try:
         data = request.json
         items = data.get("quoteData", [])
-        installation = Decimal(str(data.get("installationCost", 0)))
-        discount = Decimal(str(data.get("discountPercent", 0)))
-        subtotal = sum(Decimal(str(i.get("price", 0))) * int(i.get("quantity", 1)) for i in items)
-        
-        discount_amount = (subtotal * (discount / Decimal(100))).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        subtotal_after_discount = subtotal - discount_amount
-        taxable_base = subtotal_after_discount + installation
-        vat = (taxable_base * VAT_RATE).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        grand_total = taxable_base + vat
-
-        totals = {
-            "subtotal": float(subtotal),
-            "installation": float(installation),
-            "discountPercent": float(discount),
-            "discountAmount": float(discount_amount),
-            "vat": float(vat),
-            "total": float(grand_total)
-        }
+        totals = calculate_totals(items, data.get("installationCost", 0), data.get("discountPercent", 0))
         
         pdf_bytes = _generate_pdf_with_jinja(items, data.get("customerInfo", {}), totals)
         
@@ -595,6 +2212,26 @@ def export_pdf(current_user):
         print(f"Error in export_pdf: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/preview-quote", methods=["POST"])
+@token_required
+def preview_quote(current_user):
+    """The quotation as HTML, for checking layout in the browser before exporting.
+
+    Same template and context as _generate_pdf_with_jinja, but no quotation or
+    BOM numbers are drawn from the counters; images resolve against this server.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get("quoteData", [])
+    totals = calculate_totals(items, data.get("installationCost", 0), data.get("discountPercent", 0))
+    context = _document_context(items, data.get("customerInfo", {}), totals, data.get("quoteId") or "QUO-DRAFT-PREVIEW")
+    context["base_dir"] = request.host_url.rstrip("/")
+    rendered_html = template_env.get_template("quotation_template.html").render(
+        **context, bom_reference="BOM-PREVIEW", preview=True)
+    response = make_response(rendered_html)
+    response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.route("/api/user/quote-pdf/<quote_id>", methods=['GET'])
 @token_required
 def get_user_quote_pdf(current_user, quote_id):
@@ -612,24 +2249,7 @@ def get_user_quote_pdf(current_user, quote_id):
     try:
         quote_json = json.loads(quote_row["quote_data"])
         items = quote_json.get("items", [])
-        installation = Decimal(str(quote_json.get("installationCost", 0)))
-        discount = Decimal(str(quote_json.get("discountPercent", 0)))
-        subtotal = sum(Decimal(str(i.get("price", 0))) * int(i.get("quantity", 1)) for i in items)
-        
-        discount_amount = (subtotal * (discount / Decimal(100))).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        subtotal_after_discount = subtotal - discount_amount
-        taxable_base = subtotal_after_discount + installation
-        vat = (taxable_base * VAT_RATE).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        grand_total = taxable_base + vat
-
-        totals = {
-            "subtotal": float(subtotal),
-            "installation": float(installation),
-            "discountPercent": float(discount),
-            "discountAmount": float(discount_amount),
-            "vat": float(vat),
-            "total": float(grand_total)
-        }
+        totals = calculate_totals(items, quote_json.get("installationCost", 0), quote_json.get("discountPercent", 0))
         customer_info = {
             "name": quote_json.get("customerName"),
             "project": quote_json.get("projectName")
@@ -645,6 +2265,41 @@ def get_user_quote_pdf(current_user, quote_id):
         print(f"Error generating PDF for quote {quote_id}: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/quotes/<quote_id>/bom.xlsx")
+@token_required
+def export_quote_bom(current_user, quote_id):
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute("SELECT user_id, quote_data, timestamp, status FROM quotes WHERE id=?", (quote_id,))
+    quote = cursor.fetchone()
+    if not quote:
+        return jsonify({"error": "Quote not found"}), 404
+    if current_user['role'] != 'admin' and quote['user_id'] != current_user['id']:
+        return jsonify({"error": "Forbidden"}), 403
+
+    data = json.loads(quote["quote_data"])
+    items = data.get("items", [])
+    totals = calculate_totals(items, data.get("installationCost", 0), data.get("discountPercent", 0))
+    wb = new_workbook()
+    ws = wb.create_sheet("BOM")
+    for column, width in zip("ABCDEFG", (22, 18, 48, 16, 10, 12, 14)):
+        ws.column_dimensions[column].width = width
+    ws.append(["Bill of Materials", quote_id])
+    ws.append(["Customer", data.get("customerName")])
+    ws.append(["Project", data.get("projectName")])
+    ws.append(["Date", parse_timestamp(quote["timestamp"]), None, "Status", quote["status"]])
+    ws.append([])
+    ws.append(["Quote", "Model", "Description", "Category", "Quantity", "Unit Price", "Line Total"])
+    for row in quote_line_rows(quote_id, items):
+        ws.append(row)
+    ws.append([])
+    ws.append([None, None, None, None, None, "Subtotal", totals["subtotal"]])
+    ws.append([None, None, None, None, None, f"Discount ({totals['discountPercent']:g}%)", -totals["discountAmount"]])
+    ws.append([None, None, None, None, None, "Installation", totals["installation"]])
+    ws.append([None, None, None, None, None, f"VAT ({float(VAT_RATE * 100):g}%)", totals["vat"]])
+    ws.append([None, None, None, None, None, "Total", totals["total"]])
+    return send_workbook(wb, f"BOM_{secure_filename(data.get('projectName') or 'project')}_{quote_id}.xlsx")
+
 @app.route("/api/generate-email", methods=["POST"])
 @token_required
 def generate_email(current_user):
@@ -673,21 +2328,34 @@ def send_email(current_user):
 @app.route("/api/dashboard-stats")
 @admin_required
 def get_dashboard_stats(current_user):
-    db = get_db(); cursor = db.cursor()
+    db = get_db()
+    cursor = streaming_cursor(db)
     cursor.execute("SELECT model, description, stock FROM products ORDER BY stock ASC")
-    all_products = [dict(row) for row in cursor.fetchall()]
+    all_products = [dict(row) for row in cursor]
+    return jsonify({"all_products": all_products, **quote_stats(db)})
+
+@app.route("/api/dashboard-stats/summary")
+@admin_required
+def get_dashboard_summary(current_user):
+    """Monthly totals and top products without the inventory, for live dashboards
+    that already keep their inventory current from the event stream."""
+    return jsonify(quote_stats(get_db()))
+
+def quote_stats(db):
+    """The dashboard's quote aggregates: this month's total and count, and the five most quoted products."""
+    # Quotes are folded into the counters one row at a time instead of being fetched all at once.
+    cursor = streaming_cursor(db)
     cursor.execute("SELECT quote_data, timestamp FROM quotes")
-    all_quotes = cursor.fetchall()
     product_counter, monthly_total, quotes_this_month = Counter(), 0, 0
     current_month_str = datetime.now().strftime('%Y-%m')
-    for quote in all_quotes:
+    for quote in cursor:
         try:
             quote_data = json.loads(quote["quote_data"])
             items = quote_data.get("items", [])
             for item in items:
                 if item.get("model"): product_counter[item["model"]] += int(item.get("quantity", 0))
             
-            quote_timestamp = datetime.strptime(quote["timestamp"], '%Y-%m-%d %H:%M:%S')
+            quote_timestamp = parse_timestamp(quote["timestamp"])
             if quote_timestamp.strftime('%Y-%m') == current_month_str:
                 quotes_this_month += 1
                 installation = Decimal(str(quote_data.get("installationCost", 0)))
@@ -699,9 +2367,10 @@ def get_dashboard_stats(current_user):
                 vat = taxable_base * VAT_RATE
                 grand_total = taxable_base + vat
                 monthly_total += grand_total
-        except (json.JSONDecodeError, TypeError, ValueError, KeyError):
+        except (json.JSONDecodeError, TypeError, ValueError, KeyError, AttributeError):
             continue 
             
+    cursor = db.cursor()
     top_products_list = []
     if product_counter:
         top_5_models = product_counter.most_common(5)
@@ -712,13 +2381,92 @@ def get_dashboard_stats(current_user):
             product_details = {row['model']: row['description'] for row in cursor.fetchall()}
             for model, count in top_5_models:
                 top_products_list.append({"model": model, "description": product_details.get(model, "N/A"), "count": count})
-    return jsonify({"all_products": all_products, "top_products": top_products_list, "monthly_stats": {"total_value": float(monthly_total), "quote_count": quotes_this_month}})
+    return {"top_products": top_products_list, "monthly_stats": {"total_value": float(monthly_total), "quote_count": quotes_this_month}}
+
+@app.route("/api/admin/events")
+@admin_required
+def dashboard_event_stream(current_user):
+    """Server-sent events for open dashboards: a low_stock snapshot on connect, then
+    stock / product / product_deleted / quote / quote_deleted events as they happen.
+    A reset event means events were missed and the client should reload."""
+    if 'PYTHONANYWHERE_DOMAIN' in os.environ:
+        return jsonify({"error": "Live updates are only available with the SQLite database."}), 501
+    # Soft cap (streams that connect at the same moment can overshoot it slightly).
+    if dashboard_hub.listeners >= SSE_MAX_STREAMS:
+        response = jsonify({"error": "Too many live dashboards on this worker; try again later."})
+        response.headers['Retry-After'] = '60'
+        return response, 503
+    try:
+        last_id = int(request.headers.get("Last-Event-ID") or 0)
+    except ValueError:
+        last_id = 0
+
+    cursor = get_db().cursor()
+    cursor.execute("SELECT model, description, stock FROM products WHERE stock <= ? ORDER BY stock, model", (LOW_STOCK_THRESHOLD,))
+    low_stock = {"threshold": LOW_STOCK_THRESHOLD, "products": [dict(r) for r in cursor.fetchall()]}
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) AS seq FROM dashboard_events")
+    head = cursor.fetchone()["seq"]
+    backlog, reset = [], False
+    if 0 < last_id < head:
+        backlog = DashboardEventHub.read(cursor, last_id, DashboardEventHub.BUFFER + 1)
+        reset = len(backlog) > DashboardEventHub.BUFFER or backlog[0][0] != last_id + 1
+    if reset or last_id > head:
+        backlog, reset = [], True
+
+    def encode(seq, kind, data):
+        if kind in ("stock", "product"):
+            payload = json.loads(data)
+            payload["low"] = payload["stock"] is not None and payload["stock"] <= LOW_STOCK_THRESHOLD
+            data = json.dumps(payload)
+        return sse_message(kind, data, seq)
+
+    def generate():
+        after = head
+        yield "retry: 2000\n\n"
+        if reset:
+            yield sse_message("reset", "{}")
+        for seq, kind, data in backlog:
+            yield encode(seq, kind, data)
+        yield sse_message("low_stock", json.dumps(low_stock), head)
+        dashboard_hub.subscribe(head)
+        try:
+            deadline = time.monotonic() + SSE_MAX_SECONDS
+            while time.monotonic() < deadline:
+                # Never wait past the deadline, so a stream is closed on time even when idle.
+                events = dashboard_hub.wait(after, min(SSE_HEARTBEAT_SECONDS, deadline - time.monotonic()))
+                if events is None:
+                    after = dashboard_hub.seq
+                    yield sse_message("reset", "{}", after)
+                elif not events:
+                    yield ": keepalive\n\n"
+                else:
+                    after = events[-1][0]
+                    yield "".join(encode(*e) for e in events)
+        finally:
+            dashboard_hub.unsubscribe()
+
+    response = app.response_class(generate(), mimetype="text/event-stream")
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route("/metrics")
+@admin_required
+def metrics(current_user):
+    if not PROMETHEUS_AVAILABLE:
+        return jsonify({"error": "Metrics are unavailable. Install prometheus_client."}), 501
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prometheus_client.CollectorRegistry()
+        prometheus_multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    response = make_response(prometheus_client.generate_latest(registry))
+    response.headers['Content-Type'] = prometheus_client.CONTENT_TYPE_LATEST
+    return response
 
 @app.route("/api/admin/all-quotes")
 @admin_required
 def get_all_quotes(current_user):
-    db = get_db()
-    cursor = db.cursor()
     query = """
         SELECT 
             q.id, 
@@ -731,9 +2479,65 @@ def get_all_quotes(current_user):
         LEFT JOIN users u ON q.user_id = u.id 
         ORDER BY q.timestamp DESC
     """
-    cursor.execute(query)
-    quotes = [dict(row) for row in cursor.fetchall()]
-    return jsonify(quotes)
+
+    # Runs while the response streams, so it queries through its own connection.
+    def rows():
+        cursor = streaming_cursor(get_db())
+        cursor.execute(query)
+        for row in cursor:
+            yield dict(row)
+    return stream_json_array(rows())
+
+@app.route("/api/admin/quotes-export.xlsx")
+@admin_required
+def export_all_quotes(current_user):
+    """Quotes sheet (one row per quote with totals) and Line Items sheet, filtered by
+    ?status=, ?user_id=, ?from= and ?to= (YYYY-MM-DD, inclusive)."""
+    where, params = [], []
+    if request.args.get("status"):
+        where.append("q.status = ?"); params.append(request.args["status"])
+    if request.args.get("user_id"):
+        where.append("q.user_id = ?"); params.append(request.args.get("user_id", type=int))
+    if request.args.get("from"):
+        where.append("q.timestamp >= ?"); params.append(request.args["from"])
+    if request.args.get("to"):
+        try:
+            end = datetime.strptime(request.args["to"], '%Y-%m-%d') + timedelta(days=1)
+        except ValueError:
+            return jsonify({"error": "to must be YYYY-MM-DD"}), 400
+        where.append("q.timestamp < ?"); params.append(end.strftime('%Y-%m-%d'))
+
+    wb = new_workbook()
+    quotes_ws, lines_ws = wb.create_sheet("Quotes"), wb.create_sheet("Line Items")
+    quotes_ws.append(["Quote", "Date", "Customer", "Project", "Status", "Created By", "Lines",
+                      "Subtotal", "Discount %", "Discount", "Installation", "VAT", "Total"])
+    lines_ws.append(["Quote", "Model", "Description", "Category", "Quantity", "Unit Price", "Line Total"])
+
+    db = get_db()
+    cursor = streaming_cursor(db)
+    cursor.execute(f"""
+        SELECT q.id, q.timestamp, q.customer_name, q.project_name, q.status, q.quote_data,
+               COALESCE(u.name, 'System/Legacy') AS user_name
+        FROM quotes q LEFT JOIN users u ON q.user_id = u.id
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY q.timestamp DESC
+    """, params)
+    # Iterating the cursor keeps one quote in memory at a time.
+    for quote in cursor:
+        row = [quote["id"], parse_timestamp(quote["timestamp"]), quote["customer_name"], quote["project_name"], quote["status"], quote["user_name"]]
+        try:
+            data = json.loads(quote["quote_data"])
+            items = data.get("items", [])
+            totals = calculate_totals(items, data.get("installationCost", 0), data.get("discountPercent", 0))
+            lines = list(quote_line_rows(quote["id"], items))
+        except (json.JSONDecodeError, TypeError, ValueError, ArithmeticError, AttributeError):
+            quotes_ws.append(row)
+            continue
+        for line in lines:
+            lines_ws.append(line)
+        quotes_ws.append(row + [len(items), totals["subtotal"], totals["discountPercent"], totals["discountAmount"],
+                                totals["installation"], totals["vat"], totals["total"]])
+    return send_workbook(wb, f"quotations_{datetime.now().strftime('%Y%m%d')}.xlsx")
 
 @app.route("/api/admin/quote-pdf/<quote_id>", methods=['GET'])
 @admin_required
@@ -749,24 +2553,7 @@ def get_quote_pdf(current_user, quote_id):
     try:
         quote_json = json.loads(quote_row["quote_data"])
         items = quote_json.get("items", [])
-        installation = Decimal(str(quote_json.get("installationCost", 0)))
-        discount = Decimal(str(quote_json.get("discountPercent", 0)))
-        subtotal = sum(Decimal(str(i.get("price", 0))) * int(i.get("quantity", 1)) for i in items)
-        
-        discount_amount = (subtotal * (discount / Decimal(100))).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        subtotal_after_discount = subtotal - discount_amount
-        taxable_base = subtotal_after_discount + installation
-        vat = (taxable_base * VAT_RATE).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        grand_total = taxable_base + vat
-
-        totals = {
-            "subtotal": float(subtotal),
-            "installation": float(installation),
-            "discountPercent": float(discount),
-            "discountAmount": float(discount_amount),
-            "vat": float(vat),
-            "total": float(grand_total)
-        }
+        totals = calculate_totals(items, quote_json.get("installationCost", 0), quote_json.get("discountPercent", 0))
         customer_info = {
             "name": quote_json.get("customerName"),
             "project": quote_json.get("projectName")
@@ -788,39 +2575,61 @@ def confirm_quote_and_deduct_stock(current_user, quote_id):
     db = get_db()
     cursor = db.cursor()
 
-    cursor.execute("SELECT quote_data, status FROM quotes WHERE id=?", (quote_id,))
-    quote_row = cursor.fetchone()
-    if not quote_row:
-        return jsonify({"error": "Quote not found"}), 404
-    if quote_row['status'] == 'Confirmed':
-        return jsonify({"error": "This quote has already been confirmed and stock deducted."}), 409
-
     try:
+        # Take the write lock before reading the quote so two admins confirming
+        # overlapping quotes (or the same quote twice) are fully serialized.
+        begin_immediate(db)
+
+        cursor.execute("SELECT quote_data, status FROM quotes WHERE id=?", (quote_id,))
+        quote_row = cursor.fetchone()
+        if not quote_row:
+            db.rollback()
+            return jsonify({"error": "Quote not found"}), 404
+        if quote_row['status'] == 'Confirmed':
+            db.rollback()
+            return jsonify({"error": "This quote has already been confirmed and stock deducted."}), 409
+
         quote_json = json.loads(quote_row["quote_data"])
         items = quote_json.get("items", [])
-        if not items:
-            return jsonify({"error": "Cannot confirm an empty quote."}), 400
-
-        db.execute('BEGIN TRANSACTION')
 
+        # Aggregate per model so a model listed on several lines is checked and
+        # deducted once against its combined quantity.
+        required, descriptions = Counter(), {}
         for item in items:
             model = item.get("model")
             quantity = int(item.get("quantity", 0))
-            cursor.execute("SELECT stock FROM products WHERE model = ?", (model,))
-            product = cursor.fetchone()
-            if not product or product['stock'] < quantity:
+            if not model or quantity <= 0: continue
+            required[model] += quantity
+            descriptions.setdefault(model, item.get("description", model))
+        if not required:
+            db.rollback()
+            return jsonify({"error": "Cannot confirm an empty quote."}), 400
+
+        placeholders = ','.join('?' * len(required))
+        cursor.execute(f"SELECT model, stock FROM products WHERE model IN ({placeholders})", list(required))
+        available = {row['model']: row['stock'] or 0 for row in cursor.fetchall()}
+        for model, quantity in required.items():
+            if available.get(model, 0) < quantity:
                 db.rollback()
                 return jsonify({
-                    "error": f"Insufficient stock for {item.get('description', model)}. Required: {quantity}, Available: {product['stock'] if product else 0}."
+                    "error": f"Insufficient stock for {descriptions[model]}. Required: {quantity}, Available: {available.get(model, 0)}."
                 }), 400
-        
-        for item in items:
-            model = item.get("model")
-            quantity = int(item.get("quantity", 0))
-            cursor.execute("UPDATE products SET stock = stock - ? WHERE model = ?", (quantity, model))
 
-        cursor.execute("UPDATE quotes SET status = 'Confirmed' WHERE id = ?", (quote_id,))
-        
+        # Guarded deduction: a row is only touched if it still has enough stock,
+        # so stock can never go negative even if the check above were bypassed.
+        deducted = 0
+        for model, quantity in required.items():
+            cursor.execute("UPDATE products SET stock = stock - ? WHERE model = ? AND stock >= ?", (quantity, model, quantity))
+            deducted += cursor.rowcount
+        if deducted != len(required):
+            db.rollback()
+            return jsonify({"error": "Stock changed while confirming. Please retry."}), 409
+
+        cursor.execute("UPDATE quotes SET status = 'Confirmed' WHERE id = ? AND status != 'Confirmed'", (quote_id,))
+        if cursor.rowcount != 1:
+            db.rollback()
+            return jsonify({"error": "This quote has already been confirmed and stock deducted."}), 409
+
         db.commit()
         return jsonify({"message": f"Quote {quote_id} confirmed. Stock has been deducted."})
 
@@ -849,21 +2658,7 @@ def generate_user_contract(current_user, quote_id):
     try:
         quote_json = json.loads(quote_row["quote_data"])
         items = quote_json.get("items", [])
-        installation = Decimal(str(quote_json.get("installationCost", 0)))
-        discount = Decimal(str(quote_json.get("discountPercent", 0)))
-        subtotal = sum(Decimal(str(i.get("price", 0))) * int(i.get("quantity", 1)) for i in items)
-        
-        discount_amount = (subtotal * (discount / Decimal(100))).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        subtotal_after_discount = subtotal - discount_amount
-        taxable_base = subtotal_after_discount + installation
-        vat = (taxable_base * VAT_RATE).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        grand_total = taxable_base + vat
-
-        totals = {
-            "subtotal": float(subtotal), "installation": float(installation),
-            "discountPercent": float(discount), "discountAmount": float(discount_amount),
-            "vat": float(vat), "total": float(grand_total)
-        }
+        totals = calculate_totals(items, quote_json.get("installationCost", 0), quote_json.get("discountPercent", 0))
         customer_info = { "name": quote_json.get("customerName"), "project": quote_json.get("projectName") }
         
         pdf_bytes = _generate_contract_pdf(items, customer_info, totals, quote_id)
@@ -879,6 +2674,49 @@ def generate_user_contract(current_user, quote_id):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/quotes/<quote_id>/bundle", methods=['GET'])
+@token_required
+def generate_deal_bundle(current_user, quote_id):
+    """Quotation, contract and application form for a confirmed quote: one merged,
+    bookmarked PDF, or the three separate files in a ZIP with ?format=zip."""
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute("SELECT user_id, quote_data, status FROM quotes WHERE id=?", (quote_id,))
+    quote_row = cursor.fetchone()
+
+    if not quote_row:
+        return jsonify({"error": "Quote not found"}), 404
+    if current_user['role'] != 'admin' and quote_row['user_id'] != current_user['id']:
+        return jsonify({"error": "Forbidden. You do not own this quote."}), 403
+    if quote_row['status'] != 'Confirmed':
+        return jsonify({"error": "Can only generate contracts for 'Confirmed' quotations."}), 403
+
+    try:
+        quote_json = json.loads(quote_row["quote_data"])
+        items = quote_json.get("items", [])
+        totals = calculate_totals(items, quote_json.get("installationCost", 0), quote_json.get("discountPercent", 0))
+        customer_info = { "name": quote_json.get("customerName"), "project": quote_json.get("projectName") }
+        documents = _generate_deal_bundle(items, customer_info, totals, quote_id)
+
+        project_name = (customer_info.get("project") or "project").replace(" ", "_")
+        if request.args.get("format") == "zip":
+            import zipfile
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+                for title, stem, pdf_bytes in documents:
+                    zf.writestr(f"{stem}_{project_name}_{quote_id}.pdf", pdf_bytes)
+            return send_file(io.BytesIO(archive.getvalue()), mimetype="application/zip", as_attachment=True,
+                             download_name=f"Deal_{project_name}_{quote_id}.zip")
+
+        response = make_response(merge_pdfs([(title, pdf_bytes) for title, stem, pdf_bytes in documents]))
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f'attachment; filename=Deal_{project_name}_{quote_id}.pdf'
+        return response
+
+    except Exception as e:
+        print(f"Error generating document bundle for quote {quote_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/admin/generate-contract/<quote_id>", methods=['GET'])
 @admin_required
 def generate_contract(current_user, quote_id):
@@ -895,21 +2733,7 @@ def generate_contract(current_user, quote_id):
     try:
         quote_json = json.loads(quote_row["quote_data"])
         items = quote_json.get("items", [])
-        installation = Decimal(str(quote_json.get("installationCost", 0)))
-        discount = Decimal(str(quote_json.get("discountPercent", 0)))
-        subtotal = sum(Decimal(str(i.get("price", 0))) * int(i.get("quantity", 1)) for i in items)
-        
-        discount_amount = (subtotal * (discount / Decimal(100))).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        subtotal_after_discount = subtotal - discount_amount
-        taxable_base = subtotal_after_discount + installation
-        vat = (taxable_base * VAT_RATE).quantize(Decimal("0.01"), ROUND_HALF_UP)
-        grand_total = taxable_base + vat
-
-        totals = {
-            "subtotal": float(subtotal), "installation": float(installation),
-            "discountPercent": float(discount), "discountAmount": float(discount_amount),
-            "vat": float(vat), "total": float(grand_total)
-        }
+        totals = calculate_totals(items, quote_json.get("installationCost", 0), quote_json.get("discountPercent", 0))
         customer_info = { "name": quote_json.get("customerName"), "project": quote_json.get("projectName") }
         
         pdf_bytes = _generate_contract_pdf(items, customer_info, totals, quote_id)
@@ -924,6 +2748,69 @@ def generate_contract(current_user, quote_id):
         print(f"Error generating contract for quote {quote_id}: {e}")
         return jsonify({"error": str(e)}), 500
 
+def _save_package_items(cur, package_id, items):
+    cur.execute("DELETE FROM package_items WHERE package_id = ?", (package_id,))
+    merged = Counter()
+    for item in items:
+        merged[str(item["model"]).strip()] += int(item.get("quantity", 1))
+    cur.executemany("INSERT INTO package_items (package_id, model, quantity, position) VALUES (?, ?, ?, ?)",
+                    [(package_id, model, qty, n) for n, (model, qty) in enumerate(merged.items()) if qty > 0])
+
+@app.route("/api/admin/packages", methods=["POST"])
+@admin_required
+def add_package(current_user):
+    data = request.get_json() or {}
+    if not data.get("name") or not isinstance(data.get("items"), list):
+        return jsonify({"error": "Missing required fields: name, items."}), 400
+    db = get_db(); cur = db.cursor()
+    try:
+        cur.execute("INSERT INTO packages (name, description) VALUES (?, ?)", (data["name"], data.get("description")))
+        _save_package_items(cur, cur.lastrowid, data["items"])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return jsonify({"error": f"Package '{data['name']}' already exists."}), 409
+    except (KeyError, TypeError, ValueError):
+        db.rollback()
+        return jsonify({"error": "Each item needs a model and an integer quantity."}), 400
+    return jsonify({"message": f"Package {data['name']} added."}), 201
+
+@app.route("/api/admin/packages/<path:name>", methods=["PUT"])
+@admin_required
+def update_package(current_user, name):
+    data = request.get_json() or {}
+    db = get_db(); cur = db.cursor()
+    cur.execute("SELECT id, description FROM packages WHERE name = ?", (name,))
+    package = cur.fetchone()
+    if not package:
+        return jsonify({"error": f"Package '{name}' not found"}), 404
+    try:
+        cur.execute("UPDATE packages SET name = ?, description = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (data.get("name") or name, data["description"] if "description" in data else package["description"], package["id"]))
+        if isinstance(data.get("items"), list):
+            _save_package_items(cur, package["id"], data["items"])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return jsonify({"error": f"Package '{data.get('name')}' already exists."}), 409
+    except (KeyError, TypeError, ValueError):
+        db.rollback()
+        return jsonify({"error": "Each item needs a model and an integer quantity."}), 400
+    return jsonify({"message": f"Package {name} updated."})
+
+@app.route("/api/admin/packages/<path:name>", methods=["DELETE"])
+@admin_required
+def delete_package(current_user, name):
+    db = get_db(); cur = db.cursor()
+    cur.execute("SELECT id FROM packages WHERE name = ?", (name,))
+    package = cur.fetchone()
+    if not package:
+        return jsonify({"error": f"Package '{name}' not found"}), 404
+    cur.execute("DELETE FROM package_items WHERE package_id = ?", (package["id"],))
+    cur.execute("DELETE FROM packages WHERE id = ?", (package["id"],))
+    db.commit()
+    return jsonify({"message": f"Package {name} deleted."})
+
 @app.route("/api/admin/product", methods=["POST"])
 @admin_required
 def add_product(current_user):
@@ -933,7 +2820,7 @@ def add_product(current_user):
                     (data["model"], data["description"], data["category"], float(data["price"]), int(data["stock"]), data.get("status", "Active")))
         db.commit()
         return jsonify({"message": f"Product {data['model']} added."}), 201
-    except sqlite3.IntegrityError: return jsonify({"error": f"Model '{data['model']}' already exists."}), 409
+    except IntegrityError: return jsonify({"error": f"Model '{data['model']}' already exists."}), 409
 
 @app.route("/api/admin/product/<model_id>", methods=["PUT"])
 @admin_required
@@ -985,7 +2872,7 @@ def add_user(current_user):
         )
         db.commit()
         return jsonify({"message": "User created successfully."}), 201
-    except sqlite3.IntegrityError:
+    except IntegrityError:
         return jsonify({"error": "A user with this email already exists."}), 409
 
 @app.route("/api/admin/user/<int:user_id>", methods=["PUT"])
@@ -1031,7 +2918,7 @@ def update_user(current_user, user_id):
         cursor.execute(query, tuple(params))
         db.commit()
         return jsonify({"message": f"User {user_id} updated successfully."})
-    except sqlite3.IntegrityError:
+    except IntegrityError:
         return jsonify({"error": "Email already exists."}), 409
 
 @app.route("/api/admin/user/<int:user_id>", methods=["DELETE"])
@@ -1058,6 +2945,135 @@ def approve_user(current_user, user_id):
         return jsonify({"error": "User not found."}), 404
     return jsonify({"message": f"User {user_id} approved successfully."})
 
+@app.route("/api/admin/profiler", methods=['GET'])
+@admin_required
+def profiler_status(current_user):
+    return jsonify({"armed": request_profiler.current(), "captures": request_profiler.captures()})
+
+@app.route("/api/admin/profiler", methods=['POST'])
+@admin_required
+def profiler_arm(current_user):
+    """Arms the profiler: {"requests": N, "route": regex, "mode": "sample"|"cprofile",
+    "interval_ms": 5, "minutes": 30}, or turns it off with {"enabled": false}."""
+    d = request.get_json(silent=True) or {}
+    if d.get("enabled") is False:
+        request_profiler.disarm()
+        return jsonify({"message": "Profiler disabled."})
+    route = d.get("route") or None
+    try:
+        requests_to_profile = d.get("requests", None if route else 10)
+        requests_to_profile = None if requests_to_profile is None else int(requests_to_profile)
+        interval_ms, minutes = int(d.get("interval_ms", 5)), int(d.get("minutes", 30))
+        if route: re.compile(route)
+    except (TypeError, ValueError, re.error) as e:
+        return jsonify({"error": f"Invalid profiler settings: {e}"}), 400
+    mode = d.get("mode", "sample")
+    if mode not in ("sample", "cprofile"):
+        return jsonify({"error": "mode must be 'sample' or 'cprofile'."}), 400
+    if (requests_to_profile is not None and requests_to_profile < 1) or not 1 <= interval_ms <= 1000 or not 1 <= minutes <= 24 * 60:
+        return jsonify({"error": "requests must be at least 1, interval_ms 1-1000 and minutes 1-1440."}), 400
+    settings = request_profiler.arm(requests_to_profile, route, mode, interval_ms, minutes)
+    return jsonify({"message": "Profiler armed.", "armed": settings})
+
+@app.route("/api/admin/profiler/captures/<name>", methods=['GET'])
+@admin_required
+def profiler_capture(current_user, name):
+    # Only capture files; control.json and anything else in the folder stay private.
+    if not RequestProfiler.CAPTURE_NAME.match(name):
+        return jsonify({"error": "Capture not found"}), 404
+    return send_from_directory(os.path.abspath(PROFILE_DIR), name, as_attachment=True)
+
+@app.route("/api/admin/uploads/gc", methods=['POST'])
+@admin_required
+def gc_uploads(current_user):
+    """Reports (dry_run, the default) or removes unreferenced uploads older than retention_days."""
+    d = request.get_json(silent=True) or {}
+    try:
+        retention_days = int(d.get("retention_days", UPLOAD_RETENTION_DAYS))
+    except (TypeError, ValueError):
+        return jsonify({"error": "retention_days must be a whole number of days."}), 400
+    if retention_days < 1:
+        return jsonify({"error": "retention_days must be at least 1."}), 400
+    report = collect_upload_garbage(get_db(), apply=not d.get("dry_run", True), archive=bool(d.get("archive")),
+                                    retention_days=retention_days)
+    return jsonify(report)
+
+@app.route("/api/admin/upload-images-zip", methods=['POST'])
+@admin_required
+def upload_images_zip(current_user):
+    """Imports a ZIP of product photos: files are matched to products with the
+    bulk_link_images prefix rules, processed like /api/upload-image across
+    IMAGE_WORKERS threads, and linked in one transaction. Returns a per-file report."""
+    request.max_content_length = IMAGE_ZIP_MAX_BYTES
+    if 'images_zip' not in request.files: return jsonify({"error": "No ZIP file provided"}), 400
+    import zipfile
+    from concurrent.futures import ThreadPoolExecutor
+    try:
+        archive = zipfile.ZipFile(request.files['images_zip'].stream)
+    except zipfile.BadZipFile:
+        return jsonify({"error": "The upload is not a valid ZIP file."}), 400
+
+    report, entries = [], []
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or not name or name.startswith(".") or info.filename.startswith("__MACOSX/"): continue
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            report.append({"file": info.filename, "status": "skipped", "error": "Not a supported image type."})
+        else:
+            entries.append(info)
+    if len(entries) > IMAGE_ZIP_MAX_FILES:
+        return jsonify({"error": f"The ZIP holds {len(entries)} images; the limit is {IMAGE_ZIP_MAX_FILES}."}), 400
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute("SELECT model FROM products WHERE model IS NOT NULL")
+    models = match_images_to_models([os.path.basename(i.filename) for i in entries], [r['model'] for r in cursor.fetchall()])
+    stamp = int(datetime.now().timestamp())
+
+    def process(info, model):
+        result = {"file": info.filename, "model": model}
+        if model is None:
+            return {**result, "status": "unmatched", "error": "No product model matches this filename, or an earlier file already did."}
+        if info.file_size > app.config['MAX_CONTENT_LENGTH']:
+            return {**result, "status": "failed", "error": "Image is larger than the single-upload limit."}
+        started = time.perf_counter()
+        try:
+            processed = process_product_image(archive.read(info))
+        except Exception as e:
+            return {**result, "status": "failed", "error": f"Could not process image ({type(e).__name__})."}
+        filename = secure_filename(f"{model}_{stamp}.png")
+        with open(os.path.join(UPLOAD_FOLDER, filename), "wb") as f: f.write(processed)
+        observe_seconds(IMAGE_PROCESSING_SECONDS, time.perf_counter() - started, outcome="processed")
+        return {**result, "status": "linked", "image": filename, "bytes": len(processed)}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=IMAGE_WORKERS) as pool:
+        report.extend(pool.map(process, entries, models))
+
+    linked = [(r["image"], r["model"]) for r in report if r["status"] == "linked"]
+    if linked:
+        try:
+            begin_immediate(db)
+            cursor.executemany("REPLACE INTO device_images (model_id, filename) VALUES (?, ?)", [(m, f) for f, m in linked])
+            cursor.executemany("UPDATE products SET imageFilename = ? WHERE model = ?", linked)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for filename, _ in linked:
+                try: os.remove(os.path.join(UPLOAD_FOLDER, filename))
+                except OSError: pass
+            print(f"Database error during ZIP image import: {e}")
+            return jsonify({"error": "A database error occurred; no images were linked."}), 500
+
+    summary = Counter(r["status"] for r in report)
+    return jsonify({
+        "ok": bool(linked),
+        "message": f"Linked {len(linked)} of {len(entries)} images.",
+        "summary": {status: summary.get(status, 0) for status in ("linked", "unmatched", "failed", "skipped")},
+        "seconds": round(time.perf_counter() - started, 2),
+        "files": report,
+    })
+
 @app.route("/api/admin/bulk-link-images", methods=['POST'])
 @admin_required
 def bulk_link_images(current_user):
@@ -1069,27 +3085,10 @@ def bulk_link_images(current_user):
     cursor = db.cursor()
 
     cursor.execute("SELECT model FROM products WHERE model IS NOT NULL")
-    products = cursor.fetchall()
-    product_map = {prod['model'].replace(' ', '_'): prod['model'] for prod in products}
-
-    supported_extensions = ['.png', '.jpg', '.jpeg', '.webp', '.gif']
-    image_files = [f for f in upload_path.iterdir() if f.is_file() and f.suffix.lower() in supported_extensions]
-
-    updates_to_commit = []
-
-    for image_file in image_files:
-        file_stem = image_file.stem
-        
-        matching_prefix = None
-        for prefix in sorted(product_map.keys(), key=len, reverse=True):
-            if file_stem.startswith(prefix):
-                matching_prefix = prefix
-                break
+    models = [prod['model'] for prod in cursor.fetchall()]
 
-        if matching_prefix:
-            original_model_name = product_map[matching_prefix]
-            updates_to_commit.append((image_file.name, original_model_name))
-            del product_map[matching_prefix]
+    image_names = [f.name for f in upload_path.iterdir() if f.is_file() and f.suffix.lower() in IMAGE_EXTENSIONS]
+    updates_to_commit = [(name, model) for name, model in zip(image_names, match_images_to_models(image_names, models)) if model]
 
     if updates_to_commit:
         try: